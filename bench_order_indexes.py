@@ -0,0 +1,176 @@
+"""Query plans and latency of the order/notification hot queries, with and without their indexes.
+
+Seeds a throwaway database with a large synthetic order history, then runs
+each query first with the indexes from migrations/versions/0001 dropped and
+again with them created, printing the plan and timings for both.
+
+    python bench_order_indexes.py --database-url sqlite:///./bench_orders.db --orders 200000
+    python bench_order_indexes.py --database-url mysql+mysqlconnector://root:pw@localhost/bench
+
+Point it at a scratch database: it creates tables and adds rows.
+"""
+import argparse
+import random
+import statistics
+from datetime import datetime, timedelta
+from time import perf_counter
+
+from sqlalchemy import create_engine, func, insert, select, text
+
+from database import Base
+from models import Notification, Order, User
+
+INDEX_NAMES = {
+    "ix_orders_payment_reference",
+    "ix_orders_user_id_created_at",
+    "ix_orders_status_created_at",
+    "ix_orders_payment_status_created_at",
+    "ix_orders_created_at_id",
+    "ix_notifications_user_id_read_created_at",
+}
+BENCH_INDEXES = [
+    index
+    for table in (Order.__table__, Notification.__table__)
+    for index in table.indexes if index.name in INDEX_NAMES
+]
+
+STATUSES = ["pending", "processing", "completed", "cancelled", "delivered"]
+PAYMENT_STATUSES = ["pending", "paid", "failed"]
+
+QUERIES = [
+    ("payment reference lookup (webhook)",
+     "SELECT * FROM orders WHERE payment_reference = :ref"),
+    ("user order history",
+     "SELECT * FROM orders WHERE user_id = :user_id ORDER BY created_at DESC LIMIT 50"),
+    ("admin list by status",
+     "SELECT * FROM orders WHERE status = 'pending' ORDER BY created_at DESC, id DESC LIMIT 10"),
+    ("admin list by payment status",
+     "SELECT * FROM orders WHERE payment_status = 'paid' ORDER BY created_at DESC, id DESC LIMIT 10"),
+    ("admin keyset page (deep)",
+     "SELECT * FROM orders WHERE created_at <= :cursor_at AND (created_at < :cursor_at OR id < :cursor_id) "
+     "ORDER BY created_at DESC, id DESC LIMIT 10"),
+    ("unread notifications",
+     "SELECT * FROM notifications WHERE user_id = :user_id AND `read` = 0 ORDER BY created_at DESC LIMIT 20"),
+]
+
+def seed(engine, orders: int, users: int, batch: int = 5000):
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        if conn.scalar(select(func.count()).select_from(Order.__table__)):
+            print("Orders already present, skipping seed")
+            return
+        conn.execute(insert(User.__table__), [
+            {"fullname": f"Bench User {i}", "email": f"bench{i}@example.com", "password": "x", "role": "user"}
+            for i in range(1, users + 1)
+        ])
+        user_ids = conn.scalars(select(User.id)).all()
+
+    rng = random.Random(42)
+    start = datetime.utcnow() - timedelta(days=730)
+    print(f"Seeding {orders} orders and {orders} notifications...")
+    for offset in range(0, orders, batch):
+        order_rows, notification_rows = [], []
+        for i in range(offset, min(offset + batch, orders)):
+            created_at = start + timedelta(seconds=rng.randrange(730 * 86400))
+            user_id = rng.choice(user_ids)
+            order_rows.append({
+                "reference": f"ord_bench_{i}",
+                "user_id": user_id,
+                "amount": 10.0,
+                "delivery_fee": 2.0,
+                "final_amount": 12.0,
+                "status": rng.choice(STATUSES),
+                "payment_status": rng.choice(PAYMENT_STATUSES),
+                "payment_reference": f"pay_bench_{i}",
+                "items": "[]",
+                "created_at": created_at,
+            })
+            notification_rows.append({
+                "user_id": user_id,
+                "title": "Order Status Updated",
+                "message": "bench",
+                "type": "order",
+                "read": rng.random() < 0.8,
+                "created_at": created_at,
+            })
+        with engine.begin() as conn:
+            conn.execute(insert(Order.__table__), order_rows)
+            conn.execute(insert(Notification.__table__), notification_rows)
+
+def set_indexes(engine, present: bool):
+    with engine.begin() as conn:
+        for index in BENCH_INDEXES:
+            index.drop(conn, checkfirst=True)
+            if present:
+                index.create(conn)
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("ANALYZE"))
+        else:
+            conn.execute(text("ANALYZE TABLE orders, notifications"))
+
+def explain(conn, dialect: str, sql: str, params: dict) -> str:
+    prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN "
+    rows = conn.execute(text(prefix + sql), params).fetchall()
+    if dialect == "sqlite":
+        return "; ".join(str(row[-1]) for row in rows)
+    # MySQL: table, access type, chosen key, rows examined, extra
+    return "; ".join(
+        f"{row._mapping['table']} type={row._mapping['type']} key={row._mapping['key']} "
+        f"rows={row._mapping['rows']} {row._mapping['Extra'] or ''}".strip()
+        for row in rows
+    )
+
+def time_query(conn, sql: str, params: dict, repeat: int) -> tuple:
+    latencies = []
+    for _ in range(repeat):
+        start = perf_counter()
+        conn.execute(text(sql), params).fetchall()
+        latencies.append(perf_counter() - start)
+    latencies.sort()
+    return statistics.median(latencies) * 1000, latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000
+
+def run(engine, repeat: int) -> dict:
+    dialect = engine.dialect.name
+    results = {}
+    with engine.connect() as conn:
+        sample = conn.execute(
+            select(Order.user_id, Order.payment_reference, Order.created_at, Order.id)
+            .order_by(Order.created_at.desc()).offset(50000).limit(1)
+        ).first() or conn.execute(select(Order.user_id, Order.payment_reference, Order.created_at, Order.id)).first()
+        params = {
+            "ref": sample.payment_reference,
+            "user_id": sample.user_id,
+            "cursor_at": sample.created_at,
+            "cursor_id": sample.id,
+        }
+        for label, sql in QUERIES:
+            if dialect == "sqlite":
+                sql = sql.replace("`read`", "read")
+            results[label] = (explain(conn, dialect, sql, params), *time_query(conn, sql, params, repeat))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default="sqlite:///./bench_orders.db")
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    seed(engine, args.orders, args.users)
+
+    set_indexes(engine, present=False)
+    before = run(engine, args.repeat)
+    set_indexes(engine, present=True)
+    after = run(engine, args.repeat)
+
+    for label, _ in QUERIES:
+        plan_before, p50_before, p95_before = before[label]
+        plan_after, p50_after, p95_after = after[label]
+        print(f"\n{label}")
+        print(f"  without indexes: p50 {p50_before:8.2f} ms  p95 {p95_before:8.2f} ms  | {plan_before}")
+        print(f"  with indexes:    p50 {p50_after:8.2f} ms  p95 {p95_after:8.2f} ms  | {plan_after}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Signin throughput at several bcrypt costs.
+
+Fires a burst of concurrent callers at routers.auth.verify_password, the
+expensive part of /auth/signin, so every call goes through the API's own
+bcrypt executor and its PASSWORD_HASH_QUEUE_LIMIT. Reports signins/second,
+latency of the accepted calls, how many were turned away with 503 and the
+longest event-loop stall observed.
+
+Workers and the queue limit come from the API settings; set
+PASSWORD_HASH_WORKERS / PASSWORD_HASH_QUEUE_LIMIT to try other values.
+
+    python bench_signin.py --rounds 10 11 12 13 --requests 64
+    PASSWORD_HASH_WORKERS=4 PASSWORD_HASH_QUEUE_LIMIT=16 python bench_signin.py --requests 100
+"""
+import argparse
+import asyncio
+import statistics
+from time import perf_counter
+
+from fastapi import HTTPException, status
+
+from routers.auth import get_hashing_stats, make_password_context, verify_password
+
+PASSWORD = "correct horse battery staple"
+
+async def measure_loop_stall(stop: asyncio.Event) -> float:
+    """Longest time the event loop failed to wake a 1 ms ticker"""
+    loop = asyncio.get_running_loop()
+    worst = 0.0
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(0.001)
+        worst = max(worst, loop.time() - start - 0.001)
+    return worst
+
+async def bench(rounds: int, requests: int) -> dict:
+    stored_hash = make_password_context(rounds).hash(PASSWORD)
+    latencies = []
+    rejected = 0
+
+    async def signin():
+        nonlocal rejected
+        start = perf_counter()
+        try:
+            ok = await verify_password(PASSWORD, stored_hash)
+        except HTTPException as e:
+            if e.status_code != status.HTTP_503_SERVICE_UNAVAILABLE:
+                raise
+            rejected += 1
+            return
+        assert ok
+        latencies.append(perf_counter() - start)
+
+    stop = asyncio.Event()
+    stall_task = asyncio.create_task(measure_loop_stall(stop))
+    start = perf_counter()
+    await asyncio.gather(*(signin() for _ in range(requests)))
+    elapsed = perf_counter() - start
+    stop.set()
+    stall = await stall_task
+
+    latencies.sort()
+    return {
+        "rounds": rounds,
+        "accepted": len(latencies),
+        "rejected": rejected,
+        "signins_per_sec": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000 if latencies else 0.0,
+        "loop_stall_ms": stall * 1000,
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12, 13])
+    parser.add_argument("--requests", type=int, default=64, help="concurrent signins per burst")
+    args = parser.parse_args()
+
+    hashing = get_hashing_stats()
+    print(f"{args.requests} concurrent signins, {hashing['workers']} hash workers, "
+          f"queue limit {hashing['queue_limit']}")
+    print(f"{'rounds':>6} {'accepted':>9} {'503s':>6} {'signins/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'loop stall ms':>14}")
+    for rounds in args.rounds:
+        result = await bench(rounds, args.requests)
+        print(
+            f"{result['rounds']:>6} {result['accepted']:>9} {result['rejected']:>6} "
+            f"{result['signins_per_sec']:>10.1f} {result['p50_ms']:>9.1f} "
+            f"{result['p95_ms']:>9.1f} {result['loop_stall_ms']:>14.2f}"
+        )
+
+if __name__ == "__main__":
+    asyncio.run(main())
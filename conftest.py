@@ -0,0 +1,62 @@
+"""Shared setup and fixtures for the pytest suites in this directory.
+
+The app builds its database engine when `database` is first imported, so
+the throwaway SQLite database the suites use is chosen here, before any
+test module is collected. Each suite drops and recreates the tables it
+needs; nothing ever points at the DATABASE_URL from .env.
+
+Modules keep the `settings` object they got from get_settings() at import,
+so per-test settings are changed on that shared instance (and in the
+environment) by `override_settings`, and put back after the test.
+
+    python -m pytest
+"""
+import os
+import tempfile
+
+import pytest
+
+from config import Settings, get_settings
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'tests.db')}"
+get_settings.cache_clear()
+
+# Manual checks against a live MySQL server, not pytest suites
+collect_ignore = ["test_mysql_connection.py", "test_order_status.py"]
+
+@pytest.fixture
+def override_settings(monkeypatch):
+    """Change settings for one test: override_settings(PAYSTACK_MAX_RETRIES=1)"""
+    def override(**values):
+        for name, value in values.items():
+            monkeypatch.setenv(name, str(value))
+        fresh = Settings()  # parsed from the environment like the real ones
+        shared = get_settings()
+        for name in values:
+            monkeypatch.setattr(shared, name, getattr(fresh, name))
+    return override
+
+@pytest.fixture
+def fake_paystack():
+    """fake_paystack.py serving on a free port until the test ends"""
+    import fake_paystack
+    server = fake_paystack.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def use_fake_paystack(fake_paystack, override_settings, monkeypatch):
+    """Point the app at `fake_paystack` with some settings changed.
+
+    paystack.client is replaced for the test so its breaker and counters
+    start from zero and pick up the new settings; the app lifespan opens
+    and closes it.
+    """
+    from utils import paystack
+
+    def use(**overrides):
+        override_settings(PAYSTACK_BASE_URL=fake_paystack.url, **overrides)
+        monkeypatch.setattr(paystack, "client", paystack.PaystackClient())
+        return fake_paystack
+    return use
@@ -0,0 +1,185 @@
+"""Local stand-in for the Paystack API, for tests and offline development.
+
+Serves GET /transaction/verify/{reference} like Paystack does. Every
+reference verifies as a successful charge unless it was registered with
+another behaviour through the control endpoint:
+
+    POST /_fake/transactions  {"reference": "ref1", "status": "failed",
+                               "fail_times": 2, "fail_status": 503,
+                               "delay": 0.5}
+
+fail_times answers the next N verifications with fail_status, and delay
+holds each response for that many seconds.
+
+Faults can also be injected for every reference, from the command line or
+at runtime through POST /_fake/faults with the same names:
+
+    python fake_paystack.py --error-rate 0.5 --latency 2
+    POST /_fake/faults  {"error_rate": 1.0, "error_status": 502, "latency": 0}
+
+error_rate is the share of verifications answered with error_status, and
+latency is added to every verification. GET /_fake/stats returns request
+counts per reference, connections opened and the most verifications
+answered at once. Point the API at it with
+PAYSTACK_BASE_URL=http://127.0.0.1:8010.
+
+    python fake_paystack.py --port 8010
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+VERIFY_PREFIX = "/transaction/verify/"
+
+class FakePaystack(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, secret_key=None):
+        super().__init__(address, FakePaystackHandler)
+        self.secret_key = secret_key
+        self.transactions = {}
+        self.faults = {"error_rate": 0.0, "error_status": 503, "latency": 0.0}
+        self.hits = Counter()
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0  # most verifications being answered at once
+        self.lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+    def handle_error(self, request, client_address):
+        pass  # clients hanging up on a delayed response is expected
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def register(self, reference: str, **behaviour):
+        with self.lock:
+            self.transactions[reference] = behaviour
+
+    def inject(self, **faults):
+        """Set error_rate, error_status and/or latency for every verification"""
+        unknown = set(faults) - set(self.faults)
+        if unknown:
+            raise ValueError(f"Unknown faults: {', '.join(sorted(unknown))}")
+        with self.lock:
+            self.faults.update(faults)
+
+class FakePaystackHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/_fake/stats":
+            self._send(200, {
+                "hits": dict(self.server.hits),
+                "connections": self.server.connections,
+                "max_in_flight": self.server.max_in_flight,
+            })
+            return
+        if not path.startswith(VERIFY_PREFIX):
+            self._send(404, {"status": False, "message": "Not found"})
+            return
+        secret_key = self.server.secret_key
+        if secret_key and self.headers.get("Authorization") != f"Bearer {secret_key}":
+            self._send(401, {"status": False, "message": "Invalid key"})
+            return
+
+        reference = unquote(path[len(VERIFY_PREFIX):])
+        with self.server.lock:
+            self.server.hits[reference] += 1
+            behaviour = self.server.transactions.setdefault(reference, {})
+            failing = behaviour.get("fail_times", 0) > 0
+            if failing:
+                behaviour["fail_times"] -= 1
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+        try:
+            self._verify(reference, behaviour, failing)
+        finally:
+            with self.server.lock:
+                self.server.in_flight -= 1
+
+    def _verify(self, reference: str, behaviour: dict, failing: bool):
+        faults = self.server.faults
+        delay = faults["latency"] + behaviour.get("delay", 0)
+        if delay:
+            time.sleep(delay)
+        if faults["error_rate"] and random.random() < faults["error_rate"]:
+            self._send(faults["error_status"], {"status": False, "message": "Injected fault"})
+            return
+        if failing:
+            self._send(behaviour.get("fail_status", 503), {"status": False, "message": "Injected failure"})
+            return
+        if behaviour.get("status") == "missing":
+            self._send(400, {"status": False, "message": "Transaction reference not found"})
+            return
+        self._send(200, {
+            "status": True,
+            "message": "Verification successful",
+            "data": {
+                "reference": reference,
+                "status": behaviour.get("status", "success"),
+                "amount": behaviour.get("amount", 0),
+                "currency": "GHS",
+            },
+        })
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        if path == "/_fake/transactions":
+            self.server.register(payload.pop("reference"), **payload)
+        elif path == "/_fake/faults":
+            try:
+                self.server.inject(**payload)
+            except ValueError as e:
+                self._send(400, {"status": False, "message": str(e)})
+                return
+        else:
+            self._send(404, {"status": False, "message": "Not found"})
+            return
+        self._send(200, {"status": True})
+
+def start(port: int = 0, secret_key: str = None) -> FakePaystack:
+    """Serve in a background thread; port 0 picks a free port"""
+    server = FakePaystack(("127.0.0.1", port), secret_key)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--secret-key", help="Reject requests without this Bearer key")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of verifications that fail, 0-1")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of injected failures")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every verification")
+    args = parser.parse_args()
+    server = FakePaystack(("127.0.0.1", args.port), args.secret_key)
+    server.inject(error_rate=args.error_rate, error_status=args.error_status, latency=args.latency)
+    print(f"Fake Paystack listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -1,7 +1,8 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from database import engine
+from contextlib import asynccontextmanager
+from database import engine, AsyncSessionLocal
 from models import Base
 import os
 from dotenv import load_dotenv
@@ -17,11 +18,43 @@ from routers.menu_routes import router as menu_router
 from routers.promo_routes import router as promo_router
 from routers.notification_routes import router as notification_router
 from routers.order_routes import router as order_router
+from utils import menu_catalog, menu_bundle, menu_changes, menu_search, order_stats, related_items, paystack, webhook_events, reconciliation, token_cleanup, item_sales
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create database tables
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        await menu_changes.seed_if_empty(db)
+        await order_stats.seed_if_empty(db)
+    # Warm the in-memory menu so the first page view doesn't pay for it,
+    # and make sure the static bundle matches the database
+    snapshot = await menu_catalog.rebuild()
+    menu_search.index.rebuild(snapshot.items, snapshot.version)
+    await menu_bundle.write_bundle(snapshot)
+    menu_catalog.start_version_check()
+    await paystack.client.start()
+    await webhook_events.processor.start()
+    reconciliation.start_job()
+    token_cleanup.start_job()
+    item_sales.start_prune_job()
+    related_items.index.start()
+    yield
+    await related_items.index.stop()
+    await menu_catalog.stop_version_check()
+    await item_sales.stop_prune_job()
+    await token_cleanup.stop_job()
+    await reconciliation.stop_job()
+    await webhook_events.processor.stop()
+    await paystack.client.close()
+    await engine.dispose()
 
 app = FastAPI(
     title="Oxford Bakery API",
     description="API for Oxford Bakery",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -37,9 +70,6 @@ app.add_middleware(
 # Mount static files
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
 # Include routers
 app.include_router(auth_router, prefix="/api")
 app.include_router(user_router, prefix="/api")
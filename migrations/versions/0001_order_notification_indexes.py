@@ -0,0 +1,43 @@
+"""Indexes for the orders and notifications hot queries
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Tables created by Base.metadata.create_all after this change already have
+these indexes, so each one is only created if it is missing.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("ix_orders_payment_reference", "orders", ["payment_reference"]),
+    ("ix_orders_user_id_created_at", "orders", ["user_id", "created_at"]),
+    ("ix_orders_status_created_at", "orders", ["status", "created_at"]),
+    ("ix_orders_payment_status_created_at", "orders", ["payment_status", "created_at"]),
+    ("ix_orders_created_at_id", "orders", ["created_at", "id"]),
+    ("ix_notifications_user_id_read_created_at", "notifications", ["user_id", "read", "created_at"]),
+]
+
+def existing_indexes(table: str) -> set:
+    if op.get_context().as_sql:
+        # Offline (--sql) runs can't inspect the database; emit everything
+        return set()
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        if name not in existing_indexes(table):
+            op.create_index(name, table, columns)
+
+def downgrade() -> None:
+    for name, table, columns in reversed(INDEXES):
+        if op.get_context().as_sql or name in existing_indexes(table):
+            op.drop_index(name, table_name=table)
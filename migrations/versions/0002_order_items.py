@@ -0,0 +1,102 @@
+"""order_items table, backfilled from the orders.items JSON column
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+orders.items is left in place: new orders still write it, and it is the
+fallback for any order without rows here. The backfill parses that JSON in
+Python, so offline (--sql) runs only create the table; orders placed
+before it keep being read from orders.items.
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+orders = sa.table(
+    "orders",
+    sa.column("id", sa.Integer),
+    sa.column("items", sa.Text),
+)
+
+def order_lines(order_id: int, raw_items: str) -> list:
+    try:
+        items = json.loads(raw_items) if raw_items else []
+    except ValueError:
+        print(f"Skipping order {order_id}: items is not valid JSON")
+        return []
+    if not isinstance(items, list):
+        return []
+    return [
+        {
+            "order_id": order_id,
+            "menu_item_id": item.get("menu_item_id"),
+            "name": item.get("name") or "",
+            "quantity": item.get("quantity") or 0,
+            "unit_price": item.get("price") or 0.0,
+            "image": item.get("image"),
+        }
+        for item in items
+        if isinstance(item, dict) and item.get("menu_item_id") is not None
+    ]
+
+def upgrade() -> None:
+    if op.get_context().as_sql or not sa.inspect(op.get_bind()).has_table("order_items"):
+        op.create_table(
+            "order_items",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("order_id", sa.Integer(), sa.ForeignKey("orders.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("menu_item_id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(255), nullable=False),
+            sa.Column("quantity", sa.Integer(), nullable=False),
+            sa.Column("unit_price", sa.Float(), nullable=False),
+            sa.Column("image", sa.String(255), nullable=True),
+        )
+        op.create_index("ix_order_items_id", "order_items", ["id"])
+        op.create_index("ix_order_items_order_id", "order_items", ["order_id"])
+        op.create_index("ix_order_items_menu_item_id", "order_items", ["menu_item_id"])
+    if op.get_context().as_sql:
+        return
+
+    order_items = sa.table(
+        "order_items",
+        sa.column("order_id", sa.Integer),
+        sa.column("menu_item_id", sa.Integer),
+        sa.column("name", sa.String),
+        sa.column("quantity", sa.Integer),
+        sa.column("unit_price", sa.Float),
+        sa.column("image", sa.String),
+    )
+
+    # Backfill in id order, a batch at a time, skipping orders that already
+    # have lines (written by the app since the table was created)
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(orders.c.id, orders.c["items"])
+            .where(
+                orders.c.id > last_id,
+                ~sa.exists().where(order_items.c.order_id == orders.c.id)
+            )
+            .order_by(orders.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        lines = [line for order_id, raw_items in rows for line in order_lines(order_id, raw_items)]
+        if lines:
+            connection.execute(order_items.insert(), lines)
+        last_id = rows[-1][0]
+
+def downgrade() -> None:
+    op.drop_table("order_items")
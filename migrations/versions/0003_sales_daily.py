@@ -0,0 +1,71 @@
+"""sales_daily rollup, replacing order_daily_stats
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+sales_daily has the same (day, status, payment_status) key as the
+order_daily_stats counters it replaces, plus gross, delivery fee and net
+totals. It is backfilled from orders.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL = """
+INSERT INTO sales_daily (day, status, payment_status, order_count, gross, delivery_fees, net)
+SELECT DATE(created_at), COALESCE(status, 'pending'), COALESCE(payment_status, 'pending'), COUNT(*),
+       COALESCE(SUM(amount), 0), COALESCE(SUM(delivery_fee), 0), COALESCE(SUM(final_amount), 0)
+FROM orders
+WHERE created_at IS NOT NULL
+GROUP BY DATE(created_at), COALESCE(status, 'pending'), COALESCE(payment_status, 'pending')
+"""
+
+def has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+def upgrade() -> None:
+    # Offline (--sql) runs can't inspect the database; emit everything
+    offline = op.get_context().as_sql
+    if offline or not has_table("sales_daily"):
+        op.create_table(
+            "sales_daily",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("day", sa.Date(), nullable=False),
+            sa.Column("status", sa.String(50), nullable=False),
+            sa.Column("payment_status", sa.String(50), nullable=False),
+            sa.Column("order_count", sa.Integer(), nullable=False),
+            sa.Column("gross", sa.Float(), nullable=False),
+            sa.Column("delivery_fees", sa.Float(), nullable=False),
+            sa.Column("net", sa.Float(), nullable=False),
+            sa.UniqueConstraint("day", "status", "payment_status", name="uq_sales_daily"),
+        )
+        op.create_index("ix_sales_daily_id", "sales_daily", ["id"])
+    op.execute("DELETE FROM sales_daily")
+    op.execute(BACKFILL)
+    if offline:
+        op.execute("DROP TABLE IF EXISTS order_daily_stats")
+    elif has_table("order_daily_stats"):
+        op.drop_table("order_daily_stats")
+
+def downgrade() -> None:
+    op.create_table(
+        "order_daily_stats",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("status", sa.String(50), nullable=False),
+        sa.Column("payment_status", sa.String(50), nullable=False),
+        sa.Column("order_count", sa.Integer(), nullable=False),
+        sa.UniqueConstraint("day", "status", "payment_status", name="uq_order_daily_stats"),
+    )
+    op.execute(
+        "INSERT INTO order_daily_stats (day, status, payment_status, order_count) "
+        "SELECT day, status, payment_status, order_count FROM sales_daily"
+    )
+    op.drop_table("sales_daily")
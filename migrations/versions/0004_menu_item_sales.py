@@ -0,0 +1,35 @@
+"""menu_item_sales best-seller counters
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+Created empty; fill it with `python rebuild_menu_item_sales.py`.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    if not op.get_context().as_sql and sa.inspect(op.get_bind()).has_table("menu_item_sales"):
+        return
+    op.create_table(
+        "menu_item_sales",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("granularity", sa.String(10), nullable=False),
+        sa.Column("bucket_start", sa.DateTime(), nullable=False),
+        sa.Column("menu_item_id", sa.Integer(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.UniqueConstraint("granularity", "bucket_start", "menu_item_id", name="uq_menu_item_sales"),
+    )
+    op.create_index("ix_menu_item_sales_id", "menu_item_sales", ["id"])
+    op.create_index("ix_menu_item_sales_menu_item_id", "menu_item_sales", ["menu_item_id"])
+
+def downgrade() -> None:
+    op.drop_table("menu_item_sales")
@@ -0,0 +1,39 @@
+"""paystack_events webhook inbox
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    if not op.get_context().as_sql and sa.inspect(op.get_bind()).has_table("paystack_events"):
+        return
+    op.create_table(
+        "paystack_events",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("event_key", sa.String(191), nullable=False),
+        sa.Column("event", sa.String(100), nullable=False),
+        sa.Column("reference", sa.String(255)),
+        sa.Column("payload", sa.Text(), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("error", sa.Text()),
+        sa.Column("received_at", sa.DateTime(), nullable=False),
+        sa.Column("processed_at", sa.DateTime()),
+        sa.UniqueConstraint("event_key"),
+    )
+    op.create_index("ix_paystack_events_id", "paystack_events", ["id"])
+    op.create_index("ix_paystack_events_reference", "paystack_events", ["reference"])
+    op.create_index("ix_paystack_events_status_received_at", "paystack_events", ["status", "received_at"])
+
+def downgrade() -> None:
+    op.drop_table("paystack_events")
@@ -0,0 +1,31 @@
+"""data_versions change counters
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+
+One row per table whose changes caches need to notice across workers,
+bumped in the same transaction as the change. The "orders" row starts at 0
+and is created by the first order written after the upgrade.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    if not op.get_context().as_sql and sa.inspect(op.get_bind()).has_table("data_versions"):
+        return
+    op.create_table(
+        "data_versions",
+        sa.Column("name", sa.String(50), primary_key=True),
+        sa.Column("version", sa.Integer(), nullable=False),
+    )
+
+def downgrade() -> None:
+    op.drop_table("data_versions")
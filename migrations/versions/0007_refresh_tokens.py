@@ -0,0 +1,52 @@
+"""refresh_tokens table and its cleanup indexes
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+
+Databases where Base.metadata.create_all already made the table only get
+the expires_at and revoked_at indexes utils.token_cleanup deletes by.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CLEANUP_INDEXES = [
+    ("ix_refresh_tokens_expires_at", ["expires_at"]),
+    ("ix_refresh_tokens_revoked_at", ["revoked_at"]),
+]
+
+def existing_indexes() -> set:
+    if op.get_context().as_sql:
+        return set()
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("refresh_tokens")}
+
+def upgrade() -> None:
+    if op.get_context().as_sql or not sa.inspect(op.get_bind()).has_table("refresh_tokens"):
+        op.create_table(
+            "refresh_tokens",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("token_hash", sa.String(64), nullable=False),
+            sa.Column("family_id", sa.String(32), nullable=False),
+            sa.Column("expires_at", sa.DateTime(), nullable=False),
+            sa.Column("revoked_at", sa.DateTime()),
+            sa.Column("created_at", sa.DateTime()),
+            sa.UniqueConstraint("token_hash"),
+        )
+        op.create_index("ix_refresh_tokens_id", "refresh_tokens", ["id"])
+        op.create_index("ix_refresh_tokens_user_id", "refresh_tokens", ["user_id"])
+        op.create_index("ix_refresh_tokens_family_id", "refresh_tokens", ["family_id"])
+    existing = existing_indexes()
+    for name, columns in CLEANUP_INDEXES:
+        if name not in existing:
+            op.create_index(name, "refresh_tokens", columns)
+
+def downgrade() -> None:
+    op.drop_table("refresh_tokens")
@@ -0,0 +1,59 @@
+"""menu_changes log numbered by the data_versions "menu" counter
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+
+Creates the change log if it is missing. An existing log gets a version
+column backfilled from its ids, which is the order clients have synced by
+so far, and the "menu" counter starts at the highest one. The API seeds an
+empty log with every category and item at startup.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+START_COUNTER = """
+INSERT INTO data_versions (name, version)
+SELECT 'menu', COALESCE(MAX(version), 0) FROM menu_changes
+WHERE NOT EXISTS (SELECT 1 FROM data_versions WHERE name = 'menu')
+"""
+
+def existing_columns() -> set:
+    if op.get_context().as_sql:
+        return set()
+    return {column["name"] for column in sa.inspect(op.get_bind()).get_columns("menu_changes")}
+
+def upgrade() -> None:
+    if op.get_context().as_sql or not sa.inspect(op.get_bind()).has_table("menu_changes"):
+        op.create_table(
+            "menu_changes",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("version", sa.Integer(), nullable=False),
+            sa.Column("entity", sa.String(20), nullable=False),
+            sa.Column("entity_id", sa.Integer(), nullable=False),
+            sa.Column("action", sa.String(10), nullable=False),
+            sa.Column("created_at", sa.DateTime()),
+            sa.UniqueConstraint("version", name="uq_menu_changes_version"),
+        )
+        op.create_index("ix_menu_changes_id", "menu_changes", ["id"])
+    elif "version" not in existing_columns():
+        with op.batch_alter_table("menu_changes") as batch:
+            batch.add_column(sa.Column("version", sa.Integer()))
+        op.execute("UPDATE menu_changes SET version = id")
+        with op.batch_alter_table("menu_changes") as batch:
+            batch.alter_column("version", existing_type=sa.Integer(), nullable=False)
+            batch.create_unique_constraint("uq_menu_changes_version", ["version"])
+    op.execute(START_COUNTER)
+
+def downgrade() -> None:
+    with op.batch_alter_table("menu_changes") as batch:
+        batch.drop_constraint("uq_menu_changes_version", type_="unique")
+        batch.drop_column("version")
+    op.execute("DELETE FROM data_versions WHERE name = 'menu'")
@@ -0,0 +1,31 @@
+"""job_leases table
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+
+One row per scheduled job, naming the API worker that runs it and until
+when; see utils.job_lease.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    if not op.get_context().as_sql and sa.inspect(op.get_bind()).has_table("job_leases"):
+        return
+    op.create_table(
+        "job_leases",
+        sa.Column("name", sa.String(50), primary_key=True),
+        sa.Column("owner", sa.String(100), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+    )
+
+def downgrade() -> None:
+    op.drop_table("job_leases")
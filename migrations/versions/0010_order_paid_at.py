@@ -0,0 +1,30 @@
+"""orders.paid_at
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18
+
+When mark_order_paid recorded the payment; menu_item_sales buckets are
+keyed by it. Orders paid earlier keep it NULL and are counted at their
+created_at by `python rebuild_menu_item_sales.py`.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    if not op.get_context().as_sql:
+        columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("orders")}
+        if "paid_at" in columns:
+            return
+    op.add_column("orders", sa.Column("paid_at", sa.DateTime()))
+
+def downgrade() -> None:
+    with op.batch_alter_table("orders") as batch_op:
+        batch_op.drop_column("paid_at")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, JSON, Table, Text
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Boolean, JSON, Table, Text, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -21,6 +21,21 @@ class User(Base):
     # Relationships
     notifications = relationship("Notification", back_populates="user")
     orders = relationship("Order", back_populates="user")
+    refresh_tokens = relationship("RefreshToken", back_populates="user", cascade="all, delete-orphan")
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    token_hash = Column(String(64), unique=True, nullable=False)  # SHA-256 of the token
+    family_id = Column(String(32), nullable=False, index=True)  # shared by every rotation of one signin
+    expires_at = Column(DateTime, nullable=False, index=True)  # pruned once past, see utils.token_cleanup
+    revoked_at = Column(DateTime, nullable=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relationships
+    user = relationship("User", back_populates="refresh_tokens")
 
 class Category(Base):
     __tablename__ = "categories"
@@ -51,6 +66,22 @@ class MenuItem(Base):
     # Relationships
     category = relationship("Category", back_populates="menu_items")
 
+class MenuChange(Base):
+    """Append-only log of menu edits, numbered by the "menu" data_versions counter.
+
+    Deleted items and categories keep a row here (action="delete"), which is
+    what lets clients sync deletions incrementally.
+    """
+    __tablename__ = "menu_changes"
+    __table_args__ = (UniqueConstraint("version", name="uq_menu_changes_version"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    version = Column(Integer, nullable=False)  # what clients sync by, in commit order
+    entity = Column(String(20), nullable=False)  # "item" or "category"
+    entity_id = Column(Integer, nullable=False)
+    action = Column(String(10), nullable=False)  # "upsert" or "delete"
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class PromoCode(Base):
     __tablename__ = "promo_codes"
 
@@ -66,6 +97,10 @@ class PromoCode(Base):
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        # A user's unread notifications, newest first
+        Index("ix_notifications_user_id_read_created_at", "user_id", "read", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -80,6 +115,15 @@ class Notification(Base):
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # Order history for one user, newest first
+        Index("ix_orders_user_id_created_at", "user_id", "created_at"),
+        # Admin listing filtered by status and/or payment status, newest first
+        Index("ix_orders_status_created_at", "status", "created_at"),
+        Index("ix_orders_payment_status_created_at", "payment_status", "created_at"),
+        # Unfiltered admin listing and keyset pagination on (created_at, id)
+        Index("ix_orders_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     reference = Column(String(255), unique=True, nullable=False)
@@ -89,16 +133,20 @@ class Order(Base):
     final_amount = Column(Float, nullable=False)
     status = Column(String(50), default="pending")
     payment_status = Column(String(50), default="pending")
-    payment_reference = Column(String(255))
+    payment_reference = Column(String(255), index=True)  # webhook and verify-payment lookups
     items = Column(Text)  # JSON string
     email = Column(String(255))
     name = Column(String(255))
     phone = Column(String(50))
     address = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
+    paid_at = Column(DateTime)  # set by utils.payments.mark_order_paid
     
     # Relationship
     user = relationship("User", back_populates="orders")
+    line_items = relationship(
+        "OrderItem", back_populates="order", cascade="all, delete-orphan", order_by="OrderItem.id"
+    )
 
     @property
     def order_items(self):
@@ -114,3 +162,104 @@ class Order(Base):
     def order_items(self, items):
         """Convert Python list to JSON string for storage"""
         self.items = json.dumps(items if items is not None else [])
+
+class OrderItem(Base):
+    """One line of an order, with the item's name and price as they were when ordered.
+
+    Replaces parsing Order.items for reads and makes item-level reporting
+    plain indexed SQL. menu_item_id is deliberately not a foreign key: the
+    line must survive the menu item being deleted.
+    """
+    __tablename__ = "order_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
+    menu_item_id = Column(Integer, nullable=False, index=True)
+    name = Column(String(255), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    unit_price = Column(Float, nullable=False)
+    image = Column(String(255), nullable=True)
+
+    order = relationship("Order", back_populates="line_items")
+
+class SalesDaily(Base):
+    """Daily order totals split by status and payment status.
+
+    Kept in step with `orders` by utils.order_stats, so sales reports and
+    estimated admin totals never scan the orders table.
+    """
+    __tablename__ = "sales_daily"
+    __table_args__ = (UniqueConstraint("day", "status", "payment_status", name="uq_sales_daily"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)
+    status = Column(String(50), nullable=False)
+    payment_status = Column(String(50), nullable=False)
+    order_count = Column(Integer, nullable=False, default=0)
+    gross = Column(Float, nullable=False, default=0)  # sum of Order.amount
+    delivery_fees = Column(Float, nullable=False, default=0)  # sum of Order.delivery_fee
+    net = Column(Float, nullable=False, default=0)  # sum of Order.final_amount
+
+class DataVersion(Base):
+    """A counter bumped in the same transaction as every change to a table.
+
+    Lets each worker tell whether something it cached is still current with
+    one primary-key read, whichever worker made the change.
+    """
+    __tablename__ = "data_versions"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class MenuItemSales(Base):
+    """Quantity of a menu item sold in paid orders per hour or per day bucket.
+
+    Maintained by utils.item_sales when an order is paid; feeds the
+    best-seller shelf without touching orders.
+    """
+    __tablename__ = "menu_item_sales"
+    __table_args__ = (
+        UniqueConstraint("granularity", "bucket_start", "menu_item_id", name="uq_menu_item_sales"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    granularity = Column(String(10), nullable=False)  # "hour" or "day"
+    bucket_start = Column(DateTime, nullable=False)
+    menu_item_id = Column(Integer, nullable=False, index=True)
+    quantity = Column(Integer, nullable=False, default=0)
+
+class PaystackEvent(Base):
+    """Verified Paystack webhook deliveries, one row per event.
+
+    The webhook stores the raw body and acknowledges at once;
+    utils.webhook_events applies it in the background. The unique event_key
+    turns Paystack's redeliveries into no-ops.
+    """
+    __tablename__ = "paystack_events"
+    __table_args__ = (
+        # Pending events to replay at startup, oldest first
+        Index("ix_paystack_events_status_received_at", "status", "received_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_key = Column(String(191), nullable=False, unique=True)  # "<event>:<data.id>"
+    event = Column(String(100), nullable=False)
+    reference = Column(String(255), index=True)
+    payload = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending, processed, ignored, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+    received_at = Column(DateTime, nullable=False)
+    processed_at = Column(DateTime)
+
+class JobLease(Base):
+    """Which API worker runs a scheduled job, until `expires_at`.
+
+    Every worker schedules the job, but only the one holding the lease runs
+    it; see utils.job_lease.
+    """
+    __tablename__ = "job_leases"
+
+    name = Column(String(50), primary_key=True)
+    owner = Column(String(100), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
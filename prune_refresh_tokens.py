@@ -0,0 +1,32 @@
+"""Delete expired refresh tokens and long-revoked ones.
+
+The API also does this on a schedule (REFRESH_TOKEN_PRUNE_INTERVAL); run it
+by hand after disabling the job, or to clear a backlog at once.
+
+    python prune_refresh_tokens.py                     # settings defaults
+    python prune_refresh_tokens.py --retention-days 1 --batch-size 5000
+"""
+import argparse
+import asyncio
+from datetime import timedelta
+from time import perf_counter
+
+from database import engine
+from utils import token_cleanup
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--retention-days", type=float, help="days revoked tokens are kept")
+    parser.add_argument("--batch-size", type=int, help="rows deleted per transaction")
+    args = parser.parse_args()
+
+    start = perf_counter()
+    stats = await token_cleanup.prune(
+        batch_size=args.batch_size,
+        retention=timedelta(days=args.retention_days) if args.retention_days is not None else None
+    )
+    await engine.dispose()
+    print(f"Deleted {stats['deleted']} refresh tokens in {perf_counter() - start:.2f}s")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,33 @@
+"""Regenerate the best-seller counters (menu_item_sales) from paid orders.
+
+Run after importing historical orders or to repair drift. Buckets are
+keyed by when each order was paid, or placed for orders paid before that
+was recorded. The API itself drops hourly buckets older than
+MENU_POPULAR_HOURLY_RETENTION (MENU_POPULAR_PRUNE_INTERVAL).
+
+    python rebuild_menu_item_sales.py                              # everything
+    python rebuild_menu_item_sales.py --from 2026-01-01 --to 2026-03-31
+"""
+import argparse
+import asyncio
+from datetime import date
+from time import perf_counter
+
+from database import AsyncSessionLocal, engine
+from utils import item_sales
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, help="first day, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, help="last day, YYYY-MM-DD")
+    args = parser.parse_args()
+
+    start = perf_counter()
+    async with AsyncSessionLocal() as db:
+        rows = await item_sales.rebuild(db, args.start, args.end)
+    await engine.dispose()
+    print(f"Wrote {rows} counter rows for {args.start or 'the beginning'} to {args.end or 'today'} "
+          f"in {perf_counter() - start:.2f}s")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,31 @@
+"""Recompute the sales_daily rollup from the orders table.
+
+Use after bulk edits made outside the API, or to repair drift. Days outside
+the range are left untouched.
+
+    python rebuild_sales_daily.py                              # everything
+    python rebuild_sales_daily.py --from 2026-01-01 --to 2026-03-31
+"""
+import argparse
+import asyncio
+from datetime import date
+from time import perf_counter
+
+from database import AsyncSessionLocal, engine
+from utils import order_stats
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, help="first day, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, help="last day, YYYY-MM-DD")
+    args = parser.parse_args()
+
+    start = perf_counter()
+    async with AsyncSessionLocal() as db:
+        await order_stats.rebuild(db, args.start, args.end)
+    await engine.dispose()
+    print(f"Rebuilt sales_daily for {args.start or 'the beginning'} to {args.end or 'today'} "
+          f"in {perf_counter() - start:.2f}s")
+
+if __name__ == "__main__":
+    asyncio.run(main())
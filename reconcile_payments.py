@@ -0,0 +1,48 @@
+"""Verify stale pending orders with Paystack and mark confirmed ones paid.
+
+For orders whose webhook never arrived; orders Paystack reports failed or
+abandoned are marked failed. The API also does this on a schedule
+(RECONCILE_INTERVAL), in one worker at a time; run it by hand to catch up
+after an outage, or from cron with RECONCILE_INTERVAL=0.
+
+    python reconcile_payments.py                         # settings defaults
+    python reconcile_payments.py --min-age 10 --max-age 2880 --concurrency 16
+    python reconcile_payments.py --dry-run --limit 500   # verify only
+"""
+import argparse
+import asyncio
+import json
+from datetime import timedelta
+
+from database import engine
+from utils import paystack, reconciliation
+
+def report(stats: dict):
+    print(f"scanned {stats['scanned']}, paid {stats['paid']}, failed {stats['failed']}, errors {stats['errors']}, "
+          f"{stats['orders_per_second']:.1f} orders/s")
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--min-age", type=float, help="minutes an order must have been pending")
+    parser.add_argument("--max-age", type=float, help="minutes; older pending orders are skipped")
+    parser.add_argument("--concurrency", type=int, help="Paystack verifications in flight")
+    parser.add_argument("--batch-size", type=int, help="orders verified and updated together")
+    parser.add_argument("--limit", type=int, help="stop after this many orders")
+    parser.add_argument("--dry-run", action="store_true", help="verify only, change nothing")
+    args = parser.parse_args()
+
+    stats = await reconciliation.reconcile(
+        min_age=timedelta(minutes=args.min_age) if args.min_age is not None else None,
+        max_age=timedelta(minutes=args.max_age) if args.max_age is not None else None,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        limit=args.limit,
+        dry_run=args.dry_run,
+        progress=report
+    )
+    await paystack.client.close()
+    await engine.dispose()
+    print(json.dumps(stats, default=str, indent=2))
+
+if __name__ == "__main__":
+    asyncio.run(main())
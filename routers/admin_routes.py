@@ -1,11 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
-from database import get_db
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, get_pool_stats
 from models import User
-from schemas import UserUpdate, UserResponse, ProfileUpdate, PasswordUpdate
-from typing import List
-from .auth_routes import get_current_user
-from .auth import verify_password, hash_password
+from schemas import UserUpdate, UserResponse, ProfileUpdate, PasswordUpdate, SalesReportResponse, PrepListResponse
+from typing import List, Literal, Optional
+from datetime import date
+from .auth_routes import (
+    get_current_user, get_current_db_user, evict_principal, revoke_refresh_tokens,
+    principal_cache, Principal
+)
+from .auth import verify_password, hash_password, get_hashing_stats
+from utils import menu_search, order_stats, related_items, prep_list, paystack, webhook_events, reconciliation
 import os
 from pathlib import Path
 import shutil
@@ -16,7 +22,15 @@ router = APIRouter(
 )
 
 # Admin middleware
-async def get_admin_user(current_user: User = Depends(get_current_user)):
+async def get_admin_user(current_user: Principal = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admin users can access this resource"
+        )
+    return current_user
+
+async def get_admin_db_user(current_user: User = Depends(get_current_db_user)):
     if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -26,8 +40,8 @@ async def get_admin_user(current_user: User = Depends(get_current_user)):
 
 @router.get("/users")
 async def get_users(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     try:
         if current_user.role != "admin":
@@ -36,7 +50,8 @@ async def get_users(
                 detail="Not authorized to access this resource"
             )
         
-        users = db.query(User).all()
+        result = await db.execute(select(User))
+        users = result.scalars().all()
         # Format user data
         formatted_users = [{
             "id": user.id,
@@ -64,14 +79,14 @@ async def get_users(
 @router.get("/users/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """Get a specific user by ID (Admin only)"""
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -81,23 +96,26 @@ async def get_user(
 async def update_user(
     user_id: int,
     user_data: UserUpdate,
-    current_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
+    previous_email = user.email
+
     # Update user fields
     if user_data.email is not None:
         # Check if email is already taken by another user
-        existing_user = db.query(User).filter(
+        result = await db.execute(select(User).where(
             User.email == user_data.email,
             User.id != user_id
-        ).first()
+        ))
+        existing_user = result.scalars().first()
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -111,7 +129,9 @@ async def update_user(
     if user_data.role is not None:
         # Prevent changing the role of the last admin
         if user.role == "admin" and user_data.role != "admin":
-            admin_count = db.query(User).filter(User.role == "admin").count()
+            admin_count = await db.scalar(
+                select(func.count()).select_from(User).where(User.role == "admin")
+            )
             if admin_count <= 1:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -122,17 +142,18 @@ async def update_user(
     if user_data.status is not None:
         user.status = user_data.status
     
-    db.commit()
+    await db.commit()
+    evict_principal(previous_email, user.email)
     
     return UserResponse.from_db_model(user)
 
 @router.patch("/users/{user_id}/status", response_model=UserResponse)
 async def toggle_user_status(
     user_id: int,
-    current_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -141,17 +162,18 @@ async def toggle_user_status(
     
     # Toggle status
     user.status = "inactive" if user.status == "active" else "active"
-    db.commit()
+    await db.commit()
+    evict_principal(user.email)
     
     return UserResponse.from_db_model(user)
 
 @router.delete("/users/{user_id}")
 async def delete_user(
     user_id: int,
-    current_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -160,7 +182,9 @@ async def delete_user(
     
     # Prevent deleting the last admin
     if user.role == "admin":
-        admin_count = db.query(User).filter(User.role == "admin").count()
+        admin_count = await db.scalar(
+            select(func.count()).select_from(User).where(User.role == "admin")
+        )
         if admin_count <= 1:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -174,33 +198,125 @@ async def delete_user(
             detail="Cannot delete your own account"
         )
     
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
+    evict_principal(user.email)
     
     return {"message": "User deleted successfully"}
 
+@router.get("/metrics/db-pool")
+async def get_db_pool_metrics(current_user: Principal = Depends(get_admin_user)):
+    """Connection pool usage for the worker serving this request"""
+    return get_pool_stats()
+
+@router.get("/metrics/password-hashing")
+async def get_password_hashing_metrics(current_user: Principal = Depends(get_admin_user)):
+    """bcrypt cost and executor load for this worker"""
+    return get_hashing_stats()
+
+@router.get("/metrics/principal-cache")
+async def get_principal_cache_metrics(current_user: Principal = Depends(get_admin_user)):
+    """Hit/miss counters for the authenticated-user cache of this worker"""
+    return principal_cache.stats()
+
+@router.get("/metrics/menu-search")
+async def get_menu_search_metrics(current_user: Principal = Depends(get_admin_user)):
+    """Size and result-cache counters of this worker's menu search index"""
+    return menu_search.index.stats()
+
+@router.get("/metrics/related-items")
+async def get_related_items_metrics(current_user: Principal = Depends(get_admin_user)):
+    """Size, memory and last rebuild time of this worker's co-occurrence matrix"""
+    return related_items.index.stats
+
+@router.get("/metrics/paystack")
+async def get_paystack_metrics(current_user: Principal = Depends(get_admin_user)):
+    """Retries, failures and latency of this worker's Paystack client"""
+    return paystack.client.stats()
+
+@router.get("/metrics/webhooks")
+async def get_webhook_metrics(
+    current_user: Principal = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Queue depth and processing lag of this worker's webhook pool, plus the
+    pending backlog across all workers"""
+    return {**webhook_events.processor.stats(), **await webhook_events.processor.backlog(db)}
+
+@router.get("/metrics/reconciliation")
+async def get_reconciliation_metrics(current_user: Principal = Depends(get_admin_user)):
+    """Schedule and last run totals of this worker's payment reconciliation"""
+    return reconciliation.stats()
+
+@router.post("/related-items/rebuild")
+async def rebuild_related_items(
+    current_user: Principal = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Recount "frequently bought together" from every paid order (this worker only)"""
+    return await related_items.index.rebuild(db)
+
+@router.get("/reports/sales", response_model=SalesReportResponse)
+async def get_sales_report(
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+    granularity: Literal["day", "week", "month"] = "day",
+    current_user: Principal = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Order count, gross, delivery fees and net per period, split by status
+    and payment status. Reads the sales_daily rollup only."""
+    if end < start:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="'to' must not be before 'from'"
+        )
+    return await order_stats.sales_report(db, start, end, granularity)
+
+@router.get("/kitchen/prep-list", response_model=PrepListResponse)
+async def get_prep_list(
+    day: Optional[date] = Query(None, alias="date", description="Only orders placed on this day (UTC)"),
+    order_status: Optional[str] = Query(None, alias="status", description="Comma-separated statuses; defaults to pending,processing"),
+    current_user: Principal = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Total quantity per menu item across open orders, for the bakers' morning list"""
+    statuses = [value.strip() for value in order_status.split(",") if value.strip()] if order_status else list(prep_list.OPEN_STATUSES)
+    invalid = [value for value in statuses if value not in prep_list.ORDER_STATUSES]
+    if invalid or not statuses:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid status value: {', '.join(invalid) or order_status}"
+        )
+    return {
+        "day": day,
+        "statuses": sorted(set(statuses)),
+        "items": await prep_list.prep_list(db, day, statuses),
+    }
+
 # Profile routes
 @router.get("/profile", response_model=UserResponse)
-async def get_admin_profile(current_user: User = Depends(get_admin_user)):
+async def get_admin_profile(current_user: User = Depends(get_admin_db_user)):
     return UserResponse.from_db_model(current_user)
 
 @router.put("/profile", response_model=UserResponse)
 async def update_admin_profile(
     profile_data: ProfileUpdate,
-    current_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_admin_db_user),
+    db: AsyncSession = Depends(get_db)
 ):
     current_user.fullname = profile_data.fullname
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(current_user)
+    evict_principal(current_user.email)
     
     return UserResponse.from_db_model(current_user)
 
 @router.post("/profile/avatar")
 async def update_admin_avatar(
     file: UploadFile = File(...),
-    current_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_admin_db_user),
+    db: AsyncSession = Depends(get_db)
 ):
     # Create uploads directory if it doesn't exist
     upload_dir = Path("uploads/avatars")
@@ -217,23 +333,25 @@ async def update_admin_avatar(
     
     # Update user's image path in database
     current_user.image = f"/uploads/avatars/{file_name}"
-    db.commit()
+    await db.commit()
+    evict_principal(current_user.email)
     
     return {"image_url": current_user.image}
 
 @router.put("/profile/password")
 async def change_admin_password(
     password_data: PasswordUpdate,
-    current_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_admin_db_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    if not verify_password(password_data.current_password, current_user.password):
+    if not await verify_password(password_data.current_password, current_user.password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect"
         )
     
-    current_user.password = hash_password(password_data.new_password)
-    db.commit()
+    current_user.password = await hash_password(password_data.new_password)
+    await revoke_refresh_tokens(db, user_id=current_user.id)
+    await db.commit()
     
     return {"message": "Password updated successfully"} 
\ No newline at end of file
@@ -1,21 +1,74 @@
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from typing import Optional
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
+from concurrent.futures import ThreadPoolExecutor
+from config import get_settings
+import asyncio
+import hashlib
+import secrets
+
+settings = get_settings()
+
+def make_password_context(rounds: int) -> CryptContext:
+    """bcrypt context that flags any hash not using exactly `rounds` for rehash"""
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = make_password_context(settings.BCRYPT_ROUNDS)
+
+# bcrypt runs on its own small pool so it never blocks the event loop or
+# starves the threadpool FastAPI uses for sync dependencies
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="bcrypt"
+)
+_pending_hashes = 0
 
 # JWT settings
 SECRET_KEY = "your-secret-key-here"  # In production, use a secure secret key
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = settings.REFRESH_TOKEN_EXPIRE_DAYS
+
+async def _run_hash(func, *args):
+    global _pending_hashes
+    if _pending_hashes >= settings.PASSWORD_HASH_QUEUE_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again",
+            headers={"Retry-After": "1"},
+        )
+    _pending_hashes += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+    finally:
+        _pending_hashes -= 1
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    return await _run_hash(pwd_context.hash, password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run_hash(pwd_context.verify, plain_password, hashed_password)
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password and return a new hash if the stored one uses a different cost"""
+    return await _run_hash(pwd_context.verify_and_update, plain_password, hashed_password)
+
+def get_hashing_stats() -> dict:
+    return {
+        "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+        "workers": settings.PASSWORD_HASH_WORKERS,
+        "pending": _pending_hashes,
+        "queue_limit": settings.PASSWORD_HASH_QUEUE_LIMIT,
+    }
 
 def create_jwt_token(data: dict) -> str:
     to_encode = data.copy()
@@ -24,9 +77,20 @@ def create_jwt_token(data: dict) -> str:
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def hash_refresh_token(token: str) -> str:
+    # Refresh tokens are 256 random bits, so a fast hash is enough to make a
+    # leaked table useless without paying for bcrypt on every renewal
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def generate_refresh_token() -> Tuple[str, str, datetime]:
+    """Return a new refresh token, its stored hash and its expiry"""
+    token = secrets.token_urlsafe(32)
+    expires_at = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    return token, hash_refresh_token(token), expires_at
+
 def verify_token(token: str) -> Optional[dict]:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
     except JWTError:
-        return None 
\ No newline at end of file
+        return None
@@ -1,10 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Security
 from fastapi.security import OAuth2PasswordBearer, HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
-from models import User
-from schemas import UserSignup, UserSignin
-from .auth import hash_password, verify_password, create_jwt_token, verify_token
+from models import User, RefreshToken
+from schemas import UserSignup, UserSignin, TokenRefresh
+from .auth import (
+    hash_password, verify_and_update_password, create_jwt_token, verify_token,
+    generate_refresh_token, hash_refresh_token
+)
+from utils.cache import TTLCache
+from config import get_settings
+from dataclasses import dataclass
+from datetime import datetime
+from uuid import uuid4
+
+settings = get_settings()
 
 router = APIRouter(
     prefix="/auth",
@@ -14,10 +25,31 @@ router = APIRouter(
 # Configure security scheme
 security = HTTPBearer()
 
+@dataclass(frozen=True)
+class Principal:
+    """Authenticated user as resolved from a token"""
+    id: int
+    email: str
+    role: str
+    status: str
+
+# Resolved principals keyed by token subject (email). Entries are evicted
+# explicitly when an admin or the user changes the account, and expire after
+# PRINCIPAL_CACHE_TTL seconds so other workers converge as well.
+principal_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL
+)
+
+def evict_principal(*emails: str):
+    for email in emails:
+        if email:
+            principal_cache.pop(email)
+
 # Helper function to get current user
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Security(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     token = credentials.credentials
     payload = verify_token(token)
@@ -36,40 +68,100 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user = db.query(User).filter(User.email == email).first()
+    principal = principal_cache.get(email)
+    if principal is not None:
+        return principal
+
+    result = await db.execute(
+        select(User.id, User.email, User.role, User.status).where(User.email == email)
+    )
+    user = result.first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    principal = Principal(id=user.id, email=user.email, role=user.role, status=user.status)
+    principal_cache.set(email, principal)
+    return principal
+
+# Helper function for routes that read or modify the user's own row
+async def get_current_db_user(
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+) -> User:
+    user = await db.get(User, current_user.id)
+    if not user:
+        evict_principal(current_user.email)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
+def issue_refresh_token(db: AsyncSession, user_id: int, family_id: str = None) -> str:
+    """Add a refresh token row to the session and return the raw token"""
+    token, token_hash, expires_at = generate_refresh_token()
+    db.add(RefreshToken(
+        user_id=user_id,
+        token_hash=token_hash,
+        family_id=family_id or uuid4().hex,
+        expires_at=expires_at
+    ))
+    return token
+
+async def revoke_refresh_tokens(db: AsyncSession, user_id: int = None, family_id: str = None):
+    """Revoke every live refresh token of a user or of one signin family"""
+    query = update(RefreshToken).where(RefreshToken.revoked_at.is_(None))
+    if user_id is not None:
+        query = query.where(RefreshToken.user_id == user_id)
+    if family_id is not None:
+        query = query.where(RefreshToken.family_id == family_id)
+    await db.execute(query.values(revoked_at=datetime.utcnow()))
+
 @router.post("/signup", status_code=status.HTTP_201_CREATED)
-def signup(user: UserSignup, db: Session = Depends(get_db)):
+async def signup(user: UserSignup, db: AsyncSession = Depends(get_db)):
     if user.password != user.confirm_password:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Passwords do not match")
 
-    existing_user = db.query(User).filter(User.email == user.email).first()
+    result = await db.execute(select(User).where(User.email == user.email))
+    existing_user = result.scalars().first()
     if existing_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
     
-    new_user = User(fullname=user.fullname, email=user.email, password=hash_password(user.password))
+    new_user = User(fullname=user.fullname, email=user.email, password=await hash_password(user.password))
     db.add(new_user)
-    db.commit()
+    await db.commit()
     return {"message": "User created successfully"}
 
 @router.post("/signin", status_code=status.HTTP_200_OK)
-def signin(user: UserSignin, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if not db_user or not verify_password(user.password, db_user.password):
+async def signin(user: UserSignin, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(User).where(User.email == user.email))
+    db_user = result.scalars().first()
+    if not db_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    valid, new_hash = await verify_and_update_password(user.password, db_user.password)
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    # Stored hash uses an old bcrypt cost, upgrade it while we have the password
+    if new_hash:
+        db_user.password = new_hash
+
     token = create_jwt_token({"email": db_user.email, "role": db_user.role})
+    refresh_token = issue_refresh_token(db, db_user.id)
+    await db.commit()
     
     # Include the full API URL in the image URL if it exists
     image_url = None
@@ -78,6 +170,7 @@ def signin(user: UserSignin, db: Session = Depends(get_db)):
     
     return {
         "access_token": token,
+        "refresh_token": refresh_token,
         "token_type": "bearer",
         "user": {
             "email": db_user.email,
@@ -85,4 +178,59 @@ def signin(user: UserSignin, db: Session = Depends(get_db)):
             "image": image_url,
             "role": db_user.role
         }
-    } 
\ No newline at end of file
+    }
+
+@router.post("/refresh", status_code=status.HTTP_200_OK)
+async def refresh(data: TokenRefresh, db: AsyncSession = Depends(get_db)):
+    invalid = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+    result = await db.execute(
+        select(RefreshToken).where(RefreshToken.token_hash == hash_refresh_token(data.refresh_token))
+    )
+    stored = result.scalars().first()
+    if not stored or stored.expires_at < datetime.utcnow():
+        raise invalid
+
+    # Mark the token used; the revoked_at guard makes concurrent use of the
+    # same token lose the race instead of minting two children
+    rotated = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == stored.id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+    )
+    if rotated.rowcount != 1:
+        # An already rotated token was presented again, so it has leaked:
+        # kill the whole family and force a fresh signin
+        await revoke_refresh_tokens(db, family_id=stored.family_id)
+        await db.commit()
+        raise invalid
+
+    user = await db.get(User, stored.user_id)
+    if not user:
+        await db.rollback()
+        raise invalid
+
+    token = create_jwt_token({"email": user.email, "role": user.role})
+    refresh_token = issue_refresh_token(db, user.id, family_id=stored.family_id)
+    await db.commit()
+
+    return {
+        "access_token": token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer"
+    }
+
+@router.post("/logout", status_code=status.HTTP_200_OK)
+async def logout(data: TokenRefresh, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(
+        select(RefreshToken.family_id).where(RefreshToken.token_hash == hash_refresh_token(data.refresh_token))
+    )
+    family_id = result.scalar()
+    if family_id:
+        await revoke_refresh_tokens(db, family_id=family_id)
+        await db.commit()
+    return {"message": "Logged out successfully"}
@@ -1,13 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form, Body
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form, Body, Query, Request, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
-from models import MenuItem, Category, User
+from models import MenuItem, Category
 from schemas import (
     MenuItemCreate, MenuItemUpdate, MenuItemResponse,
-    CategoryCreate, CategoryUpdate, CategoryResponse
+    CategoryCreate, CategoryUpdate, CategoryResponse, MenuChangesResponse,
+    MenuItemBatchResponse, PopularMenuItem, RelatedMenuItem
 )
-from typing import List
-from .auth_routes import get_current_user
+from typing import List, Literal
+from .auth_routes import get_current_user, Principal
+from utils import menu_catalog, menu_bundle, menu_changes, menu_search, item_sales, related_items
+from config import get_settings
 import os
 import shutil
 from uuid import uuid4
@@ -18,6 +22,12 @@ router = APIRouter(
     tags=["menu"]
 )
 
+settings = get_settings()
+MENU_CACHE_CONTROL = (
+    f"public, max-age={settings.MENU_CACHE_MAX_AGE}, "
+    f"stale-while-revalidate={settings.MENU_STALE_WHILE_REVALIDATE}"
+)
+
 # Helper function to save uploaded files
 async def save_upload_file(upload_file: UploadFile) -> str:
     if not upload_file:
@@ -40,14 +50,112 @@ async def save_upload_file(upload_file: UploadFile) -> str:
     
     return f"/{file_path}"
 
+async def publish_menu_changes():
+    """Refresh the in-memory menu after a committed create/update/delete"""
+    try:
+        snapshot = await menu_catalog.rebuild()
+        menu_search.index.sync(snapshot)
+        await menu_bundle.write_bundle(snapshot)
+    except Exception as e:
+        print(f"Error rebuilding menu snapshot: {str(e)}")
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+def menu_response(request: Request, snapshot: menu_catalog.MenuSnapshot, etag: str, payload) -> Response:
+    """JSON response with cache validators, or an empty 304 if the client's copy is current.
+
+    `payload` is only called when a body has to be sent.
+    """
+    headers = {
+        "ETag": etag,
+        "Cache-Control": MENU_CACHE_CONTROL,
+        "X-Menu-Version": str(snapshot.version)
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return JSONResponse(content=payload(), headers=headers)
+
+@router.get("/version")
+async def get_menu_version():
+    """Version of the menu snapshot served by this worker"""
+    snapshot = await menu_catalog.get_snapshot()
+    return {
+        "version": snapshot.version,
+        "built_at": snapshot.built_at,
+        "items": len(snapshot.items),
+        "categories": len(snapshot.categories)
+    }
+
+@router.get("/changes", response_model=MenuChangesResponse)
+async def get_menu_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, gt=0, le=5000),
+    db: AsyncSession = Depends(get_db)
+):
+    """Items and categories created, updated or deleted after version `since`.
+
+    Start with since=0 for the full catalog, then pass back the returned
+    version. Keep calling while has_more is true.
+    """
+    return await menu_changes.get_changes(db, since, limit)
+
+@router.get("/search", response_model=List[MenuItemResponse])
+async def search_menu(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, gt=0, le=100)
+):
+    """Menu items matching `q` by name or description, best matches first.
+
+    Words may be partial ("crois") or slightly misspelt ("crossant").
+    Inactive items are never returned.
+    """
+    snapshot = await menu_catalog.get_snapshot()
+    # Catches up after a background rebuild; a no-op when already current
+    menu_search.index.sync(snapshot)
+    return menu_response(
+        request, snapshot, snapshot.etag(f"search:{limit}:{' '.join(menu_search.tokenize(q))}"),
+        lambda: [
+            snapshot.item_payloads[item_id]
+            for item_id, _ in menu_search.index.search(q, limit) if item_id in snapshot.item_payloads
+        ]
+    )
+
+@router.get("/popular", response_model=List[PopularMenuItem])
+async def get_popular_items(
+    window: Literal["hour", "day", "week", "month"] = "day",
+    limit: int = Query(10, gt=0, le=50),
+    db: AsyncSession = Depends(get_db)
+):
+    """Best-selling active items over the last hour, day, week or month"""
+    snapshot = await menu_catalog.get_snapshot()
+    # Ask for a few extra in case some best sellers were deleted or disabled
+    top = await item_sales.top_items(db, window, limit + 10)
+    popular = [
+        {"item": snapshot.item_payloads[item_id], "quantity": quantity}
+        for item_id, quantity in top
+        if item_id in snapshot.items_by_id and snapshot.items_by_id[item_id].status == "active"
+    ]
+    return JSONResponse(
+        content=popular[:limit],
+        headers={"Cache-Control": f"public, max-age={settings.MENU_POPULAR_CACHE_TTL}"}
+    )
+
 # Category endpoints
 @router.post("/categories", response_model=CategoryResponse, status_code=status.HTTP_201_CREATED)
 async def create_category(
     name: str = Form(...),
     description: str = Form(""),
     image: UploadFile = File(None),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if current_user.role != "admin":
         raise HTTPException(
@@ -64,12 +172,15 @@ async def create_category(
             image=image_path
         )
         db.add(db_category)
-        db.commit()
-        db.refresh(db_category)
+        await db.flush()
+        await menu_changes.record_change(db, menu_changes.CATEGORY, db_category.id)
+        await db.commit()
+        await db.refresh(db_category, ["created_at", "updated_at"])
+        await publish_menu_changes()
         
         return CategoryResponse.from_db_model(db_category)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -77,25 +188,31 @@ async def create_category(
 
 @router.get("/categories", response_model=List[CategoryResponse])
 async def get_categories(
+    request: Request,
     skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
+    limit: int = 100
 ):
-    categories = db.query(Category).offset(skip).limit(limit).all()
-    return [CategoryResponse.from_db_model(category) for category in categories]
+    snapshot = await menu_catalog.get_snapshot()
+    return menu_response(
+        request, snapshot, snapshot.etag(f"categories:{skip}:{limit}"),
+        lambda: [snapshot.category_payloads[category.id] for category in snapshot.categories[skip:skip + limit]]
+    )
 
 @router.get("/categories/{category_id}", response_model=CategoryResponse)
 async def get_category(
     category_id: int,
-    db: Session = Depends(get_db)
+    request: Request
 ):
-    category = db.query(Category).filter(Category.id == category_id).first()
-    if not category:
+    snapshot = await menu_catalog.get_snapshot()
+    if category_id not in snapshot.categories_by_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Category not found"
         )
-    return CategoryResponse.from_db_model(category)
+    return menu_response(
+        request, snapshot, snapshot.category_etag(category_id),
+        lambda: snapshot.category_payloads[category_id]
+    )
 
 @router.put("/categories/{category_id}", response_model=CategoryResponse)
 async def update_category(
@@ -103,8 +220,8 @@ async def update_category(
     name: str = Form(...),
     description: str = Form(""),
     image: UploadFile = File(None),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if current_user.role != "admin":
         raise HTTPException(
@@ -113,7 +230,7 @@ async def update_category(
         )
     
     try:
-        db_category = db.query(Category).filter(Category.id == category_id).first()
+        db_category = await db.get(Category, category_id)
         if not db_category:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -128,12 +245,15 @@ async def update_category(
             image_path = await save_upload_file(image)
             db_category.image = image_path
         
-        db.commit()
-        db.refresh(db_category)
+        await menu_changes.record_change(db, menu_changes.CATEGORY, db_category.id)
+        await db.commit()
+        await db.refresh(db_category, ["updated_at"])
+        counts = await menu_catalog.count_items_by_category(db, [category_id])
+        await publish_menu_changes()
         
-        return CategoryResponse.from_db_model(db_category)
+        return CategoryResponse.from_db_model(db_category, item_count=counts.get(category_id, 0))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -142,8 +262,8 @@ async def update_category(
 @router.delete("/categories/{category_id}")
 async def delete_category(
     category_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if current_user.role != "admin":
         raise HTTPException(
@@ -151,7 +271,7 @@ async def delete_category(
             detail="Only admin users can delete categories"
         )
     
-    db_category = db.query(Category).filter(Category.id == category_id).first()
+    db_category = await db.get(Category, category_id)
     if not db_category:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -159,14 +279,17 @@ async def delete_category(
         )
     
     # Check if category has menu items
-    if len(db_category.menu_items) > 0:
+    counts = await menu_catalog.count_items_by_category(db, [category_id])
+    if counts.get(category_id, 0) > 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cannot delete category with existing menu items"
         )
     
-    db.delete(db_category)
-    db.commit()
+    await db.delete(db_category)
+    await menu_changes.record_change(db, menu_changes.CATEGORY, category_id, menu_changes.DELETE)
+    await db.commit()
+    await publish_menu_changes()
     
     return {"message": "Category deleted successfully"}
 
@@ -179,8 +302,8 @@ async def create_menu_item(
     category_id: int = Form(...),
     status: str = Form("active"),
     image: UploadFile = File(None),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if current_user.role != "admin":
         raise HTTPException(
@@ -189,7 +312,7 @@ async def create_menu_item(
         )
     
     # Verify category exists
-    category = db.query(Category).filter(Category.id == category_id).first()
+    category = await db.get(Category, category_id)
     if not category:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -208,12 +331,17 @@ async def create_menu_item(
             image=image_path
         )
         db.add(db_item)
-        db.commit()
-        db.refresh(db_item)
+        await db.flush()
+        # The category's item count changed too
+        await menu_changes.record_change(db, menu_changes.ITEM, db_item.id)
+        await menu_changes.record_change(db, menu_changes.CATEGORY, category_id)
+        await db.commit()
+        await db.refresh(db_item, ["created_at", "updated_at", "category"])
+        await publish_menu_changes()
         
         return MenuItemResponse.from_db_model(db_item)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -221,38 +349,100 @@ async def create_menu_item(
 
 @router.get("/items", response_model=List[MenuItemResponse])
 async def get_menu_items(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
-    category_id: int = None,
-    db: Session = Depends(get_db)
+    category_id: int = None
 ):
-    query = db.query(MenuItem)
-    if category_id:
-        query = query.filter(MenuItem.category_id == category_id)
-    
-    items = query.offset(skip).limit(limit).all()
-    return [MenuItemResponse.from_db_model(item) for item in items]
+    snapshot = await menu_catalog.get_snapshot()
+
+    def payload():
+        items = snapshot.items
+        if category_id:
+            items = snapshot.items_in_category(category_id)
+        return [snapshot.item_payloads[item.id] for item in items[skip:skip + limit]]
+
+    return menu_response(
+        request, snapshot, snapshot.etag(f"items:{skip}:{limit}:{category_id or ''}"), payload
+    )
+
+@router.get("/items/batch", response_model=MenuItemBatchResponse)
+async def get_menu_items_batch(
+    request: Request,
+    ids: str = Query(..., description="Comma separated menu item ids, e.g. 1,2,3")
+):
+    """Look up several items at once, e.g. to refresh every cart line in one call.
+
+    Answers come from the menu snapshot, which picks up edits made through
+    any worker within MENU_VERSION_CHECK_INTERVAL_MS.
+    """
+    try:
+        item_ids = list(dict.fromkeys(int(item_id) for item_id in ids.split(",") if item_id.strip()))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="ids must be a comma separated list of integers"
+        )
+    if not item_ids or len(item_ids) > settings.MENU_BATCH_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Provide between 1 and {settings.MENU_BATCH_LIMIT} ids"
+        )
+
+    snapshot = await menu_catalog.get_snapshot()
+    return menu_response(
+        request, snapshot, snapshot.etag(f"batch:{','.join(map(str, sorted(item_ids)))}"),
+        lambda: {
+            "items": {
+                item_id: snapshot.item_payloads[item_id]
+                for item_id in item_ids if item_id in snapshot.item_payloads
+            },
+            "missing": [item_id for item_id in item_ids if item_id not in snapshot.item_payloads]
+        }
+    )
 
 @router.get("/items/{item_id}", response_model=MenuItemResponse)
 async def get_menu_item(
     item_id: int,
-    db: Session = Depends(get_db)
+    request: Request
+):
+    snapshot = await menu_catalog.get_snapshot()
+    if item_id not in snapshot.items_by_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Menu item not found"
+        )
+    return menu_response(
+        request, snapshot, snapshot.item_etag(item_id),
+        lambda: snapshot.item_payloads[item_id]
+    )
+
+@router.get("/items/{item_id}/related", response_model=List[RelatedMenuItem])
+async def get_related_items(
+    item_id: int,
+    limit: int = Query(5, gt=0, le=settings.RELATED_ITEMS_TOP_K)
 ):
-    item = db.query(MenuItem).filter(MenuItem.id == item_id).first()
-    if not item:
+    """Active items most often bought together with this one"""
+    snapshot = await menu_catalog.get_snapshot()
+    if item_id not in snapshot.items_by_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Menu item not found"
         )
-    return MenuItemResponse.from_db_model(item)
+    related = [
+        {"item": snapshot.item_payloads[other_id], "orders_together": count}
+        for other_id, count in related_items.index.related(item_id, settings.RELATED_ITEMS_TOP_K)
+        if other_id in snapshot.items_by_id and snapshot.items_by_id[other_id].status == "active"
+    ]
+    return JSONResponse(content=related[:limit])
 
 @router.put("/items/{item_id}", response_model=MenuItemResponse)
 async def update_menu_item(
     item_id: int,
     item_update: str = Form(None),
     image: UploadFile = File(None),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if current_user.role != "admin":
         raise HTTPException(
@@ -260,7 +450,7 @@ async def update_menu_item(
             detail="Only admin users can update menu items"
         )
     
-    db_item = db.query(MenuItem).filter(MenuItem.id == item_id).first()
+    db_item = await db.get(MenuItem, item_id)
     if not db_item:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -276,10 +466,11 @@ async def update_menu_item(
             )
             
         update_data = json.loads(item_update)
+        previous_category_id = db_item.category_id
         
         # If category_id is being updated, verify the new category exists
         if update_data.get('category_id'):
-            category = db.query(Category).filter(Category.id == update_data['category_id']).first()
+            category = await db.get(Category, update_data['category_id'])
             if not category:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
@@ -289,8 +480,9 @@ async def update_menu_item(
         # Update fields from the JSON data
         for field, value in update_data.items():
             if field == 'status':
-                # Convert status string to boolean
-                setattr(db_item, field, value == 'active')
+                # Normalise anything other than 'active' to 'inactive'; the
+                # column is a string, so storing a bool here broke serialization
+                setattr(db_item, field, "active" if value == 'active' else "inactive")
             elif field == 'price':
                 # Ensure price is a float
                 try:
@@ -317,8 +509,13 @@ async def update_menu_item(
             image_path = await save_upload_file(image)
             db_item.image = image_path
         
-        db.commit()
-        db.refresh(db_item)
+        await menu_changes.record_change(db, menu_changes.ITEM, db_item.id)
+        if db_item.category_id != previous_category_id:
+            await menu_changes.record_change(db, menu_changes.CATEGORY, previous_category_id)
+            await menu_changes.record_change(db, menu_changes.CATEGORY, db_item.category_id)
+        await db.commit()
+        await db.refresh(db_item, ["updated_at", "category"])
+        await publish_menu_changes()
         
         return MenuItemResponse.from_db_model(db_item)
     except json.JSONDecodeError:
@@ -327,7 +524,7 @@ async def update_menu_item(
             detail="Invalid JSON data in item_update"
         )
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -336,8 +533,8 @@ async def update_menu_item(
 @router.delete("/items/{item_id}")
 async def delete_menu_item(
     item_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if current_user.role != "admin":
         raise HTTPException(
@@ -345,14 +542,17 @@ async def delete_menu_item(
             detail="Only admin users can delete menu items"
         )
     
-    db_item = db.query(MenuItem).filter(MenuItem.id == item_id).first()
+    db_item = await db.get(MenuItem, item_id)
     if not db_item:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Menu item not found"
         )
     
-    db.delete(db_item)
-    db.commit()
+    await db.delete(db_item)
+    await menu_changes.record_change(db, menu_changes.ITEM, item_id, menu_changes.DELETE)
+    await menu_changes.record_change(db, menu_changes.CATEGORY, db_item.category_id)
+    await db.commit()
+    await publish_menu_changes()
     
     return {"message": "Menu item deleted successfully"} 
\ No newline at end of file
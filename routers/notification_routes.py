@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from database import get_db
 from models import Notification
@@ -13,17 +14,19 @@ router = APIRouter(
 
 @router.get("/")
 async def get_notifications(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     skip: int = 0,
     limit: int = 50
 ):
     """Get all notifications"""
     try:
-        notifications = db.query(Notification)\
-            .order_by(Notification.created_at.desc())\
-            .offset(skip)\
-            .limit(limit)\
-            .all()
+        result = await db.execute(
+            select(Notification)
+            .order_by(Notification.created_at.desc())
+            .offset(skip)
+            .limit(limit)
+        )
+        notifications = result.scalars().all()
         
         return notifications
     except Exception as e:
@@ -35,11 +38,11 @@ async def get_notifications(
 @router.patch("/{notification_id}/read")
 async def mark_as_read(
     notification_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Mark a notification as read"""
     try:
-        notification = db.query(Notification).filter(Notification.id == notification_id).first()
+        notification = await db.get(Notification, notification_id)
         if not notification:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -47,10 +50,10 @@ async def mark_as_read(
             )
         
         notification.read = True
-        db.commit()
+        await db.commit()
         return notification
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
@@ -58,17 +61,19 @@ async def mark_as_read(
 
 @router.patch("/read-all")
 async def mark_all_as_read(
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Mark all notifications as read"""
     try:
-        db.query(Notification)\
-            .filter(Notification.read == False)\
-            .update({"read": True})
-        db.commit()
+        await db.execute(
+            update(Notification)
+            .where(Notification.read == False)
+            .values(read=True)
+        )
+        await db.commit()
         return {"message": "All notifications marked as read"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
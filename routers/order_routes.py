@@ -1,25 +1,26 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Body, Request
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List, Optional, Literal
 from datetime import datetime
 from database import get_db
-from models import Order, User, Notification, PromoCode
+from models import Order, OrderItem, Notification, PromoCode
 from schemas import OrderResponse, OrderCreate, PaginatedOrderResponse
-from routers.auth_routes import get_current_user
+from routers.auth_routes import get_current_user, Principal
+from utils.order_queries import filter_orders, keyset_page, InvalidCursor
+from utils import order_stats, order_export, paystack, payments, webhook_events
+from config import get_settings
 import json
-import requests
-import os
-from dotenv import load_dotenv
 import uuid
 from pydantic import ValidationError
 import hmac
 import hashlib
 from sqlalchemy.sql import text
 
-load_dotenv()
-PAYSTACK_SECRET_KEY = os.getenv('PAYSTACK_SECRET_KEY')
-
 router = APIRouter()
+settings = get_settings()
 
 # Add this with your other imports
 OrderStatus = Literal["pending", "processing", "completed", "cancelled", "delivered"]
@@ -32,55 +33,39 @@ async def get_admin_orders(
     end_date: Optional[datetime] = None,
     page: int = Query(1, gt=0),
     per_page: int = Query(10, gt=0, le=100),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous response; switches to cursor pagination"),
+    paginate: Literal["page", "cursor"] = "page",
+    count: Optional[Literal["exact", "cached", "estimated"]] = Query(None, description="How to compute total; defaults to ORDER_COUNT_MODE"),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    query = db.query(Order)
-    
-    # Apply filters
-    if status and status != "all":
-        query = query.filter(Order.status == status)
-    if payment_status and payment_status != "all":
-        query = query.filter(Order.payment_status == payment_status)
-    if start_date:
-        query = query.filter(Order.created_at >= start_date)
-    if end_date:
-        query = query.filter(Order.created_at <= end_date)
-    
-    # Add pagination
-    total = query.count()
-    query = query.order_by(Order.created_at.desc())
-    query = query.offset((page - 1) * per_page).limit(per_page)
+    query = filter_orders(select(Order).options(selectinload(Order.line_items)), status, payment_status, start_date, end_date)
+    total, total_kind = await order_stats.count_orders(
+        db, count or settings.ORDER_COUNT_MODE, status, payment_status, start_date, end_date
+    )
     
-    orders = query.all()
+    next_cursor = prev_cursor = None
+    if cursor or paginate == "cursor":
+        # Keyset pagination: every page is an index seek, however deep
+        try:
+            orders, next_cursor, prev_cursor = await keyset_page(db, query, per_page, cursor)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        page = None
+    else:
+        query = query.order_by(Order.created_at.desc(), Order.id.desc())
+        query = query.offset((page - 1) * per_page).limit(per_page)
+        result = await db.execute(query)
+        orders = result.scalars().all()
+
     response_orders = []
     
     for order in orders:
         try:
-            # Parse items JSON to list of OrderItems
-            items = json.loads(order.items) if order.items else []
-            
-            order_dict = {
-                "id": order.id,
-                "reference": order.reference,
-                "user_id": order.user_id,
-                "amount": order.amount,
-                "delivery_fee": order.delivery_fee,
-                "final_amount": order.final_amount,
-                "status": order.status,
-                "payment_status": order.payment_status,
-                "payment_reference": order.payment_reference,
-                "items": items,
-                "created_at": order.created_at,
-                "email": order.email,
-                "name": order.name,
-                "phone": order.phone,
-                "address": order.address
-            }
-            response_orders.append(OrderResponse(**order_dict))
+            response_orders.append(OrderResponse.from_db_model(order))
         except Exception as e:
             print(f"Error processing order {order.id}: {str(e)}")
             continue
@@ -88,43 +73,54 @@ async def get_admin_orders(
     return PaginatedOrderResponse(
         items=response_orders,
         total=total,
+        total_kind=total_kind,
         page=page,
         per_page=per_page,
-        pages=(total + per_page - 1) // per_page
+        pages=(total + per_page - 1) // per_page,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor
+    )
+
+@router.get("/admin/orders/export")
+async def export_admin_orders(
+    format: Literal["csv", "ndjson"] = "csv",
+    status: Optional[str] = None,
+    payment_status: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    current_user: Principal = Depends(get_current_user)
+):
+    """Every order matching the admin list filters, streamed as CSV (one row
+    per order line) or NDJSON (one object per order)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    stream = order_export.stream_csv if format == order_export.CSV else order_export.stream_ndjson
+    filename = f"orders-{datetime.utcnow():%Y%m%d-%H%M%S}.{format}"
+    return StreamingResponse(
+        stream(status=status, payment_status=payment_status, start_date=start_date, end_date=end_date),
+        media_type=order_export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
 
 @router.get("/orders", response_model=List[OrderResponse])
 async def get_user_orders(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    orders = db.query(Order).filter(
-        Order.user_id == current_user.id
-    ).order_by(Order.created_at.desc()).all()
+    result = await db.execute(
+        select(Order)
+        .options(selectinload(Order.line_items))
+        .where(Order.user_id == current_user.id)
+        .order_by(Order.created_at.desc())
+    )
+    orders = result.scalars().all()
     
     # Convert orders to response format
     response_orders = []
     for order in orders:
         try:
-            items = json.loads(order.items) if order.items else []
-            if not isinstance(items, list):
-                items = []
-                
-            response_orders.append(OrderResponse(
-                id=order.id,
-                reference=order.reference,
-                user_id=order.user_id,
-                amount=order.amount,
-                delivery_fee=order.delivery_fee,
-                final_amount=order.final_amount,
-                status=order.status,
-                items=items,
-                created_at=order.created_at,
-                email=order.email,
-                name=order.name,
-                phone=order.phone,
-                address=order.address
-            ))
+            response_orders.append(OrderResponse.from_db_model(order))
         except Exception as e:
             print(f"Error processing order {order.id}: {str(e)}")
             continue
@@ -134,38 +130,39 @@ async def get_user_orders(
 @router.get("/orders/{order_id}", response_model=OrderResponse)
 async def get_order(
     order_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await db.get(Order, order_id, options=[selectinload(Order.line_items)])
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
     if current_user.role != "admin" and order.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    return order
+    return OrderResponse.from_db_model(order)
 
 @router.post("/orders", response_model=OrderResponse)
 async def create_order(
     order: OrderCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     try:
         # Validate promo code if provided
         if order.promo_code:
-            promo = db.query(PromoCode).filter(
+            result = await db.execute(select(PromoCode).where(
                 PromoCode.code == order.promo_code,
                 PromoCode.is_active == True
-            ).first()
+            ))
+            promo = result.scalars().first()
             
             if not promo:
                 raise HTTPException(status_code=400, detail="Invalid promo code")
             
             # Increment usage count
             promo.usage_count += 1
-            db.commit()
+            await db.commit()
 
         # Print incoming data for debugging
         print("Incoming order data:", order.model_dump())
@@ -200,35 +197,28 @@ async def create_order(
             items=json.dumps(formatted_items),
             status="pending",
             payment_status="pending",
-            created_at=datetime.utcnow()
+            created_at=datetime.utcnow(),
+            # Written alongside the JSON column so older readers keep working
+            line_items=[
+                OrderItem(
+                    menu_item_id=item["menu_item_id"],
+                    name=item["name"],
+                    quantity=item["quantity"],
+                    unit_price=item["price"],
+                    image=item["image"]
+                )
+                for item in formatted_items
+            ]
         )
         
         try:
             db.add(db_order)
-            db.commit()
-            db.refresh(db_order)
+            await order_stats.record_order(db, db_order)
+            await db.commit()
             
-            # Convert the order back to response format
-            items = json.loads(db_order.items) if db_order.items else []
-            return OrderResponse(
-                id=db_order.id,
-                reference=db_order.reference,
-                user_id=db_order.user_id,
-                amount=db_order.amount,
-                delivery_fee=db_order.delivery_fee,
-                final_amount=db_order.final_amount,
-                status=db_order.status,
-                payment_status=db_order.payment_status,
-                payment_reference=db_order.payment_reference,
-                items=items,
-                created_at=db_order.created_at,
-                email=db_order.email,
-                name=db_order.name,
-                phone=db_order.phone,
-                address=db_order.address
-            )
+            return OrderResponse.from_db_model(db_order)
         except Exception as db_error:
-            db.rollback()
+            await db.rollback()
             print(f"Database error: {str(db_error)}")
             raise HTTPException(status_code=422, detail=f"Database error: {str(db_error)}")
             
@@ -240,18 +230,22 @@ async def create_order(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/webhook")
-async def paystack_webhook(request: Request, db: Session = Depends(get_db)):
+async def paystack_webhook(request: Request, db: AsyncSession = Depends(get_db)):
     # Get the Paystack signature from headers
     signature = request.headers.get("x-paystack-signature")
     if not signature:
         raise HTTPException(status_code=400, detail="No signature provided")
     
+    if not settings.PAYSTACK_SECRET_KEY:
+        print("Paystack webhook rejected: PAYSTACK_SECRET_KEY is not set")
+        raise HTTPException(status_code=503, detail="Webhook verification is not configured")
+    
     # Get the raw body
     body = await request.body()
     
     # Verify the signature
     computed_hmac = hmac.new(
-        PAYSTACK_SECRET_KEY.encode('utf-8'),
+        settings.PAYSTACK_SECRET_KEY.encode('utf-8'),
         body,
         hashlib.sha512
     ).hexdigest()
@@ -260,74 +254,54 @@ async def paystack_webhook(request: Request, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Invalid signature")
     
     # Parse the webhook payload
-    payload = json.loads(body)
-    event = payload.get("event")
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid payload")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Invalid payload")
     
-    if event == "charge.success":
-        reference = payload["data"]["reference"]
-        
-        # Find and update the order
-        order = db.query(Order).filter(Order.payment_reference == reference).first()
-        if order:
-            order.payment_status = "paid"
-            order.status = "processing"
-            db.commit()
-            
-            # Create a notification for the user
-            notification = Notification(
-                user_id=order.user_id,
-                title="Payment Successful",
-                message=f"Your order #{order.reference} has been paid and is being processed.",
-                type="order"
-            )
-            db.add(notification)
-            db.commit()
-            
-            return {"status": "success"}
+    # Store it and answer right away; webhook_events applies it in the
+    # background, and Paystack's redeliveries of it are no-ops
+    event_id = await webhook_events.record(db, payload, body)
+    webhook_events.processor.enqueue(event_id)
     
-    return {"status": "ignored"}
+    return {"status": "received" if event_id is not None else "duplicate"}
 
 @router.post("/verify-payment/{reference}")
 async def verify_payment(
     reference: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Verify with Paystack
-    headers = {
-        "Authorization": f"Bearer {PAYSTACK_SECRET_KEY}"
-    }
-    
     try:
-        response = requests.get(
-            f"https://api.paystack.co/transaction/verify/{reference}",
-            headers=headers
-        )
+        response = await paystack.client.verify_transaction(reference)
         
         if response.status_code == 200:
             data = response.json()
             if data["data"]["status"] == "success":
                 # Update order
-                order = db.query(Order).filter(
+                result = await db.execute(select(Order).where(
                     Order.payment_reference == reference
-                ).first()
+                ))
+                order = result.scalars().first()
                 
                 if order:
-                    order.payment_status = "paid"
-                    order.status = "processing"
-                    
-                    # Create a notification for the user
-                    notification = Notification(
-                        user_id=order.user_id,
-                        title="Payment Successful",
-                        message=f"Your order #{order.reference} has been paid and is being processed.",
-                        type="order"
-                    )
-                    db.add(notification)
-                    db.commit()
+                    paid = await payments.mark_order_paid(db, order)
+                    await db.commit()
+                    payments.order_paid_committed(paid)
                     
                     return {"status": "success", "message": "Payment verified"}
                 
         raise HTTPException(status_code=400, detail="Payment verification failed")
+    except paystack.PaystackUnavailable as e:
+        # Answer at once instead of waiting on a degraded Paystack; the
+        # reconciliation job settles the order once Paystack recovers
+        print(f"Payment verification error: {str(e)}")
+        return JSONResponse(
+            status_code=202,
+            content={"status": "pending", "message": "Payment provider unavailable, the payment will be reconciled"}
+        )
     except Exception as e:
         print(f"Payment verification error: {str(e)}")
         raise HTTPException(status_code=400, detail="Payment verification failed")
@@ -336,15 +310,15 @@ async def verify_payment(
 async def update_order_status(
     order_id: int,
     status_update: dict = Body(...),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     # Verify admin access
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     
     # Get order
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await db.get(Order, order_id, options=[selectinload(Order.line_items)])
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
@@ -355,9 +329,8 @@ async def update_order_status(
     
     try:
         # Update status
-        order.status = status
-        db.commit()
-        db.refresh(order)
+        await order_stats.change_status(db, order, status=status)
+        await db.commit()
         
         # Create notification for the user
         notification = Notification(
@@ -367,30 +340,14 @@ async def update_order_status(
             type="order"
         )
         db.add(notification)
-        db.commit()
+        await db.commit()
         
         return {
             "message": "Order status updated successfully",
             "status": status,
-            "order": OrderResponse(
-                id=order.id,
-                reference=order.reference,
-                user_id=order.user_id,
-                amount=order.amount,
-                delivery_fee=order.delivery_fee,
-                final_amount=order.final_amount,
-                status=order.status,
-                payment_status=order.payment_status,
-                payment_reference=order.payment_reference,
-                items=json.loads(order.items) if order.items else [],
-                created_at=order.created_at,
-                email=order.email,
-                name=order.name,
-                phone=order.phone,
-                address=order.address
-            )
+            "order": OrderResponse.from_db_model(order)
         }
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Error updating order status: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from database import get_db
-from models import PromoCode, User
+from models import PromoCode
 from schemas import PromoCodeCreate, PromoCodeUpdate, PromoCodeResponse
-from .auth_routes import get_current_user
+from .auth_routes import get_current_user, Principal
 from datetime import datetime, timezone
 from pydantic import BaseModel
 
@@ -19,8 +20,8 @@ router = APIRouter(
 @router.post("/", response_model=PromoCodeResponse)
 async def create_promo_code(
     promo: PromoCodeCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     # Check if user is admin
     if current_user.role != "admin":
@@ -30,7 +31,8 @@ async def create_promo_code(
         )
 
     # Check if promo code already exists
-    existing_promo = db.query(PromoCode).filter(PromoCode.code == promo.code).first()
+    result = await db.execute(select(PromoCode).where(PromoCode.code == promo.code))
+    existing_promo = result.scalars().first()
     if existing_promo:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -48,11 +50,11 @@ async def create_promo_code(
 
     try:
         db.add(db_promo)
-        db.commit()
-        db.refresh(db_promo)
+        await db.commit()
+        await db.refresh(db_promo)
         return PromoCodeResponse.from_db_model(db_promo)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -60,8 +62,8 @@ async def create_promo_code(
 
 @router.get("/", response_model=List[PromoCodeResponse])
 async def get_promo_codes(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     # Check if user is admin
     if current_user.role != "admin":
@@ -70,14 +72,15 @@ async def get_promo_codes(
             detail="Only admins can view all promo codes"
         )
 
-    promos = db.query(PromoCode).all()
+    result = await db.execute(select(PromoCode))
+    promos = result.scalars().all()
     return [PromoCodeResponse.from_db_model(promo) for promo in promos]
 
 @router.get("/{promo_id}", response_model=PromoCodeResponse)
 async def get_promo_code(
     promo_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     # Check if user is admin
     if current_user.role != "admin":
@@ -86,7 +89,7 @@ async def get_promo_code(
             detail="Only admins can view promo code details"
         )
 
-    promo = db.query(PromoCode).filter(PromoCode.id == promo_id).first()
+    promo = await db.get(PromoCode, promo_id)
     if not promo:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -99,8 +102,8 @@ async def get_promo_code(
 async def update_promo_code(
     promo_id: int,
     promo_update: PromoCodeUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     # Check if user is admin
     if current_user.role != "admin":
@@ -110,7 +113,7 @@ async def update_promo_code(
         )
 
     # Get existing promo code
-    promo = db.query(PromoCode).filter(PromoCode.id == promo_id).first()
+    promo = await db.get(PromoCode, promo_id)
     if not promo:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -119,7 +122,8 @@ async def update_promo_code(
 
     # Check if code is being changed and if new code already exists
     if promo_update.code and promo_update.code != promo.code:
-        existing_promo = db.query(PromoCode).filter(PromoCode.code == promo_update.code).first()
+        result = await db.execute(select(PromoCode).where(PromoCode.code == promo_update.code))
+        existing_promo = result.scalars().first()
         if existing_promo:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -132,11 +136,11 @@ async def update_promo_code(
         setattr(promo, field, value)
 
     try:
-        db.commit()
-        db.refresh(promo)
+        await db.commit()
+        await db.refresh(promo)
         return PromoCodeResponse.from_db_model(promo)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -145,8 +149,8 @@ async def update_promo_code(
 @router.delete("/{promo_id}")
 async def delete_promo_code(
     promo_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     # Check if user is admin
     if current_user.role != "admin":
@@ -155,7 +159,7 @@ async def delete_promo_code(
             detail="Only admins can delete promo codes"
         )
 
-    promo = db.query(PromoCode).filter(PromoCode.id == promo_id).first()
+    promo = await db.get(PromoCode, promo_id)
     if not promo:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -163,11 +167,11 @@ async def delete_promo_code(
         )
 
     try:
-        db.delete(promo)
-        db.commit()
+        await db.delete(promo)
+        await db.commit()
         return {"message": "Promo code deleted successfully"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -176,8 +180,8 @@ async def delete_promo_code(
 @router.patch("/{promo_id}/toggle", response_model=PromoCodeResponse)
 async def toggle_promo_status(
     promo_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     # Check if user is admin
     if current_user.role != "admin":
@@ -186,7 +190,7 @@ async def toggle_promo_status(
             detail="Only admins can toggle promo code status"
         )
 
-    promo = db.query(PromoCode).filter(PromoCode.id == promo_id).first()
+    promo = await db.get(PromoCode, promo_id)
     if not promo:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -195,11 +199,11 @@ async def toggle_promo_status(
 
     try:
         promo.is_active = not promo.is_active
-        db.commit()
-        db.refresh(promo)
+        await db.commit()
+        await db.refresh(promo)
         return PromoCodeResponse.from_db_model(promo)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -208,17 +212,18 @@ async def toggle_promo_status(
 @router.post("/validate")
 async def validate_promo_code(
     promo_data: PromoValidateRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Validate a promo code"""
     try:
         now = datetime.now(timezone.utc)
-        promo = db.query(PromoCode).filter(
+        result = await db.execute(select(PromoCode).where(
             PromoCode.code == promo_data.code,
             PromoCode.is_active == True,
             PromoCode.start_date <= now,
             PromoCode.end_date >= now
-        ).first()
+        ))
+        promo = result.scalars().first()
 
         if not promo:
             raise HTTPException(
@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
 from models import User
 from schemas import ProfileUpdate, PasswordUpdate
-from .auth_routes import get_current_user
+from .auth_routes import get_current_db_user, evict_principal, revoke_refresh_tokens
 from .auth import verify_password, hash_password
 import os
 from datetime import datetime
@@ -23,20 +23,21 @@ if not os.path.exists(UPLOAD_DIR):
 @router.put("/profile", status_code=status.HTTP_200_OK)
 async def update_profile(
     profile: ProfileUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_db_user),
+    db: AsyncSession = Depends(get_db)
 ):
     current_user.fullname = profile.fullname
-    db.commit()
+    await db.commit()
+    evict_principal(current_user.email)
     return {"message": "Profile updated successfully"}
 
 @router.put("/password", status_code=status.HTTP_200_OK)
 async def update_password(
     password_data: PasswordUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_db_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    if not verify_password(password_data.current_password, current_user.password):
+    if not await verify_password(password_data.current_password, current_user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Current password is incorrect",
@@ -49,15 +50,16 @@ async def update_password(
             detail="New passwords do not match"
         )
     
-    current_user.password = hash_password(password_data.new_password)
-    db.commit()
+    current_user.password = await hash_password(password_data.new_password)
+    await revoke_refresh_tokens(db, user_id=current_user.id)
+    await db.commit()
     return {"message": "Password updated successfully"}
 
 @router.post("/profile-image", status_code=status.HTTP_200_OK)
 async def upload_profile_image(
     image: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_db_user),
+    db: AsyncSession = Depends(get_db)
 ):
     # Validate file type
     if not image.content_type.startswith("image/"):
@@ -84,7 +86,8 @@ async def upload_profile_image(
     # Update user's image URL in database
     image_url = f"/uploads/{filename}"
     current_user.image = image_url
-    db.commit()
+    await db.commit()
+    evict_principal(current_user.email)
     
     # Return the full URL
     return {"image_url": f"http://localhost:8000{image_url}"} 
\ No newline at end of file
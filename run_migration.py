@@ -1,4 +1,4 @@
-from database import engine
+from database import sync_engine as engine
 from sqlalchemy import text
 
 def check_column_exists(connection, column_name):
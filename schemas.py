@@ -1,9 +1,11 @@
 from pydantic import BaseModel, EmailStr, Field, field_validator
 from typing import Optional, List, Literal, Dict, Any
-from datetime import datetime
+from datetime import date, datetime
 import os
 from dotenv import load_dotenv
 import json
+from sqlalchemy import inspect
+from sqlalchemy.orm import NO_VALUE
 
 # Load environment variables
 load_dotenv()
@@ -19,6 +21,9 @@ class UserSignin(BaseModel):
     email: EmailStr
     password: str
 
+class TokenRefresh(BaseModel):
+    refresh_token: str
+
 class ProfileUpdate(BaseModel):
     fullname: str
 
@@ -88,13 +93,15 @@ class CategoryResponse(CategoryBase):
         from_attributes = True
 
     @classmethod
-    def from_db_model(cls, category, with_count: bool = True):
+    def from_db_model(cls, category, item_count: int = 0):
+        # item_count is passed in (see menu_catalog.count_items_by_category)
+        # so serializing never loads category.menu_items
         return cls(
             id=category.id,
             name=category.name,
             description=category.description,
             image=f"{BACKEND_URL}{category.image}" if category.image else None,
-            item_count=len(category.menu_items) if with_count else 0,
+            item_count=item_count,
             created_at=category.created_at,
             updated_at=category.updated_at
         )
@@ -136,11 +143,43 @@ class MenuItemResponse(MenuItemBase):
             category_id=menu_item.category_id,
             status=menu_item.status,
             image=f"{BACKEND_URL}{menu_item.image}" if menu_item.image else None,
-            category=CategoryResponse.from_db_model(menu_item.category, with_count=False),
+            category=CategoryResponse.from_db_model(menu_item.category),
             created_at=menu_item.created_at,
             updated_at=menu_item.updated_at
         )
 
+class MenuItemBatchResponse(BaseModel):
+    items: Dict[int, MenuItemResponse]
+    missing: List[int] = []
+
+class PopularMenuItem(BaseModel):
+    item: MenuItemResponse
+    quantity: int  # units sold in paid orders during the window
+
+class RelatedMenuItem(BaseModel):
+    item: MenuItemResponse
+    orders_together: int  # paid orders containing both items
+
+class MenuChangesResponse(BaseModel):
+    version: int
+    has_more: bool = False
+    reset: bool = False  # client is ahead of the server, refetch the full menu
+    items: List[MenuItemResponse] = []
+    categories: List[CategoryResponse] = []
+    deleted_item_ids: List[int] = []
+    deleted_category_ids: List[int] = []
+
+class PrepListItem(BaseModel):
+    menu_item_id: int
+    name: str
+    quantity: int
+    order_count: int
+
+class PrepListResponse(BaseModel):
+    day: Optional[date] = None  # None: open orders from any day
+    statuses: List[str]
+    items: List[PrepListItem]
+
 class PromoCodeBase(BaseModel):
     code: str
     discount: str
@@ -255,6 +294,45 @@ class OrderResponse(OrderBase):
     class Config:
         from_attributes = True
 
+    @classmethod
+    def from_db_model(cls, order):
+        # Lines come from order_items when the query loaded them (selectinload);
+        # orders written before that table existed fall back to the JSON column.
+        # Never trigger a lazy load here: it can't run under an async session
+        line_items = inspect(order).attrs.line_items.loaded_value
+        if line_items is not NO_VALUE and line_items:
+            items = [
+                OrderItem(
+                    menu_item_id=line.menu_item_id,
+                    name=line.name,
+                    quantity=line.quantity,
+                    price=line.unit_price,
+                    image=line.image
+                )
+                for line in line_items
+            ]
+        else:
+            items = order.order_items
+            if not isinstance(items, list):
+                items = []
+        return cls(
+            id=order.id,
+            reference=order.reference,
+            user_id=order.user_id,
+            amount=order.amount,
+            delivery_fee=order.delivery_fee,
+            final_amount=order.final_amount,
+            status=order.status,
+            payment_status=order.payment_status,
+            payment_reference=order.payment_reference,
+            items=items,
+            created_at=order.created_at,
+            email=order.email,
+            name=order.name,
+            phone=order.phone,
+            address=order.address
+        )
+
 class OrderFilter(BaseModel):
     status: Optional[str] = None
     payment_status: Optional[str] = None
@@ -266,6 +344,29 @@ class OrderFilter(BaseModel):
 class PaginatedOrderResponse(BaseModel):
     items: List[OrderResponse]
     total: int
-    page: int
+    total_kind: Literal["exact", "cached", "estimated"] = "exact"
+    page: Optional[int] = None  # None in cursor mode
     per_page: int
     pages: int
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+class SalesSplit(BaseModel):
+    order_count: int
+    net: float
+
+class SalesPeriod(BaseModel):
+    period: Optional[date] = None  # first day of the day/week/month; None for totals
+    order_count: int
+    gross: float
+    delivery_fees: float
+    net: float
+    by_status: Dict[str, SalesSplit]
+    by_payment_status: Dict[str, SalesSplit]
+
+class SalesReportResponse(BaseModel):
+    start: date
+    end: date
+    granularity: Literal["day", "week", "month"]
+    periods: List[SalesPeriod]
+    totals: SalesPeriod
@@ -0,0 +1,114 @@
+"""Drives the Paystack circuit breaker with faults injected into fake_paystack.py.
+
+Checks that repeated failures open the circuit, that calls are then refused
+without reaching Paystack, that a half-open probe reopens or closes it,
+that only one probe runs at a time, that the latency budget cuts slow
+calls short, and that /verify-payment answers "pending" at once while the
+circuit is open.
+
+    python -m pytest test_circuit_breaker.py
+"""
+import asyncio
+from time import perf_counter
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from database import sync_engine
+from models import Base, Order, User
+from routers.auth import create_jwt_token
+from utils import circuit_breaker, paystack
+import main
+
+RESET = 0.35  # a little over PAYSTACK_BREAKER_RESET_TIMEOUT
+
+@pytest.fixture
+def fake(use_fake_paystack, override_settings):
+    override_settings(RECONCILE_INTERVAL=0)
+    return use_fake_paystack(
+        PAYSTACK_MAX_RETRIES=1,
+        PAYSTACK_RETRY_BACKOFF=0.01,
+        PAYSTACK_LATENCY_BUDGET=0.4,
+        PAYSTACK_BREAKER_FAILURE_THRESHOLD=3,
+        PAYSTACK_BREAKER_RESET_TIMEOUT=0.3,
+    )
+
+async def fails(client: paystack.PaystackClient, reference: str = "ref") -> type:
+    try:
+        await client.verify_transaction(reference)
+    except paystack.PaystackUnavailable as e:
+        return type(e)
+    return None
+
+def test_breaker(fake):
+    asyncio.run(check_breaker(fake))
+
+async def check_breaker(fake):
+    client = paystack.PaystackClient()
+    breaker = client.breaker
+    try:
+        fake.inject(error_rate=1.0)
+        for _ in range(3):
+            assert await fails(client) is paystack.PaystackUnavailable
+        assert breaker.state == circuit_breaker.OPEN, breaker.stats()
+
+        hits = fake.hits["ref"]
+        start = perf_counter()
+        assert await fails(client) is paystack.PaystackCircuitOpen
+        assert perf_counter() - start < 0.05, "an open circuit must refuse at once"
+        assert fake.hits["ref"] == hits, "an open circuit must not call Paystack"
+
+        # Still failing: the probe reopens the circuit
+        await asyncio.sleep(RESET)
+        assert breaker.state == circuit_breaker.HALF_OPEN
+        assert await fails(client) is paystack.PaystackUnavailable
+        assert breaker.state == circuit_breaker.OPEN and breaker.opened == 2
+
+        # One probe at a time while half-open
+        fake.inject(error_rate=0.0, latency=0.1)
+        await asyncio.sleep(RESET)
+        results = await asyncio.gather(*(fails(client) for _ in range(3)))
+        assert results.count(None) == 1 and results.count(paystack.PaystackCircuitOpen) == 2, results
+        assert breaker.state == circuit_breaker.CLOSED, breaker.stats()
+
+        # Latency budget
+        fake.inject(latency=1.0)
+        start = perf_counter()
+        assert await fails(client) is paystack.PaystackUnavailable
+        assert perf_counter() - start < 0.6, "latency budget not applied"
+        stats = client.stats()
+        assert stats["over_budget"] == 1 and stats["circuit"]["consecutive_failures"] == 1, stats
+    finally:
+        fake.inject(error_rate=0.0, latency=0.0)
+        await client.close()
+
+def test_verify_payment(fake):
+    Base.metadata.drop_all(sync_engine)
+    Base.metadata.create_all(sync_engine)
+    with Session(sync_engine) as db:
+        db.add(User(fullname="Admin", email="admin@example.com", password="x", role="admin"))
+        db.flush()
+        db.add(Order(
+            user_id=1, reference="ord_1", payment_reference="pay_1", items="[]",
+            amount=10, delivery_fee=0, final_amount=10, status="pending", payment_status="pending"
+        ))
+        db.commit()
+
+    headers = {"Authorization": f"Bearer {create_jwt_token({'email': 'admin@example.com', 'role': 'admin'})}"}
+    fake.inject(error_rate=1.0)
+    try:
+        with TestClient(main.app) as client:
+            for _ in range(3):
+                assert client.post("/api/verify-payment/pay_1").status_code == 202
+            hits = fake.hits["pay_1"]
+            start = perf_counter()
+            response = client.post("/api/verify-payment/pay_1")
+            assert perf_counter() - start < 0.1, "open circuit should answer at once"
+            assert response.status_code == 202 and response.json()["status"] == "pending", response.text
+            assert fake.hits["pay_1"] == hits
+
+            circuit = client.get("/api/admin/metrics/paystack", headers=headers).json()["circuit"]
+            assert circuit["state"] == "open" and circuit["rejected"] == 1, circuit
+    finally:
+        fake.inject(error_rate=0.0)
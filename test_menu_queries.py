@@ -0,0 +1,129 @@
+"""Guards the menu endpoints against N+1 queries.
+
+Seeds a throwaway SQLite database, then counts the SQL statements issued
+while building the menu snapshot and while serving each listing endpoint.
+The counts must not depend on how many categories or items exist.
+
+    python -m pytest test_menu_queries.py
+"""
+from contextlib import contextmanager
+from time import monotonic, sleep
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from database import AsyncSessionLocal, engine, sync_engine
+from models import Base, Category, MenuItem, User
+from routers.auth import create_jwt_token
+from routers.auth_routes import principal_cache
+from utils import menu_catalog, menu_changes
+from sqlalchemy.orm import Session
+import main
+
+@pytest.fixture
+def statements():
+    """SQL statements sent through the API engine while the test runs"""
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    yield captured
+    event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+@contextmanager
+def count_queries(statements: list):
+    statements.clear()
+    counter = {}
+    yield counter
+    counter["count"] = len(statements)
+
+def seed(categories: int, items_per_category: int):
+    Base.metadata.drop_all(sync_engine)
+    Base.metadata.create_all(sync_engine)
+    with Session(sync_engine) as db:
+        db.add(User(fullname="Admin", email="admin@example.com", password="x", role="admin"))
+        for c in range(categories):
+            category = Category(name=f"Category {c}")
+            db.add(category)
+            db.flush()
+            for i in range(items_per_category):
+                db.add(MenuItem(name=f"Item {c}-{i}", price=1.0, category_id=category.id))
+        db.commit()
+
+def measure(client: TestClient, headers: dict, statements: list) -> dict:
+    counts = {}
+    for name, call in {
+        "snapshot rebuild": lambda: client.portal.call(menu_catalog.rebuild),
+        "GET /menu/items": lambda: client.get("/api/menu/items"),
+        "GET /menu/items?category_id": lambda: client.get("/api/menu/items?category_id=1"),
+        "GET /menu/items/{id}": lambda: client.get("/api/menu/items/1"),
+        "GET /menu/categories": lambda: client.get("/api/menu/categories"),
+        "GET /menu/categories/{id}": lambda: client.get("/api/menu/categories/1"),
+        "PUT /menu/categories/{id}": lambda: client.put(
+            "/api/menu/categories/1", data={"name": "Renamed"}, headers=headers
+        ),
+    }.items():
+        with count_queries(statements) as counter:
+            response = call()
+            assert getattr(response, "status_code", 200) == 200, (name, response.text)
+        counts[name] = counter["count"]
+    return counts
+
+# Statements each operation may issue, whatever the catalog size
+EXPECTED = {
+    # menu version, categories, items
+    "snapshot rebuild": 3,
+    "GET /menu/items": 0,
+    "GET /menu/items?category_id": 0,
+    "GET /menu/items/{id}": 0,
+    "GET /menu/categories": 0,
+    "GET /menu/categories/{id}": 0,
+    # auth lookup, load, menu version bump and read, update, change log
+    # insert, refresh, grouped count, snapshot rebuild (3)
+    "PUT /menu/categories/{id}": 11,
+}
+
+def test_menu_queries(statements, override_settings):
+    # Keep background work out of the counts
+    override_settings(RELATED_ITEMS_REBUILD_ON_STARTUP=False, MENU_VERSION_CHECK_INTERVAL_MS=0)
+    headers = {"Authorization": f"Bearer {create_jwt_token({'email': 'admin@example.com', 'role': 'admin'})}"}
+    results = []
+    for categories, items_per_category in [(2, 3), (10, 50)]:
+        seed(categories, items_per_category)
+        principal_cache.clear()
+        with TestClient(main.app) as client:
+            results.append(measure(client, headers, statements))
+
+    small, large = results
+    for name, expected in EXPECTED.items():
+        assert small[name] == large[name] == expected, (
+            f"{name}: {small[name]} statements on the small catalog, {large[name]} on the large one, "
+            f"expected {expected}"
+        )
+
+def test_other_workers_edits(statements, override_settings):
+    """An edit committed by another worker is served without reads touching the database"""
+    override_settings(RELATED_ITEMS_REBUILD_ON_STARTUP=False, MENU_VERSION_CHECK_INTERVAL_MS=20)
+    seed(1, 1)
+    with TestClient(main.app) as client:
+        assert client.get("/api/menu/items/1").json()["price"] == 1.0
+
+        async def edit_elsewhere():
+            async with AsyncSessionLocal() as db:
+                item = await db.get(MenuItem, 1)
+                item.price = 2.5
+                await menu_changes.record_change(db, menu_changes.ITEM, item.id)
+                await db.commit()
+
+        client.portal.call(edit_elsewhere)
+        deadline = monotonic() + 2
+        while client.get("/api/menu/items/1").json()["price"] != 2.5:
+            assert monotonic() < deadline, "edit not picked up by the version check"
+            sleep(0.02)
+
+        with count_queries(statements) as counter:
+            assert client.get("/api/menu/items/1").status_code == 200
+        assert counter["count"] == 0, statements
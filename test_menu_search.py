@@ -0,0 +1,81 @@
+"""Ranking and indexing rules of the in-process menu search.
+
+Builds MenuSearchIndex from plain objects, so no database is needed.
+
+    python -m pytest test_menu_search.py
+"""
+from types import SimpleNamespace
+
+from utils.menu_search import MenuSearchIndex
+
+def item(item_id: int, name: str, description: str = None, status: str = "active"):
+    return SimpleNamespace(id=item_id, name=name, description=description, status=status)
+
+def snapshot(version: int, *items):
+    return SimpleNamespace(version=version, items=items, items_by_id={i.id: i for i in items})
+
+def build(*items) -> MenuSearchIndex:
+    index = MenuSearchIndex()
+    index.rebuild(items, version=1)
+    return index
+
+def ids(index: MenuSearchIndex, query: str, limit: int = 20) -> list:
+    return [item_id for item_id, _ in index.search(query, limit)]
+
+def test_prefix():
+    index = build(item(1, "Croissant"), item(2, "Sourdough loaf"))
+    assert ids(index, "crois") == [1]
+    assert ids(index, "sour") == [2]
+
+def test_typo():
+    index = build(item(1, "Croissant"), item(2, "Sourdough loaf"))
+    assert ids(index, "crossant") == [1]
+    assert ids(index, "sourdogh") == [2]
+
+def test_exact_before_prefix_before_typo():
+    index = build(item(1, "Bun"), item(2, "Buns"), item(3, "Bin"))
+    assert ids(index, "bun") == [1, 2]
+    scores = dict(build(item(1, "Croissant"), item(2, "Croissants")).search("croissant"))
+    assert scores[1] > scores[2]
+
+def test_name_ranks_over_description():
+    index = build(item(1, "Butter", "for spreading on a croissant"), item(2, "Croissant"))
+    assert ids(index, "croissant") == [2, 1]
+
+def test_full_matches_first():
+    index = build(
+        item(1, "Croissant"),  # best single-word score, matches one word
+        item(2, "Bread", "sourdough croissants"),  # lower score, matches both
+        item(3, "Sourdough loaf"),
+        item(4, "Bagel"),
+    )
+    results = ids(index, "croissant sourdough")
+    assert results[0] == 2
+    assert sorted(results[1:]) == [1, 3]
+    assert ids(index, "croissant sourdough", limit=1) == [2]
+
+def test_full_matches_by_score():
+    index = build(
+        item(1, "Almond croissant"),
+        item(2, "Croissant", "topped with almond flakes"),
+        item(3, "Almond cake"),
+    )
+    assert ids(index, "almond croissant") == [1, 2, 3]
+
+def test_sync_drops_inactive_and_deleted_items():
+    index = MenuSearchIndex()
+    index.sync(snapshot(1, item(1, "Croissant"), item(2, "Croissant aux amandes")))
+    assert sorted(ids(index, "croissant")) == [1, 2]
+
+    index.sync(snapshot(2, item(1, "Croissant", status="inactive"), item(2, "Croissant aux amandes")))
+    assert ids(index, "croissant") == [2]
+    assert ids(index, "amandes") == [2]
+
+    index.sync(snapshot(3, item(1, "Croissant")))
+    assert ids(index, "croissant") == [1]
+    assert ids(index, "amandes") == []
+
+def test_rebuild_skips_inactive_items():
+    index = build(item(1, "Croissant", status="inactive"), item(2, "Croissant aux amandes"))
+    assert ids(index, "croissant") == [2]
+    assert len(index) == 1
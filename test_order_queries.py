@@ -0,0 +1,109 @@
+"""Keyset pagination of the admin order listing.
+
+Seeds orders, several sharing a created_at and some without one, then
+pages through them forwards and back with utils.order_queries.keyset_page
+and through GET /admin/orders, checking every order comes back exactly
+once and in order.
+
+    python -m pytest test_order_queries.py
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import AsyncSessionLocal, engine, sync_engine
+from models import Base, Order, User
+from routers.auth import create_jwt_token
+from utils.order_queries import InvalidCursor, keyset_page
+import main
+
+START = datetime(2026, 1, 1, 12)
+
+@pytest.fixture
+def orders() -> list:
+    """Ids of the seeded orders with a created_at, newest first"""
+    Base.metadata.drop_all(sync_engine)
+    Base.metadata.create_all(sync_engine)
+    with Session(sync_engine) as db:
+        db.add(User(fullname="Admin", email="admin@example.com", password="x", role="admin"))
+        db.flush()
+        # Three at each minute, so most pages end inside a run of ties
+        for number in range(22):
+            db.add(Order(
+                user_id=1, reference=f"ord_{number}", amount=10, delivery_fee=0, final_amount=10,
+                created_at=START + timedelta(minutes=number // 3), items="[]",
+                email="customer@example.com", name="Customer", phone="1", address="Oxford"
+            ))
+        db.flush()
+        # Rows written outside the app may lack created_at (the column default
+        # only applies to ORM inserts)
+        db.execute(Order.__table__.update().where(Order.reference.in_(["ord_20", "ord_21"])).values(created_at=None))
+        db.commit()
+        return list(db.scalars(
+            select(Order.id).where(Order.created_at.is_not(None)).order_by(Order.created_at.desc(), Order.id.desc())
+        ))
+
+async def walk(per_page: int):
+    """Page to the end and back again; returns the ids seen each way"""
+    try:
+        async with AsyncSessionLocal() as db:
+            forward, cursor, pages = [], None, []
+            while True:
+                page, next_cursor, prev_cursor = await keyset_page(db, select(Order), per_page, cursor)
+                assert (prev_cursor is None) == (cursor is None)
+                pages.append(prev_cursor)
+                forward.extend(order.id for order in page)
+                if next_cursor is None:
+                    break
+                cursor = next_cursor
+
+            backward, cursor = [], pages[-1]
+            while cursor is not None:
+                page, next_cursor, cursor = await keyset_page(db, select(Order), per_page, cursor)
+                assert next_cursor is not None
+                backward[:0] = [order.id for order in page]
+            return forward, backward
+    finally:
+        await engine.dispose()
+
+@pytest.mark.parametrize("per_page", [1, 4, 7, 20, 50])
+def test_keyset_page(orders, per_page):
+    forward, backward = asyncio.run(walk(per_page))
+    assert forward == orders, "NULL created_at orders are skipped, the rest come once each"
+    last_page = len(orders) % per_page or per_page
+    assert backward == orders[:len(orders) - last_page]
+
+def test_invalid_cursor(orders):
+    async def page(cursor: str):
+        try:
+            async with AsyncSessionLocal() as db:
+                await keyset_page(db, select(Order), 5, cursor)
+        finally:
+            await engine.dispose()
+
+    for cursor in ["not-a-cursor", "eyJjIjoieCJ9", "e30"]:
+        with pytest.raises(InvalidCursor):
+            asyncio.run(page(cursor))
+
+def test_admin_orders_cursor(orders, override_settings):
+    override_settings(RELATED_ITEMS_REBUILD_ON_STARTUP=False, RECONCILE_INTERVAL=0)
+    headers = {"Authorization": f"Bearer {create_jwt_token({'email': 'admin@example.com', 'role': 'admin'})}"}
+    with TestClient(main.app) as client:
+        seen, params = [], {"paginate": "cursor", "per_page": 6}
+        while True:
+            response = client.get("/api/admin/orders", params=params, headers=headers)
+            assert response.status_code == 200, response.text
+            body = response.json()
+            seen.extend(order["id"] for order in body["items"])
+            if body["next_cursor"] is None:
+                break
+            params = {"cursor": body["next_cursor"], "per_page": 6}
+        assert seen == orders
+
+        response = client.get("/api/admin/orders", params={"cursor": "not-a-cursor"}, headers=headers)
+        assert response.status_code == 400, response.text
+        assert response.json()["detail"] == "Invalid cursor"
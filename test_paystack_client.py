@@ -0,0 +1,104 @@
+"""Exercises the Paystack client and /verify-payment against fake_paystack.py.
+
+Checks that calls reuse pooled connections, that 5xx responses and
+timeouts are retried a bounded number of times, that other errors are not
+retried, and that verify_payment marks an order paid, or answers "pending"
+when Paystack is down.
+
+    python -m pytest test_paystack_client.py
+"""
+import asyncio
+from time import perf_counter
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import sync_engine
+from models import Base, Order, User
+from routers.auth import create_jwt_token
+from utils import paystack
+import main
+
+SECRET_KEY = "sk_test_fake"
+
+@pytest.fixture
+def fake(use_fake_paystack):
+    fake = use_fake_paystack(
+        PAYSTACK_SECRET_KEY=SECRET_KEY,
+        PAYSTACK_READ_TIMEOUT=0.5,
+        PAYSTACK_MAX_RETRIES=2,
+        PAYSTACK_RETRY_BACKOFF=0.01,
+    )
+    fake.secret_key = SECRET_KEY
+    return fake
+
+def test_client(fake):
+    asyncio.run(check_client(fake))
+
+async def check_client(fake):
+    client = paystack.PaystackClient()
+    try:
+        connections = fake.connections
+        for _ in range(5):
+            response = await client.verify_transaction("ok")
+            assert response.status_code == 200, response.text
+            assert response.json()["data"]["status"] == "success"
+        assert fake.connections - connections == 1, "calls should share one keep-alive connection"
+
+        fake.register("flaky", fail_times=2, fail_status=503)
+        response = await client.verify_transaction("flaky")
+        assert response.status_code == 200
+        assert fake.hits["flaky"] == 3 and client.retries == 2
+
+        fake.register("down", fail_times=10, fail_status=502)
+        with pytest.raises(paystack.PaystackUnavailable):
+            await client.verify_transaction("down")
+        assert fake.hits["down"] == 3, "retries must be bounded"
+
+        fake.register("slow", delay=2)
+        start = perf_counter()
+        with pytest.raises(paystack.PaystackUnavailable):
+            await client.verify_transaction("slow")
+        assert perf_counter() - start < 3, "read timeout not applied"
+
+        fake.register("unknown", status="missing")
+        response = await client.verify_transaction("unknown")
+        assert response.status_code == 400 and fake.hits["unknown"] == 1, "4xx must not be retried"
+
+        stats = client.stats()
+        assert stats["failures"] == 2 and stats["latency_ms"]["samples"] == 9
+    finally:
+        await client.close()
+
+def test_verify_payment(fake):
+    Base.metadata.drop_all(sync_engine)
+    Base.metadata.create_all(sync_engine)
+    with Session(sync_engine) as db:
+        db.add(User(fullname="Customer", email="customer@example.com", password="x", role="user"))
+        db.flush()
+        for reference in ("pay_ok", "pay_down"):
+            db.add(Order(
+                user_id=1, reference=f"ord_{reference}", payment_reference=reference, items="[]",
+                amount=10, delivery_fee=0, final_amount=10, status="pending", payment_status="pending"
+            ))
+        db.commit()
+
+    fake.register("pay_down", fail_times=10, fail_status=503)
+    with TestClient(main.app) as client:
+        response = client.post("/api/verify-payment/pay_ok")
+        assert response.status_code == 200, response.text
+        response = client.post("/api/verify-payment/pay_down")
+        assert response.status_code == 202 and response.json()["status"] == "pending", response.text
+
+        headers = {"Authorization": f"Bearer {create_jwt_token({'email': 'customer@example.com', 'role': 'admin'})}"}
+        with Session(sync_engine) as db:
+            db.execute(User.__table__.update().values(role="admin"))
+            db.commit()
+        stats = client.get("/api/admin/metrics/paystack", headers=headers).json()
+        assert stats["requests"] == 2 and stats["failures"] == 1, stats
+
+    with Session(sync_engine) as db:
+        paid = dict(db.execute(select(Order.payment_reference, Order.payment_status)).all())
+    assert paid == {"pay_ok": "paid", "pay_down": "pending"}, paid
@@ -0,0 +1,130 @@
+"""Runs payment reconciliation against fake_paystack.py.
+
+Seeds pending orders of various ages and Paystack outcomes, then checks
+that only stale orders in the age window are verified, that no more than
+the configured number of verifications run at once, that confirmed charges
+are marked paid and counted, that abandoned ones are marked failed, and
+that a second run only verifies the orders left undecided. Also checks
+that the scheduled job runs in one worker at a time.
+
+    python -m pytest test_reconcile_payments.py
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from database import engine, sync_engine
+from models import Base, Notification, Order, OrderItem, SalesDaily, User
+from utils import job_lease, paystack, reconciliation
+
+CONCURRENCY = 3
+
+@pytest.fixture
+def fake(use_fake_paystack):
+    return use_fake_paystack(PAYSTACK_MAX_RETRIES=1, PAYSTACK_RETRY_BACKOFF=0.01)
+
+def seed(fake) -> dict:
+    """Pending orders by reference; returns the outcome each one should get"""
+    Base.metadata.drop_all(sync_engine)
+    Base.metadata.create_all(sync_engine)
+    now = datetime.utcnow()
+    expected = {}
+    with Session(sync_engine) as db:
+        db.add(User(fullname="Customer", email="customer@example.com", password="x", role="user"))
+        db.flush()
+
+        def order(reference: str, age: timedelta, outcome: str):
+            db.add(Order(
+                user_id=1, reference=f"ord_{reference}", payment_reference=reference, items="[]",
+                amount=10, delivery_fee=0, final_amount=10, status="pending", payment_status="pending",
+                created_at=now - age,
+                line_items=[OrderItem(menu_item_id=1, name="Bread", quantity=1, unit_price=10)]
+            ))
+            expected[reference] = outcome
+
+        for i in range(20):
+            order(f"paid_{i}", timedelta(hours=1, minutes=i), "paid")
+            fake.register(f"paid_{i}", delay=0.02)
+        for i in range(3):
+            order(f"abandoned_{i}", timedelta(hours=2), "failed")
+            fake.register(f"abandoned_{i}", status="abandoned")
+        order("missing", timedelta(hours=3), "pending")
+        fake.register("missing", status="missing")
+        order("down", timedelta(hours=3), "pending")
+        fake.register("down", fail_times=10)
+        order("too_recent", timedelta(minutes=1), "skipped")
+        order("too_old", timedelta(days=30), "skipped")
+        db.commit()
+
+    # sales_daily starts out matching the seeded orders
+    with Session(sync_engine) as db:
+        db.add(SalesDaily(day=now.date(), status="pending", payment_status="pending",
+                          order_count=len(expected), gross=0, delivery_fees=0, net=0))
+        db.commit()
+    return expected
+
+async def run(**options) -> dict:
+    try:
+        return await reconciliation.reconcile(
+            min_age=timedelta(minutes=15), max_age=timedelta(days=7),
+            concurrency=CONCURRENCY, batch_size=7, **options
+        )
+    finally:
+        await paystack.client.close()
+        await engine.dispose()
+
+def test_reconcile_payments(fake):
+    expected = seed(fake)
+    progress = []
+
+    stats = asyncio.run(run(dry_run=True))
+    assert stats["scanned"] == 25 and stats["paid"] == 0, stats
+
+    stats = asyncio.run(run(progress=lambda totals: progress.append(totals["scanned"])))
+    print({key: stats[key] for key in ("scanned", "paid", "errors", "outcomes", "orders_per_second")})
+    assert stats["scanned"] == 25, stats
+    assert stats["paid"] == 20, stats
+    assert stats["failed"] == 3, stats
+    assert stats["errors"] == 1, stats
+    assert stats["outcomes"] == {"success": 20, "abandoned": 3, "not_found": 1, "error": 1}, stats
+    assert progress == [7, 14, 21, 25], progress
+    assert fake.max_in_flight <= CONCURRENCY, fake.max_in_flight
+    assert fake.hits["too_recent"] == fake.hits["too_old"] == 0
+
+    with Session(sync_engine) as db:
+        statuses = dict(db.execute(select(Order.payment_reference, Order.payment_status)).all())
+        for reference, outcome in expected.items():
+            assert statuses[reference] == (outcome if outcome in ("paid", "failed") else "pending"), reference
+        assert db.scalar(select(func.count()).select_from(Notification)) == 20
+        paid_rollup = db.scalar(select(SalesDaily.order_count).where(SalesDaily.payment_status == "paid"))
+        assert paid_rollup == 20, paid_rollup
+        failed_rollup = db.scalar(select(SalesDaily.order_count).where(SalesDaily.payment_status == "failed"))
+        assert failed_rollup == 3, failed_rollup
+
+    # Only the missing and unreachable orders are still pending
+    stats = asyncio.run(run())
+    assert stats["scanned"] == 2 and stats["paid"] == stats["failed"] == 0, stats
+
+def test_job_lease():
+    Base.metadata.drop_all(sync_engine)
+    Base.metadata.create_all(sync_engine)
+
+    async def check():
+        try:
+            ttl = timedelta(seconds=60)
+            assert await job_lease.acquire("job", ttl, owner="worker-1")
+            assert not await job_lease.acquire("job", ttl, owner="worker-2")
+            assert await job_lease.acquire("job", ttl, owner="worker-1"), "the holder renews"
+            assert await job_lease.acquire("other", ttl, owner="worker-2"), "leases are per job"
+
+            # worker-1 stops renewing; its lease lapses and worker-2 takes over
+            assert await job_lease.acquire("job", timedelta(seconds=-1), owner="worker-1")
+            assert await job_lease.acquire("job", ttl, owner="worker-2")
+            assert not await job_lease.acquire("job", ttl, owner="worker-1")
+        finally:
+            await engine.dispose()
+
+    asyncio.run(check())
@@ -0,0 +1,100 @@
+"""Refresh token rotation and revocation through the auth API.
+
+Signs in through /api/auth/signin, then checks that each refresh rotates
+the token, that presenting a rotated token again revokes its whole family
+(and only that family), and that changing a password revokes every
+refresh token of the user.
+
+    python -m pytest test_refresh_tokens.py
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from database import sync_engine
+from models import Base, RefreshToken, User
+from routers import auth
+from routers.auth_routes import principal_cache
+import main
+
+PASSWORD = "correct horse"
+
+@pytest.fixture
+def client(override_settings, monkeypatch):
+    override_settings(RECONCILE_INTERVAL=0, RELATED_ITEMS_REBUILD_ON_STARTUP=False)
+    # The cheapest bcrypt cost; the default makes every signin take ~0.25s
+    monkeypatch.setattr(auth, "pwd_context", auth.make_password_context(4))
+    Base.metadata.drop_all(sync_engine)
+    Base.metadata.create_all(sync_engine)
+    principal_cache.clear()
+    with TestClient(main.app) as client:
+        for email in ("customer@example.com", "admin@example.com"):
+            response = client.post("/api/auth/signup", json={
+                "fullname": "Some One", "email": email, "password": PASSWORD, "confirm_password": PASSWORD
+            })
+            assert response.status_code == 201, response.text
+        with Session(sync_engine) as db:
+            db.execute(update(User).where(User.email == "admin@example.com").values(role="admin"))
+            db.commit()
+        yield client
+
+def signin(client: TestClient, email: str = "customer@example.com") -> dict:
+    response = client.post("/api/auth/signin", json={"email": email, "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def refresh(client: TestClient, token: str):
+    return client.post("/api/auth/refresh", json={"refresh_token": token})
+
+def live_tokens(email: str = "customer@example.com") -> int:
+    with Session(sync_engine) as db:
+        return len(db.scalars(
+            select(RefreshToken.id).join(User, User.id == RefreshToken.user_id)
+            .where(User.email == email, RefreshToken.revoked_at.is_(None))
+        ).all())
+
+def test_rotation(client):
+    first = signin(client)["refresh_token"]
+    response = refresh(client, first)
+    assert response.status_code == 200, response.text
+    second = response.json()["refresh_token"]
+    assert second != first and response.json()["access_token"]
+    assert refresh(client, second).status_code == 200
+    assert live_tokens() == 1, "each refresh revokes the token it used"
+
+def test_reuse_revokes_family(client):
+    stolen = signin(client)["refresh_token"]
+    other_device = signin(client)["refresh_token"]
+    rotated = refresh(client, stolen).json()["refresh_token"]
+
+    response = refresh(client, stolen)
+    assert response.status_code == 401, response.text
+    assert response.json()["detail"] == "Invalid refresh token"
+
+    # The legitimate holder of the family is signed out too...
+    assert refresh(client, rotated).status_code == 401
+    # ...but other signins are not
+    assert refresh(client, other_device).status_code == 200
+    assert live_tokens() == 1
+
+@pytest.mark.parametrize("email, path", [
+    ("customer@example.com", "/api/users/password"),
+    ("admin@example.com", "/api/admin/profile/password"),
+])
+def test_password_change_revokes_all(client, email, path):
+    session = signin(client, email)
+    other_device = signin(client, email)["refresh_token"]
+    bystander = signin(client, "admin@example.com" if email == "customer@example.com" else "customer@example.com")
+
+    response = client.put(
+        path,
+        json={"current_password": PASSWORD, "new_password": "new password", "confirm_password": "new password"},
+        headers={"Authorization": f"Bearer {session['access_token']}"}
+    )
+    assert response.status_code == 200, response.text
+
+    assert live_tokens(email) == 0
+    assert refresh(client, session["refresh_token"]).status_code == 401
+    assert refresh(client, other_device).status_code == 401
+    assert refresh(client, bystander["refresh_token"]).status_code == 200, "other users keep theirs"
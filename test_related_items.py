@@ -0,0 +1,76 @@
+"""Keeps "frequently bought together" in step with orders paid elsewhere.
+
+Pays orders through utils.payments as this worker and as another one (the
+same database, without telling this worker's index), then checks that the
+refresh check rebuilds the index only when another worker has counted an
+order.
+
+    python -m pytest test_related_items.py
+"""
+import asyncio
+
+from sqlalchemy.orm import Session
+
+from database import AsyncSessionLocal, engine, sync_engine
+from models import Base, Order, OrderItem, User
+from utils import payments
+from utils.related_items import RelatedItemsIndex
+
+def seed(*baskets):
+    Base.metadata.drop_all(sync_engine)
+    Base.metadata.create_all(sync_engine)
+    with Session(sync_engine) as db:
+        db.add(User(fullname="Customer", email="customer@example.com", password="x", role="user"))
+        db.flush()
+        for number, basket in enumerate(baskets):
+            db.add(Order(
+                user_id=1, reference=f"ord_{number}", amount=10, delivery_fee=0, final_amount=10,
+                status="pending", payment_status="pending",
+                line_items=[OrderItem(menu_item_id=item_id, name="Item", quantity=1, unit_price=1) for item_id in basket]
+            ))
+        db.commit()
+
+async def pay(order_id: int, index: RelatedItemsIndex = None):
+    """Pay an order; only `index`, if given, is told about it"""
+    async with AsyncSessionLocal() as db:
+        paid = await payments.mark_order_paid(db, await db.get(Order, order_id))
+        await db.commit()
+    if index is not None:
+        index.add_order(paid.quantities, order_id=paid.order_id, version=paid.version)
+
+def test_refresh():
+    seed([1, 2], [1, 3], [1, 3], [2, 3])
+
+    async def check():
+        try:
+            index = RelatedItemsIndex(top_k=5)
+            await index._refresh_if_stale()
+            assert index.version is None, "an index never built is left alone"
+
+            await pay(1)
+            async with AsyncSessionLocal() as db:
+                await index.rebuild(db)
+            assert index.version == 1
+            assert index.related(1, 5) == [(2, 1)]
+
+            # Paid by this worker: counted in place, no rebuild needed
+            await pay(2, index)
+            assert index.version == 2
+            rebuilds = index.stats["rebuild_seconds"], index.stats["incremental_updates"]
+            await index._refresh_if_stale()
+            assert (index.stats["rebuild_seconds"], index.stats["incremental_updates"]) == rebuilds
+
+            # Paid by another worker, then one by this worker after it
+            await pay(3)
+            await pay(4, index)
+            assert index.version == 2, "a gap in versions must not be skipped"
+            assert index.related(1, 5) == [(2, 1), (3, 1)]
+            await index._refresh_if_stale()
+            assert index.version == 4
+            assert index.stats["incremental_updates"] == 0
+            assert index.related(1, 5) == [(3, 2), (2, 1)]
+            assert index.related(3, 5) == [(1, 2), (2, 1)]
+        finally:
+            await engine.dispose()
+
+    asyncio.run(check())
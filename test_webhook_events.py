@@ -0,0 +1,133 @@
+"""Paystack webhook deliveries applied through utils.webhook_events.
+
+Posts signed charge.success events to /api/webhook and waits for the
+background workers. Checks that a redelivered event is acknowledged but
+marks the order paid only once, that a failing handler is retried with
+backoff and counted in `attempts`, and that an event still failing after
+PAYSTACK_WEBHOOK_MAX_ATTEMPTS is marked failed.
+
+    python -m pytest test_webhook_events.py
+"""
+import hashlib
+import hmac
+import json
+from time import monotonic, sleep
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import sync_engine
+from models import Base, Order, PaystackEvent, User
+from utils import payments, webhook_events
+import main
+
+SECRET_KEY = "sk_test_webhook"
+
+@pytest.fixture
+def client(override_settings):
+    override_settings(
+        PAYSTACK_SECRET_KEY=SECRET_KEY,
+        PAYSTACK_WEBHOOK_MAX_ATTEMPTS=3,
+        PAYSTACK_WEBHOOK_RETRY_DELAY=0.01,
+        RECONCILE_INTERVAL=0,
+        RELATED_ITEMS_REBUILD_ON_STARTUP=False,
+    )
+    Base.metadata.drop_all(sync_engine)
+    Base.metadata.create_all(sync_engine)
+    with Session(sync_engine) as db:
+        db.add(User(fullname="Customer", email="customer@example.com", password="x", role="user"))
+        db.flush()
+        db.add(Order(
+            user_id=1, reference="ord_1", payment_reference="ref_1", items="[]",
+            amount=10, delivery_fee=0, final_amount=10, status="pending", payment_status="pending"
+        ))
+        db.commit()
+    with TestClient(main.app) as client:
+        yield client
+
+def deliver(client: TestClient, event_id: int = 111, reference: str = "ref_1") -> str:
+    body = json.dumps({"event": "charge.success", "data": {"id": event_id, "reference": reference}}).encode()
+    signature = hmac.new(SECRET_KEY.encode(), body, hashlib.sha512).hexdigest()
+    response = client.post("/api/webhook", content=body, headers={"x-paystack-signature": signature})
+    assert response.status_code == 200, response.text
+    return response.json()["status"]
+
+def event_row() -> PaystackEvent:
+    with Session(sync_engine) as db:
+        return db.scalars(select(PaystackEvent)).one()
+
+def payment_status() -> str:
+    with Session(sync_engine) as db:
+        return db.scalar(select(Order.payment_status).where(Order.reference == "ord_1"))
+
+def wait_for(status: str) -> PaystackEvent:
+    deadline = monotonic() + 5
+    while (event := event_row()).status != status:
+        assert monotonic() < deadline, (event.status, event.attempts, event.error)
+        sleep(0.01)
+    return event
+
+def test_duplicate_delivery(client, monkeypatch):
+    calls = []
+    mark_order_paid = payments.mark_order_paid
+
+    async def counting(db, order):
+        calls.append(order.id)
+        return await mark_order_paid(db, order)
+
+    monkeypatch.setattr(payments, "mark_order_paid", counting)
+    duplicates = webhook_events.processor.duplicates
+
+    assert deliver(client) == "received"
+    assert deliver(client) == "duplicate"
+    client.portal.call(webhook_events.processor.drain)
+    assert deliver(client) == "duplicate", "still a duplicate once applied"
+    client.portal.call(webhook_events.processor.drain)
+
+    assert calls == [1]
+    assert payment_status() == "paid"
+    event = event_row()
+    assert (event.status, event.attempts) == (webhook_events.PROCESSED, 1)
+    assert webhook_events.processor.duplicates - duplicates == 2
+
+def test_retried_after_a_failure(client, monkeypatch):
+    handler = webhook_events.HANDLERS["charge.success"]
+    calls = []
+
+    async def flaky(db, payload):
+        calls.append(payload["data"]["reference"])
+        if len(calls) == 1:
+            raise RuntimeError("database went away")
+        return await handler(db, payload)
+
+    monkeypatch.setitem(webhook_events.HANDLERS, "charge.success", flaky)
+    retried = webhook_events.processor.retried
+
+    assert deliver(client) == "received"
+    event = wait_for(webhook_events.PROCESSED)
+    assert event.attempts == 2, "the failed attempt is counted"
+    assert event.error == "database went away"
+    assert calls == ["ref_1", "ref_1"]
+    assert payment_status() == "paid"
+    assert webhook_events.processor.retried - retried == 1
+
+def test_failed_after_max_attempts(client, monkeypatch):
+    calls = []
+
+    async def broken(db, payload):
+        calls.append(payload["data"]["reference"])
+        raise RuntimeError("handler bug")
+
+    monkeypatch.setitem(webhook_events.HANDLERS, "charge.success", broken)
+    retried, failed = webhook_events.processor.retried, webhook_events.processor.failed
+
+    assert deliver(client) == "received"
+    event = wait_for(webhook_events.FAILED)
+    assert event.attempts == 3
+    assert event.error == "handler bug"
+    assert len(calls) == 3
+    assert payment_status() == "pending", "a failed event changes nothing"
+    assert webhook_events.processor.retried - retried == 2
+    assert webhook_events.processor.failed - failed == 1
@@ -0,0 +1,101 @@
+"""Circuit breaker for calls to an external service.
+
+Closed:    calls go through; `failure_threshold` failures in a row open it.
+Open:      calls are rejected at once with CircuitOpen for `reset_timeout`
+           seconds, so callers stop queueing behind a dead dependency.
+Half-open: up to `half_open_calls` probe calls are let through. A success
+           closes the circuit; a failure opens it again for another
+           `reset_timeout`.
+
+State is per worker process and only touched from the event loop.
+"""
+from datetime import datetime
+from time import monotonic
+from typing import Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpen(Exception):
+    """Raised instead of calling while the circuit is open"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} circuit is open, retry in {retry_in:.1f}s")
+        self.retry_in = retry_in
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float, half_open_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0  # half-open calls in flight
+        self.consecutive_failures = 0
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0  # times the circuit has opened
+        self.last_opened_at: Optional[datetime] = None
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def _retry_in(self) -> float:
+        return max(0.0, self.reset_timeout - (monotonic() - self._opened_at))
+
+    def before_call(self):
+        """Reserve a call, or raise CircuitOpen"""
+        state = self.state
+        if state == OPEN or (state == HALF_OPEN and self._probes >= self.half_open_calls):
+            self.rejected += 1
+            raise CircuitOpen(self.name, self._retry_in())
+        if state == HALF_OPEN:
+            self._probes += 1
+        self.calls += 1
+
+    def after_call(self, success: Optional[bool]):
+        """Report how a reserved call went; None releases it without a verdict"""
+        if self._state == HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+        if success is None:
+            return
+        if success:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self._state = CLOSED
+            return
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self._state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        if self._state != OPEN:
+            self.opened += 1
+        self._state = OPEN
+        self._opened_at = monotonic()
+        self.last_opened_at = datetime.utcnow()
+
+    def stats(self) -> dict:
+        state = self.state
+        return {
+            "state": state,
+            "retry_in_seconds": round(self._retry_in(), 3) if state == OPEN else 0.0,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout_seconds": self.reset_timeout,
+            "calls": self.calls,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "opened": self.opened,
+            "last_opened_at": self.last_opened_at,
+        }
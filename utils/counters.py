@@ -0,0 +1,22 @@
+"""Atomic "add to a counter row, creating it if missing" for rollup tables.
+
+MySQL and SQLite spell upserts differently; both run as a single statement
+so concurrent writers never lose an increment or race on the insert.
+"""
+from sqlalchemy.dialects import mysql, sqlite
+
+from database import engine
+
+def increment(model, keys: dict, amounts: dict):
+    """Statement adding `amounts` to the row of `model` identified by `keys`.
+
+    `keys` must match a unique constraint on the table. A missing row is
+    created with `amounts` as its initial values.
+    """
+    updates = {name: getattr(model, name) + amount for name, amount in amounts.items()}
+    if engine.dialect.name == "mysql":
+        return mysql.insert(model).values(**keys, **amounts).on_duplicate_key_update(**updates)
+    return sqlite.insert(model).values(**keys, **amounts).on_conflict_do_update(
+        index_elements=list(keys),
+        set_=updates
+    )
@@ -0,0 +1,26 @@
+"""Named change counters in `data_versions`.
+
+`bump()` adds to a counter in the caller's transaction and returns the new
+value. The upsert keeps the row locked until that transaction ends, so a
+second writer waits and numbers its change after the first one commits:
+versions of one name become visible in order, and a reader that has seen
+version N has also seen every change numbered below it.
+"""
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import DataVersion
+from utils import counters
+
+MENU = "menu"  # see utils.menu_changes
+PAID_ORDERS = "paid_orders"  # see utils.payments and utils.related_items
+
+async def bump(db: AsyncSession, name: str, amount: int = 1) -> int:
+    """Add `amount` to the counter and return its new value; commits with the caller"""
+    await db.execute(counters.increment(DataVersion, {"name": name}, {"version": amount}))
+    return await db.scalar(
+        select(DataVersion.version).where(DataVersion.name == name).with_for_update()
+    )
+
+async def current(db: AsyncSession, name: str) -> int:
+    return await db.scalar(select(DataVersion.version).where(DataVersion.name == name)) or 0
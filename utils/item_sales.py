@@ -0,0 +1,209 @@
+"""Best-seller counters per menu item.
+
+When an order is paid, its quantities are added to `menu_item_sales` in an
+hourly and a daily bucket, keyed by the time it was paid. A "popular this
+week" list is then a small SUM over a handful of buckets, and the result is
+cached per window for MENU_POPULAR_CACHE_TTL seconds.
+
+Hourly buckets are only needed for MENU_POPULAR_HOURLY_RETENTION hours.
+The API deletes older ones every MENU_POPULAR_PRUNE_INTERVAL seconds in
+each worker; overlapping runs just find less to delete.
+"""
+import asyncio
+import json
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import get_settings
+from database import AsyncSessionLocal
+from models import MenuItemSales, Order, OrderItem
+from utils import counters
+from utils.cache import TTLCache
+
+settings = get_settings()
+
+HOUR = "hour"
+DAY = "day"
+
+# window -> (bucket granularity, span ending at the current bucket)
+WINDOWS = {
+    "hour": (HOUR, timedelta(hours=1)),
+    "day": (HOUR, timedelta(hours=24)),
+    "week": (DAY, timedelta(days=7)),
+    "month": (DAY, timedelta(days=30)),
+}
+BUCKET_SIZES = {HOUR: timedelta(hours=1), DAY: timedelta(days=1)}
+
+INSERT_BATCH = 1000
+
+popular_cache = TTLCache(64, settings.MENU_POPULAR_CACHE_TTL)
+
+_prune_job: Optional[asyncio.Task] = None
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    if granularity == HOUR:
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return datetime.combine(moment.date(), time.min)
+
+def window_start(window: str, now: Optional[datetime] = None) -> Tuple[str, datetime]:
+    """Granularity and first bucket covered by `window`"""
+    granularity, span = WINDOWS[window]
+    now = now or datetime.utcnow()
+    return granularity, bucket_start(now - span + BUCKET_SIZES[granularity], granularity)
+
+def _json_quantities(raw_items: Optional[str]) -> Counter:
+    quantities = Counter()
+    try:
+        items = json.loads(raw_items) if raw_items else []
+    except ValueError:
+        return quantities
+    for item in items if isinstance(items, list) else []:
+        if isinstance(item, dict) and item.get("menu_item_id") is not None:
+            quantities[item["menu_item_id"]] += item.get("quantity") or 0
+    return quantities
+
+async def order_quantities(db: AsyncSession, order: Order) -> Dict[int, int]:
+    """Quantity per menu item in one order"""
+    result = await db.execute(
+        select(OrderItem.menu_item_id, func.sum(OrderItem.quantity))
+        .where(OrderItem.order_id == order.id)
+        .group_by(OrderItem.menu_item_id)
+    )
+    quantities = dict(result.all())
+    # Orders placed before order_items existed only have the JSON column
+    return quantities or dict(_json_quantities(order.items))
+
+async def record_paid_order(db: AsyncSession, order: Order, paid_at: datetime) -> Dict[int, int]:
+    """Count a newly paid order's items in the buckets holding `paid_at`;
+    commits with the caller.
+
+    Call only on the transition to paid, or the order is counted twice.
+    Returns the order's quantity per menu item.
+    """
+    quantities = await order_quantities(db, order)
+    for menu_item_id, quantity in quantities.items():
+        for granularity in (HOUR, DAY):
+            await db.execute(counters.increment(
+                MenuItemSales,
+                {
+                    "granularity": granularity,
+                    "bucket_start": bucket_start(paid_at, granularity),
+                    "menu_item_id": menu_item_id,
+                },
+                {"quantity": quantity}
+            ))
+    return quantities
+
+async def top_items(db: AsyncSession, window: str, limit: int) -> List[Tuple[int, int]]:
+    """(menu_item_id, quantity) best sellers for a window, most sold first"""
+    key = (window, limit)
+    cached = popular_cache.get(key)
+    if cached is not None:
+        return cached
+
+    granularity, start = window_start(window)
+    total = func.sum(MenuItemSales.quantity).label("total")
+    result = await db.execute(
+        select(MenuItemSales.menu_item_id, total)
+        .where(MenuItemSales.granularity == granularity, MenuItemSales.bucket_start >= start)
+        .group_by(MenuItemSales.menu_item_id)
+        .having(total > 0)
+        .order_by(total.desc(), MenuItemSales.menu_item_id)
+        .limit(limit)
+    )
+    items = [(menu_item_id, int(quantity)) for menu_item_id, quantity in result.all()]
+    popular_cache.set(key, items)
+    return items
+
+def _hourly_cutoff() -> datetime:
+    return bucket_start(datetime.utcnow() - timedelta(hours=settings.MENU_POPULAR_HOURLY_RETENTION), HOUR)
+
+async def prune_hourly() -> int:
+    """Delete hourly buckets older than MENU_POPULAR_HOURLY_RETENTION; returns the row count"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(delete(MenuItemSales).where(
+            MenuItemSales.granularity == HOUR, MenuItemSales.bucket_start < _hourly_cutoff()
+        ))
+        await db.commit()
+    return result.rowcount
+
+async def _prune_periodically():
+    while True:
+        await asyncio.sleep(settings.MENU_POPULAR_PRUNE_INTERVAL)
+        try:
+            await prune_hourly()
+        except Exception as e:
+            print(f"Pruning hourly item sales failed: {str(e)}")
+
+def start_prune_job():
+    """Schedule prune_hourly() every MENU_POPULAR_PRUNE_INTERVAL seconds (0 disables it)"""
+    global _prune_job
+    if settings.MENU_POPULAR_PRUNE_INTERVAL > 0 and (_prune_job is None or _prune_job.done()):
+        _prune_job = asyncio.create_task(_prune_periodically())
+
+async def stop_prune_job():
+    global _prune_job
+    if _prune_job is not None:
+        _prune_job.cancel()
+        await asyncio.gather(_prune_job, return_exceptions=True)
+        _prune_job = None
+
+async def rebuild(db: AsyncSession, start: Optional[date] = None, end: Optional[date] = None) -> int:
+    """Regenerate the counters from orders paid on days start..end (inclusive).
+
+    Orders paid before paid_at was recorded count at the time they were
+    placed.
+
+    Hourly buckets are only kept for the last MENU_POPULAR_HOURLY_RETENTION
+    hours, which is all the hourly windows need. Returns the number of
+    counter rows written.
+    """
+    hourly_cutoff = _hourly_cutoff()
+    paid_at = func.coalesce(Order.paid_at, Order.created_at)
+    query = (
+        select(Order.id, paid_at, Order.items, OrderItem.menu_item_id, OrderItem.quantity)
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .where(Order.payment_status == "paid", paid_at.is_not(None))
+    )
+    stale = delete(MenuItemSales)
+    if start:
+        query = query.where(paid_at >= datetime.combine(start, time.min))
+        stale = stale.where(MenuItemSales.bucket_start >= datetime.combine(start, time.min))
+    if end:
+        query = query.where(paid_at < datetime.combine(end + timedelta(days=1), time.min))
+        stale = stale.where(MenuItemSales.bucket_start < datetime.combine(end + timedelta(days=1), time.min))
+
+    totals = Counter()
+    legacy_done = set()
+    result = await db.stream(query.execution_options(yield_per=INSERT_BATCH))
+    async for order_id, moment, raw_items, menu_item_id, quantity in result:
+        if menu_item_id is not None:
+            lines = [(menu_item_id, quantity or 0)]
+        elif order_id not in legacy_done:
+            legacy_done.add(order_id)
+            lines = _json_quantities(raw_items).items()
+        else:
+            continue
+        for item_id, item_quantity in lines:
+            totals[(DAY, bucket_start(moment, DAY), item_id)] += item_quantity
+            hour = bucket_start(moment, HOUR)
+            if hour >= hourly_cutoff:
+                totals[(HOUR, hour, item_id)] += item_quantity
+
+    await db.execute(stale)
+    await db.execute(delete(MenuItemSales).where(
+        MenuItemSales.granularity == HOUR, MenuItemSales.bucket_start < hourly_cutoff
+    ))
+    rows = [
+        {"granularity": granularity, "bucket_start": bucket, "menu_item_id": item_id, "quantity": quantity}
+        for (granularity, bucket, item_id), quantity in totals.items()
+    ]
+    for offset in range(0, len(rows), INSERT_BATCH):
+        await db.execute(insert(MenuItemSales), rows[offset:offset + INSERT_BATCH])
+    await db.commit()
+    popular_cache.clear()
+    return len(rows)
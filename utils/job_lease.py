@@ -0,0 +1,41 @@
+"""Running a scheduled job in one API worker at a time.
+
+Each worker schedules the job, and before every run asks acquire() whether
+it may go ahead. The first worker to ask takes the job's `job_leases` row
+and renews it on each of its runs; the others are turned away until the
+lease expires, which only happens if its holder stops renewing it, e.g.
+because the worker exited. One conditional UPDATE (or INSERT, the first
+time) decides, so two workers can never both hold a lease.
+"""
+import os
+import socket
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from database import AsyncSessionLocal
+from models import JobLease
+
+# Identifies this worker process in job_leases.owner
+OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+
+async def acquire(name: str, ttl: timedelta, owner: str = OWNER) -> bool:
+    """Take or renew the lease on job `name` for `ttl`; False if another worker holds it"""
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        renewed = await db.execute(
+            update(JobLease)
+            .where(JobLease.name == name, or_(JobLease.owner == owner, JobLease.expires_at < now))
+            .values(owner=owner, expires_at=now + ttl)
+        )
+        if renewed.rowcount == 0:
+            db.add(JobLease(name=name, owner=owner, expires_at=now + ttl))
+        try:
+            await db.commit()
+        except IntegrityError:
+            # The row exists and is held by someone else, or another worker
+            # inserted it first
+            return False
+    return True
@@ -0,0 +1,71 @@
+"""Pre-rendered public menu bundle served as a static file.
+
+The bundle is written under the /uploads static mount as menu.json plus
+pre-compressed menu.json.gz and menu.json.br siblings, so a CDN or a front
+proxy with gzip_static/brotli_static can serve it without reaching Python.
+Every file is written to a temp file and renamed into place, so readers never
+see a partial bundle.
+"""
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime
+
+from config import get_settings
+from utils.menu_catalog import MenuSnapshot
+
+try:
+    import brotli
+except ImportError:  # optional, only the .br variant is skipped
+    brotli = None
+
+settings = get_settings()
+
+BUNDLE_DIR = os.path.join(settings.UPLOAD_DIR, "menu")
+BUNDLE_FILE = "menu.json"
+
+def render_bundle(snapshot: MenuSnapshot) -> bytes:
+    """Categories plus active items, as compact JSON"""
+    bundle = {
+        "version": snapshot.version,
+        "etag": snapshot.etag("bundle"),
+        "generated_at": datetime.utcnow().isoformat(),
+        "categories": [snapshot.category_payloads[category.id] for category in snapshot.categories],
+        "items": [
+            snapshot.item_payloads[item.id]
+            for item in snapshot.items
+            if item.status == "active"
+        ],
+    }
+    return json.dumps(bundle, separators=(",", ":")).encode("utf-8")
+
+def _atomic_write(path: str, data: bytes):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".menu-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def write_bundle_files(snapshot: MenuSnapshot) -> str:
+    """Render and atomically publish the bundle, returning the JSON path"""
+    os.makedirs(BUNDLE_DIR, exist_ok=True)
+    path = os.path.join(BUNDLE_DIR, BUNDLE_FILE)
+    data = render_bundle(snapshot)
+
+    # menu.json goes last so its appearance means every variant is current
+    _atomic_write(path + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        _atomic_write(path + ".br", brotli.compress(data, quality=11))
+    _atomic_write(path, data)
+    return path
+
+async def write_bundle(snapshot: MenuSnapshot) -> str:
+    return await asyncio.to_thread(write_bundle_files, snapshot)
@@ -0,0 +1,198 @@
+"""Process-local, immutable snapshot of the public menu.
+
+Public menu reads are served from the current snapshot. Menu mutations call
+`rebuild()` after they commit, which builds a complete new snapshot and
+swaps it in with a single assignment, so readers always see either the old
+or the new catalog, never a mix.
+
+Mutations made through another worker are noticed through the change log:
+each snapshot records the menu version (the "menu" row of `data_versions`)
+it was built at, and a background task in every worker compares that with
+the current one every MENU_VERSION_CHECK_INTERVAL_MS, a single primary-key
+read, and rebuilds when it has moved. Requests never wait on that check.
+"""
+import asyncio
+import hashlib
+import json
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from time import monotonic
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from config import get_settings
+from database import AsyncSessionLocal
+from models import Category, MenuItem
+from schemas import CategoryResponse, MenuItemResponse
+from utils import data_versions
+
+settings = get_settings()
+
+@dataclass(frozen=True)
+class MenuSnapshot:
+    version: int
+    change_id: int  # menu change log version when the build started
+    built_at: datetime
+    items: Tuple[MenuItemResponse, ...]
+    items_by_id: Mapping[int, MenuItemResponse]
+    categories: Tuple[CategoryResponse, ...]
+    categories_by_id: Mapping[int, CategoryResponse]
+    category_counts: Mapping[int, int]
+    built_monotonic: float
+    # JSON-ready payloads and content digests, computed once per build so
+    # conditional requests never re-serialize anything
+    item_payloads: Mapping[int, Dict[str, Any]]
+    category_payloads: Mapping[int, Dict[str, Any]]
+    item_digests: Mapping[int, str]
+    category_digests: Mapping[int, str]
+    digest: str
+
+    def items_in_category(self, category_id: int) -> Tuple[MenuItemResponse, ...]:
+        return tuple(item for item in self.items if item.category_id == category_id)
+
+    def etag(self, key: str) -> str:
+        """Strong ETag for a view of the whole catalog, e.g. one listing page"""
+        return _quote(hashlib.sha256(f"{self.digest}:{key}".encode()).hexdigest()[:32])
+
+    def item_etag(self, item_id: int) -> str:
+        return _quote(self.item_digests[item_id])
+
+    def category_etag(self, category_id: int) -> str:
+        return _quote(self.category_digests[category_id])
+
+def _quote(tag: str) -> str:
+    return f'"{tag}"'
+
+def _payload_and_digest(model) -> Tuple[Dict[str, Any], str]:
+    payload = model.model_dump(mode="json")
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+    return payload, hashlib.sha256(encoded).hexdigest()[:32]
+
+async def count_items_by_category(db: AsyncSession, category_ids: Iterable[int] = None) -> Dict[int, int]:
+    """Menu item count per category in one grouped COUNT query"""
+    query = select(MenuItem.category_id, func.count(MenuItem.id)).group_by(MenuItem.category_id)
+    if category_ids is not None:
+        query = query.where(MenuItem.category_id.in_(list(category_ids)))
+    result = await db.execute(query)
+    return dict(result.all())
+
+_snapshot: Optional[MenuSnapshot] = None
+_version = 0
+_lock = asyncio.Lock()
+_background_refresh: Optional[asyncio.Task] = None
+_version_check: Optional[asyncio.Task] = None
+
+async def _latest_change(db: AsyncSession) -> int:
+    return await data_versions.current(db, data_versions.MENU)
+
+async def _build(version: int) -> MenuSnapshot:
+    # Separate session so rows cached in a request's identity map can't leak in.
+    # Two queries in total whatever the catalog size: categories, then items
+    # joined to their category. Counts come from the loaded items.
+    # The change id is read first: a change committed during the build leaves
+    # the snapshot behind it and triggers another rebuild, never the reverse.
+    async with AsyncSessionLocal() as db:
+        change_id = await _latest_change(db)
+        categories = (await db.execute(select(Category).order_by(Category.id))).scalars().all()
+        menu_items = (await db.execute(
+            select(MenuItem).options(joinedload(MenuItem.category)).order_by(MenuItem.id)
+        )).scalars().all()
+
+    counts = Counter(item.category_id for item in menu_items)
+    category_responses = tuple(
+        CategoryResponse.from_db_model(category, item_count=counts.get(category.id, 0))
+        for category in categories
+    )
+    item_responses = tuple(
+        MenuItemResponse.from_db_model(item) for item in menu_items if item.category is not None
+    )
+
+    item_payloads, item_digests = {}, {}
+    for item in item_responses:
+        item_payloads[item.id], item_digests[item.id] = _payload_and_digest(item)
+    category_payloads, category_digests = {}, {}
+    for category in category_responses:
+        category_payloads[category.id], category_digests[category.id] = _payload_and_digest(category)
+    digest = hashlib.sha256(
+        json.dumps([sorted(item_digests.items()), sorted(category_digests.items())]).encode()
+    ).hexdigest()
+
+    return MenuSnapshot(
+        version=version,
+        change_id=change_id,
+        built_at=datetime.utcnow(),
+        items=item_responses,
+        items_by_id=MappingProxyType({item.id: item for item in item_responses}),
+        categories=category_responses,
+        categories_by_id=MappingProxyType({category.id: category for category in category_responses}),
+        category_counts=MappingProxyType(dict(counts)),
+        built_monotonic=monotonic(),
+        item_payloads=MappingProxyType(item_payloads),
+        category_payloads=MappingProxyType(category_payloads),
+        item_digests=MappingProxyType(item_digests),
+        category_digests=MappingProxyType(category_digests),
+        digest=digest,
+    )
+
+async def _rebuild_locked() -> MenuSnapshot:
+    global _snapshot, _version
+    snapshot = await _build(_version + 1)
+    _version = snapshot.version
+    _snapshot = snapshot
+    return snapshot
+
+async def rebuild() -> MenuSnapshot:
+    """Rebuild the snapshot from the database and publish it"""
+    async with _lock:
+        return await _rebuild_locked()
+
+def _refresh_in_background():
+    global _background_refresh
+    if _background_refresh is None or _background_refresh.done():
+        _background_refresh = asyncio.create_task(rebuild())
+
+async def get_snapshot() -> MenuSnapshot:
+    """Current snapshot, building it on first use.
+
+    Other workers' edits arrive through the version check task within
+    MENU_VERSION_CHECK_INTERVAL_MS. Edits that bypass the change log, such as
+    manual SQL, are picked up by a background rebuild once the snapshot is
+    older than MENU_SNAPSHOT_MAX_AGE; the stale copy keeps being served
+    meanwhile.
+    """
+    snapshot = _snapshot
+    if snapshot is None:
+        async with _lock:
+            return _snapshot or await _rebuild_locked()
+    if monotonic() - snapshot.built_monotonic > settings.MENU_SNAPSHOT_MAX_AGE:
+        _refresh_in_background()
+    return snapshot
+
+async def _check_version_periodically():
+    while True:
+        await asyncio.sleep(settings.MENU_VERSION_CHECK_INTERVAL_MS / 1000)
+        try:
+            async with AsyncSessionLocal() as db:
+                latest = await _latest_change(db)
+            if _snapshot is None or _snapshot.change_id != latest:
+                await rebuild()
+        except Exception as e:
+            print(f"Menu version check failed: {str(e)}")
+
+def start_version_check():
+    """Rebuild when another worker changes the menu (interval 0 disables it)"""
+    global _version_check
+    if settings.MENU_VERSION_CHECK_INTERVAL_MS > 0 and (_version_check is None or _version_check.done()):
+        _version_check = asyncio.create_task(_check_version_periodically())
+
+async def stop_version_check():
+    global _version_check
+    if _version_check is not None:
+        _version_check.cancel()
+        await asyncio.gather(_version_check, return_exceptions=True)
+        _version_check = None
@@ -0,0 +1,103 @@
+"""Menu change log used for incremental client sync.
+
+Every committed menu mutation appends rows to `menu_changes` in the same
+transaction. A client that last synced at version N only needs the rows with
+version > N, so the work done per sync is proportional to the number of
+changes rather than the size of the catalog.
+
+Versions come from the "menu" counter in `data_versions`, not from the
+autoincrement id: two edits can commit in the opposite order to the ids
+they were given, and a client that had already synced past the later id
+would never receive the other row. The counter row stays locked until the
+edit commits, so versions become visible strictly in order.
+"""
+from typing import Dict, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from models import Category, MenuChange, MenuItem
+from schemas import CategoryResponse, MenuChangesResponse, MenuItemResponse
+from utils import data_versions
+from utils.menu_catalog import count_items_by_category
+
+ITEM = "item"
+CATEGORY = "category"
+UPSERT = "upsert"
+DELETE = "delete"
+
+async def record_change(db: AsyncSession, entity: str, entity_id: int, action: str = UPSERT):
+    """Add a change row to the session; it commits with the mutation itself"""
+    version = await data_versions.bump(db, data_versions.MENU)
+    db.add(MenuChange(version=version, entity=entity, entity_id=entity_id, action=action))
+
+async def current_version(db: AsyncSession) -> int:
+    return await data_versions.current(db, data_versions.MENU)
+
+async def seed_if_empty(db: AsyncSession):
+    """Start an empty log with an upsert for every existing row, so version 0 means 'everything'"""
+    if await db.scalar(select(MenuChange.id).limit(1)) is not None:
+        return
+    rows = []
+    for model, entity in ((Category, CATEGORY), (MenuItem, ITEM)):
+        ids = (await db.execute(select(model.id).order_by(model.id))).scalars().all()
+        rows.extend({"entity": entity, "entity_id": entity_id, "action": UPSERT} for entity_id in ids)
+    if not rows:
+        return
+    last = await data_versions.bump(db, data_versions.MENU, len(rows))
+    for version, row in enumerate(rows, start=last - len(rows) + 1):
+        row["version"] = version
+    await db.execute(insert(MenuChange), rows)
+    await db.commit()
+
+async def get_changes(db: AsyncSession, since: int, limit: int) -> MenuChangesResponse:
+    rows = (await db.execute(
+        select(MenuChange.version, MenuChange.entity, MenuChange.entity_id, MenuChange.action)
+        .where(MenuChange.version > since)
+        .order_by(MenuChange.version)
+        .limit(limit + 1)
+    )).all()
+
+    if not rows:
+        version = await current_version(db)
+        # A version we never issued means the client synced against another database
+        return MenuChangesResponse(version=version, reset=since > version)
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # Later rows win, so an item created then deleted in the window is just a delete
+    latest: Dict[Tuple[str, int], str] = {}
+    for row in rows:
+        latest[(row.entity, row.entity_id)] = row.action
+
+    item_ids = [entity_id for (entity, entity_id), action in latest.items() if entity == ITEM and action == UPSERT]
+    category_ids = [entity_id for (entity, entity_id), action in latest.items() if entity == CATEGORY and action == UPSERT]
+
+    items = []
+    if item_ids:
+        items = (await db.execute(
+            select(MenuItem).options(joinedload(MenuItem.category)).where(MenuItem.id.in_(item_ids))
+        )).scalars().all()
+    categories = []
+    counts = {}
+    if category_ids:
+        categories = (await db.execute(select(Category).where(Category.id.in_(category_ids)))).scalars().all()
+        counts = await count_items_by_category(db, category_ids)
+
+    return MenuChangesResponse(
+        version=rows[-1].version,
+        has_more=has_more,
+        items=[MenuItemResponse.from_db_model(item) for item in items if item.category is not None],
+        categories=[
+            CategoryResponse.from_db_model(category, item_count=counts.get(category.id, 0))
+            for category in categories
+        ],
+        deleted_item_ids=[
+            entity_id for (entity, entity_id), action in latest.items() if entity == ITEM and action == DELETE
+        ],
+        deleted_category_ids=[
+            entity_id for (entity, entity_id), action in latest.items() if entity == CATEGORY and action == DELETE
+        ],
+    )
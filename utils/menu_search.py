@@ -0,0 +1,241 @@
+"""In-process full-text search over menu item names and descriptions.
+
+Items are indexed word by word into an inverted index. A sorted vocabulary
+answers prefix queries ("crois" -> croissant) and a trigram index over the
+vocabulary finds near-misses ("crossant" -> croissant). The index is built
+from the menu snapshot and updated incrementally as items are created,
+edited or deleted, so a query never touches the database. Only active
+items are indexed; deactivating an item drops it from results.
+"""
+import heapq
+import re
+from itertools import islice
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from utils.cache import TTLCache
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Field weights: a hit in the name counts for more than one in the description
+NAME_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+
+# Match quality multipliers
+EXACT = 1.0
+PREFIX = 0.8
+FUZZY = 0.6
+
+MIN_PREFIX_LENGTH = 2
+MIN_FUZZY_LENGTH = 3
+FUZZY_THRESHOLD = 0.5  # minimum trigram Dice similarity for a typo match
+MAX_EXPANSIONS = 50  # vocabulary words a single query token may expand to
+RESULT_CACHE_SIZE = 1024  # recent queries kept until the index next changes
+RESULT_CACHE_TTL = 3600
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return WORD_RE.findall(text.lower()) if text else []
+
+def searchable(item) -> bool:
+    return item.status == "active"
+
+def trigrams(word: str) -> Set[str]:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class MenuSearchIndex:
+    def __init__(self):
+        self.version = 0  # menu snapshot version the index reflects
+        # word -> ids of items with the word in their name / description
+        self._name_postings: Dict[str, Set[int]] = defaultdict(set)
+        self._description_postings: Dict[str, Set[int]] = defaultdict(set)
+        self._documents: Dict[int, Tuple[Set[str], Set[str]]] = {}
+        self._texts: Dict[int, Tuple[Optional[str], Optional[str]]] = {}
+        self._vocabulary: List[str] = []
+        self._trigram_words: Dict[str, Set[str]] = defaultdict(set)
+        self._trigram_counts: Dict[str, int] = {}
+        self._results = TTLCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL)
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def _add_word(self, word: str):
+        insort(self._vocabulary, word)
+        grams = trigrams(word)
+        self._trigram_counts[word] = len(grams)
+        for gram in grams:
+            self._trigram_words[gram].add(word)
+
+    def _drop_word(self, word: str):
+        del self._vocabulary[bisect_left(self._vocabulary, word)]
+        del self._trigram_counts[word]
+        for gram in trigrams(word):
+            words = self._trigram_words[gram]
+            words.discard(word)
+            if not words:
+                del self._trigram_words[gram]
+
+    def remove(self, item_id: int):
+        self._results.clear()
+        self._texts.pop(item_id, None)
+        name_words, description_words = self._documents.pop(item_id, (set(), set()))
+        for words, postings in ((name_words, self._name_postings), (description_words, self._description_postings)):
+            for word in words:
+                postings[word].discard(item_id)
+                if not postings[word]:
+                    del postings[word]
+        for word in name_words | description_words:
+            if word not in self._name_postings and word not in self._description_postings:
+                self._drop_word(word)
+
+    def upsert(self, item_id: int, name: Optional[str], description: Optional[str]):
+        self.remove(item_id)
+        name_words = set(tokenize(name))
+        description_words = set(tokenize(description)) - name_words
+        self._documents[item_id] = (name_words, description_words)
+        self._texts[item_id] = (name, description)
+        for words, postings in ((name_words, self._name_postings), (description_words, self._description_postings)):
+            for word in words:
+                if word not in self._name_postings and word not in self._description_postings:
+                    self._add_word(word)
+                postings[word].add(item_id)
+
+    def rebuild(self, items: Iterable, version: int = 0):
+        """Replace the whole index; `items` need id, name, description and status"""
+        fresh = MenuSearchIndex()
+        for item in filter(searchable, items):
+            fresh.upsert(item.id, item.name, item.description)
+        self.__dict__.update(fresh.__dict__)
+        self.version = version
+
+    def sync(self, snapshot):
+        """Bring the index up to date with a menu snapshot.
+
+        Only items whose name or description changed are re-tokenized, so
+        this is cheap after a single edit. Items that were deleted or are no
+        longer active are removed.
+        """
+        if self.version == snapshot.version:
+            return
+        active = {item.id: item for item in snapshot.items if searchable(item)}
+        for item in active.values():
+            if self._texts.get(item.id) != (item.name, item.description):
+                self.upsert(item.id, item.name, item.description)
+        for item_id in [item_id for item_id in self._texts if item_id not in active]:
+            self.remove(item_id)
+        self.version = snapshot.version
+
+    def _expand(self, token: str) -> Dict[str, float]:
+        """Vocabulary words a query token may stand for, with match quality"""
+        matches: Dict[str, float] = {}
+        if token in self._trigram_counts:
+            matches[token] = EXACT
+
+        if len(token) >= MIN_PREFIX_LENGTH:
+            start = bisect_left(self._vocabulary, token)
+            for word in self._vocabulary[start:start + MAX_EXPANSIONS]:
+                if not word.startswith(token):
+                    break
+                matches.setdefault(word, PREFIX)
+
+        if len(token) >= MIN_FUZZY_LENGTH:
+            grams = trigrams(token)
+            shared = Counter()
+            for gram in grams:
+                shared.update(self._trigram_words.get(gram, ()))
+            for word, overlap in shared.most_common(MAX_EXPANSIONS):
+                similarity = 2 * overlap / (len(grams) + self._trigram_counts[word])
+                if similarity < FUZZY_THRESHOLD:
+                    break
+                matches.setdefault(word, FUZZY * similarity)
+        return matches
+
+    def _tiers(self, token: str) -> List[Tuple[float, Set[int]]]:
+        """(score, item ids) groups for one query token, best score first.
+
+        An item's score for the token is that of the first tier holding it.
+        """
+        tiers = []
+        for word, quality in self._expand(token).items():
+            if word in self._name_postings:
+                tiers.append((quality * NAME_WEIGHT, self._name_postings[word]))
+            if word in self._description_postings:
+                tiers.append((quality * DESCRIPTION_WEIGHT, self._description_postings[word]))
+        tiers.sort(key=lambda tier: -tier[0])
+        return tiers
+
+    @staticmethod
+    def _score(tiers: List[Tuple[float, Set[int]]], candidates: Set[int], scores: Dict[int, float]):
+        remaining = set(candidates)
+        for score, ids in tiers:
+            hits = remaining & ids if len(remaining) < len(ids) else ids & remaining
+            for item_id in hits:
+                scores[item_id] += score
+            remaining -= hits
+            if not remaining:
+                break
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[int, float]]:
+        """Ranked (item_id, score) pairs.
+
+        Items matching every query word come first, ordered by score. Any
+        remaining slots are filled with partial matches, best tiers first.
+        All the heavy lifting is set algebra, so cost tracks the number of
+        matching items rather than the catalog size.
+        """
+        tokens = tuple(dict.fromkeys(tokenize(query)))
+        if not tokens or limit <= 0:
+            return []
+        results = self._results.get((tokens, limit))
+        if results is None:
+            results = self._search(tokens, limit)
+            self._results.set((tokens, limit), results)
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "items": len(self._documents),
+            "vocabulary": len(self._vocabulary),
+            "result_cache": self._results.stats(),
+        }
+
+    def _search(self, tokens: Tuple[str, ...], limit: int) -> List[Tuple[int, float]]:
+        token_tiers = [self._tiers(token) for token in tokens]
+        if len(tokens) == 1:
+            return self._walk(token_tiers, set(), [], limit)
+
+        # Items hitting every word's best tier already have the top score
+        best = sorted((tiers[0][1] for tiers in token_tiers if tiers), key=len)
+        if len(best) == len(tokens):
+            top = best[0].intersection(*best[1:])
+            if len(top) >= limit:
+                score = sum(tiers[0][0] for tiers in token_tiers)
+                return [(item_id, score) for item_id in islice(top, limit)]
+
+        matched = sorted((set().union(*(ids for _, ids in tiers)) for tiers in token_tiers), key=len)
+        full_matches = matched[0].intersection(*matched[1:])
+
+        scores: Dict[int, float] = defaultdict(float)
+        for tiers in token_tiers:
+            self._score(tiers, full_matches, scores)
+        results = heapq.nsmallest(limit, full_matches, key=lambda item_id: (-scores[item_id], item_id))
+        results = [(item_id, scores[item_id]) for item_id in results]
+
+        return self._walk(token_tiers, set(full_matches), results, limit)
+
+    @staticmethod
+    def _walk(token_tiers, seen: Set[int], results: List[Tuple[int, float]], limit: int) -> List[Tuple[int, float]]:
+        """Fill `results` up to `limit` walking each token's tiers in score order"""
+        for tiers in token_tiers:
+            for score, ids in tiers:
+                if len(results) >= limit:
+                    return results
+                # Equal scores come back in set order; taking the first few
+                # keeps the cost proportional to `limit`, not the tier size
+                fresh = list(islice((item_id for item_id in ids if item_id not in seen), limit - len(results)))
+                seen.update(fresh)
+                results.extend((item_id, score) for item_id in fresh)
+        return results
+
+index = MenuSearchIndex()
@@ -0,0 +1,124 @@
+"""Streaming order export for /admin/orders/export.
+
+Rows are read through a server-side cursor (`AsyncSession.stream` with
+`yield_per`) as plain column tuples, so neither the driver nor the ORM
+identity map ever holds more than one batch. Output is produced in chunks as
+rows arrive and memory stays flat however many orders match.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import select
+
+from database import AsyncSessionLocal
+from models import Order, OrderItem
+from utils.order_queries import filter_orders
+
+CSV = "csv"
+NDJSON = "ndjson"
+MEDIA_TYPES = {
+    CSV: "text/csv",
+    NDJSON: "application/x-ndjson",
+}
+
+ORDER_COLUMNS = [
+    Order.id, Order.reference, Order.user_id, Order.created_at, Order.status, Order.payment_status,
+    Order.payment_reference, Order.amount, Order.delivery_fee, Order.final_amount,
+    Order.name, Order.email, Order.phone, Order.address,
+]
+LINE_COLUMNS = [OrderItem.menu_item_id, OrderItem.name, OrderItem.quantity, OrderItem.unit_price]
+
+ORDER_FIELDS = [
+    "order_id", "reference", "user_id", "created_at", "status", "payment_status",
+    "payment_reference", "amount", "delivery_fee", "final_amount",
+    "customer_name", "email", "phone", "address",
+]
+LINE_FIELDS = ["menu_item_id", "item_name", "quantity", "unit_price"]
+
+BATCH_SIZE = 1000  # rows fetched from the cursor at a time
+CHUNK_ROWS = 500  # rows per chunk written to the response
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def _legacy_lines(raw_items: Optional[str]) -> list:
+    """Lines of an order written before order_items existed"""
+    try:
+        items = json.loads(raw_items) if raw_items else []
+    except ValueError:
+        return []
+    if not isinstance(items, list):
+        return []
+    return [
+        (item.get("menu_item_id"), item.get("name"), item.get("quantity"), item.get("price"))
+        for item in items if isinstance(item, dict)
+    ]
+
+async def iter_orders(
+    status: Optional[str] = None,
+    payment_status: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> AsyncIterator[tuple]:
+    """Yield (order_fields, lines) per matching order, newest first.
+
+    Uses its own session: the request's session is closed before a streamed
+    body finishes.
+    """
+    query = filter_orders(
+        select(*ORDER_COLUMNS, Order.items, *LINE_COLUMNS).outerjoin(OrderItem, OrderItem.order_id == Order.id),
+        status, payment_status, start_date, end_date
+    ).order_by(Order.created_at.desc(), Order.id.desc(), OrderItem.id)
+
+    order_width = len(ORDER_COLUMNS)
+    current, lines = None, []
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=BATCH_SIZE))
+        async for row in result:
+            order, raw_items, line = tuple(row[:order_width]), row[order_width], tuple(row[order_width + 1:])
+            if current is not None and order[0] != current[0]:
+                yield current, lines
+                lines = []
+            current = order
+            if line[0] is not None:
+                lines.append(line)
+            elif not lines:
+                lines = _legacy_lines(raw_items)
+        if current is not None:
+            yield current, lines
+
+async def stream_csv(**filters) -> AsyncIterator[str]:
+    """One CSV row per order line; order columns repeat on each of its lines"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(ORDER_FIELDS + LINE_FIELDS)
+    rows = 0
+    async for order, lines in iter_orders(**filters):
+        order = [value.isoformat() if isinstance(value, datetime) else value for value in order]
+        for line in lines or [(None,) * len(LINE_FIELDS)]:
+            writer.writerow(order + list(line))
+            rows += 1
+        if rows >= CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    yield buffer.getvalue()
+
+async def stream_ndjson(**filters) -> AsyncIterator[str]:
+    """One JSON object per order, with its lines under "items" """
+    chunk = []
+    async for order, lines in iter_orders(**filters):
+        record = dict(zip(ORDER_FIELDS, order))
+        record["items"] = [dict(zip(LINE_FIELDS, line)) for line in lines]
+        chunk.append(json.dumps(record, default=_json_default))
+        if len(chunk) >= CHUNK_ROWS:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
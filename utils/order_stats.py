@@ -0,0 +1,205 @@
+"""Daily sales rollup and cheap order totals.
+
+`sales_daily` holds one row per (day, status, payment_status) with the order
+count and money totals. Every order insert and status change adjusts it in
+the same transaction, so sales reports and estimated admin totals are a SUM
+over a few hundred rollup rows instead of a scan of `orders`. The same
+writes bump the "orders" row of `data_versions`, which caches derived from
+orders compare against to notice changes made by any worker.
+"""
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import get_settings
+from models import DataVersion, Order, SalesDaily
+from utils import counters
+from utils.cache import TTLCache
+from utils.order_queries import filter_orders
+
+settings = get_settings()
+
+EXACT = "exact"
+CACHED = "cached"
+ESTIMATED = "estimated"
+
+# Totals per filter combination, for dashboards that poll every few seconds
+count_cache = TTLCache(settings.ORDER_COUNT_CACHE_SIZE, settings.ORDER_COUNT_CACHE_TTL)
+
+ORDERS_VERSION = "orders"
+
+DAY = "day"
+WEEK = "week"
+MONTH = "month"
+
+async def record_order(db: AsyncSession, order: Order, sign: int = 1):
+    """Add a new order to the rollup (or take one out with sign=-1); commits with the caller"""
+    await db.execute(counters.increment(
+        SalesDaily,
+        {
+            "day": (order.created_at or datetime.utcnow()).date(),
+            "status": order.status or "pending",
+            "payment_status": order.payment_status or "pending",
+        },
+        {
+            "order_count": sign,
+            "gross": sign * (order.amount or 0.0),
+            "delivery_fees": sign * (order.delivery_fee or 0.0),
+            "net": sign * (order.final_amount or 0.0),
+        }
+    ))
+    await db.execute(counters.increment(DataVersion, {"name": ORDERS_VERSION}, {"version": 1}))
+
+async def orders_version(db: AsyncSession) -> int:
+    """Counter that moves whenever an order is created or changes status"""
+    return await db.scalar(select(DataVersion.version).where(DataVersion.name == ORDERS_VERSION)) or 0
+
+async def change_status(
+    db: AsyncSession,
+    order: Order,
+    status: Optional[str] = None,
+    payment_status: Optional[str] = None
+):
+    """Set an order's status fields and move it to the matching rollup row"""
+    new_status = status or order.status
+    new_payment_status = payment_status or order.payment_status
+    if (new_status, new_payment_status) == (order.status, order.payment_status):
+        return
+    await record_order(db, order, -1)
+    order.status = new_status
+    order.payment_status = new_payment_status
+    await record_order(db, order, 1)
+
+async def count_orders(
+    db: AsyncSession,
+    mode: str,
+    status: Optional[str] = None,
+    payment_status: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> Tuple[int, str]:
+    """Total matching the admin order filters, and which kind of total it is.
+
+    exact:     COUNT over the filtered orders.
+    cached:    an exact count reused for ORDER_COUNT_CACHE_TTL seconds per
+               filter combination; reported as "exact" when freshly counted.
+    estimated: sum of the sales_daily counts. Date filters are widened to whole
+               days, otherwise it matches the exact count.
+    """
+    if mode == ESTIMATED:
+        query = select(func.coalesce(func.sum(SalesDaily.order_count), 0))
+        if status and status != "all":
+            query = query.where(SalesDaily.status == status)
+        if payment_status and payment_status != "all":
+            query = query.where(SalesDaily.payment_status == payment_status)
+        if start_date:
+            query = query.where(SalesDaily.day >= start_date.date())
+        if end_date:
+            query = query.where(SalesDaily.day <= end_date.date())
+        return int(await db.scalar(query)), ESTIMATED
+
+    key = (status or "all", payment_status or "all", start_date, end_date)
+    if mode == CACHED:
+        total = count_cache.get(key)
+        if total is not None:
+            return total, CACHED
+
+    query = filter_orders(select(Order.id), status, payment_status, start_date, end_date)
+    total = await db.scalar(select(func.count()).select_from(query.subquery()))
+    count_cache.set(key, total)
+    return total, EXACT
+
+async def rebuild(db: AsyncSession, start: Optional[date] = None, end: Optional[date] = None):
+    """Recompute the rollup from the orders table for days start..end (inclusive, open-ended if None)"""
+    day = func.date(Order.created_at)
+    status = func.coalesce(Order.status, "pending")
+    payment_status = func.coalesce(Order.payment_status, "pending")
+
+    stale = delete(SalesDaily)
+    source = select(
+        day, status, payment_status, func.count(),
+        func.coalesce(func.sum(Order.amount), 0),
+        func.coalesce(func.sum(Order.delivery_fee), 0),
+        func.coalesce(func.sum(Order.final_amount), 0)
+    ).where(Order.created_at.is_not(None))
+    if start:
+        stale = stale.where(SalesDaily.day >= start)
+        source = source.where(Order.created_at >= datetime.combine(start, time.min))
+    if end:
+        stale = stale.where(SalesDaily.day <= end)
+        source = source.where(Order.created_at < datetime.combine(end + timedelta(days=1), time.min))
+
+    await db.execute(stale)
+    await db.execute(
+        insert(SalesDaily).from_select(
+            ["day", "status", "payment_status", "order_count", "gross", "delivery_fees", "net"],
+            source.group_by(day, status, payment_status)
+        )
+    )
+    await db.commit()
+
+async def seed_if_empty(db: AsyncSession):
+    """Backfill the rollup the first time the table is deployed"""
+    if await db.scalar(select(SalesDaily.id).limit(1)) is not None:
+        return
+    if await db.scalar(select(Order.id).limit(1)) is None:
+        return
+    await rebuild(db)
+
+def period_start(day: date, granularity: str) -> date:
+    if granularity == WEEK:
+        return day - timedelta(days=day.weekday())  # Monday
+    if granularity == MONTH:
+        return day.replace(day=1)
+    return day
+
+def _empty_period(period: Optional[date]) -> dict:
+    return {
+        "period": period,
+        "order_count": 0,
+        "gross": 0.0,
+        "delivery_fees": 0.0,
+        "net": 0.0,
+        "by_status": defaultdict(lambda: {"order_count": 0, "net": 0.0}),
+        "by_payment_status": defaultdict(lambda: {"order_count": 0, "net": 0.0}),
+    }
+
+def _add(period: dict, row):
+    period["order_count"] += row.order_count
+    period["gross"] += row.gross
+    period["delivery_fees"] += row.delivery_fees
+    period["net"] += row.net
+    for split, key in ((period["by_status"], row.status), (period["by_payment_status"], row.payment_status)):
+        split[key]["order_count"] += row.order_count
+        split[key]["net"] += row.net
+
+async def sales_report(db: AsyncSession, start: date, end: date, granularity: str = DAY) -> dict:
+    """Totals per day, week or month between start and end (inclusive), from the rollup only"""
+    result = await db.execute(
+        select(
+            SalesDaily.day, SalesDaily.status, SalesDaily.payment_status,
+            SalesDaily.order_count, SalesDaily.gross, SalesDaily.delivery_fees, SalesDaily.net
+        )
+        .where(SalesDaily.day >= start, SalesDaily.day <= end, SalesDaily.order_count != 0)
+        .order_by(SalesDaily.day)
+    )
+    periods = {}
+    totals = _empty_period(None)
+    for row in result:
+        day = row.day if isinstance(row.day, date) else date.fromisoformat(row.day)
+        key = period_start(day, granularity)
+        if key not in periods:
+            periods[key] = _empty_period(key)
+        _add(periods[key], row)
+        _add(totals, row)
+
+    return {
+        "start": start,
+        "end": end,
+        "granularity": granularity,
+        "periods": list(periods.values()),
+        "totals": totals,
+    }
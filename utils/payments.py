@@ -0,0 +1,58 @@
+"""Applying a successful Paystack charge to an order.
+
+Shared by the webhook worker and /verify-payment so both update the same
+rollups and notify the customer the same way, exactly once per order.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Notification, Order
+from utils import data_versions, item_sales, order_stats, related_items
+
+@dataclass(frozen=True)
+class PaidOrder:
+    order_id: int
+    quantities: Dict[int, int]  # per menu item
+    version: int  # of data_versions "paid_orders" after this order
+
+async def mark_order_paid(db: AsyncSession, order: Order) -> Optional[PaidOrder]:
+    """Mark the order paid and processing, count its items and queue the
+    customer notification; commits with the caller.
+
+    Returns the order id, its quantity per menu item and the paid orders
+    version it was given, or None if it was already paid, in which case
+    nothing is changed.
+    """
+    if order.payment_status == "paid":
+        return None
+    paid_at = datetime.utcnow()
+    # Claim the transition in the database too: the webhook worker and
+    # /verify-payment can race on the same order
+    claimed = await db.execute(
+        update(Order)
+        .where(Order.id == order.id, or_(Order.payment_status.is_(None), Order.payment_status != "paid"))
+        .values(payment_status="paid", paid_at=paid_at)
+        .execution_options(synchronize_session=False)
+    )
+    if claimed.rowcount == 0:
+        return None
+    order.paid_at = paid_at
+    quantities = await item_sales.record_paid_order(db, order, paid_at)
+    await order_stats.change_status(db, order, status="processing", payment_status="paid")
+    version = await data_versions.bump(db, data_versions.PAID_ORDERS)
+    db.add(Notification(
+        user_id=order.user_id,
+        title="Payment Successful",
+        message=f"Your order #{order.reference} has been paid and is being processed.",
+        type="order"
+    ))
+    return PaidOrder(order.id, quantities, version)
+
+def order_paid_committed(paid: Optional[PaidOrder]):
+    """Update this worker's in-memory views once mark_order_paid has committed"""
+    if paid is not None and paid.quantities:
+        related_items.index.add_order(paid.quantities, order_id=paid.order_id, version=paid.version)
@@ -0,0 +1,175 @@
+"""Shared async client for the Paystack API.
+
+One `httpx.AsyncClient` per worker keeps connections to Paystack alive
+between calls. Every request has connect and read timeouts, and idempotent
+requests that fail with a network error, a timeout, 429 or a 5xx are retried
+a bounded number of times with full-jitter exponential backoff. A whole
+call, retries included, is cut off after PAYSTACK_LATENCY_BUDGET seconds,
+and a circuit breaker stops calling Paystack for a while once calls keep
+failing. Latency, outcome and breaker state are exposed at
+/admin/metrics/paystack.
+
+The lifespan opens the client at startup and closes it on shutdown; scripts
+that import it get a client opened on first use.
+"""
+import asyncio
+import random
+from collections import Counter, deque
+from time import perf_counter
+from typing import Optional
+from urllib.parse import quote
+
+import httpx
+
+from config import get_settings
+from utils.circuit_breaker import CircuitBreaker, CircuitOpen
+
+settings = get_settings()
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+LATENCY_SAMPLES = 1000  # recent calls kept for percentiles
+
+class PaystackUnavailable(Exception):
+    """Paystack could not be reached, or kept failing, after every retry"""
+
+class PaystackCircuitOpen(PaystackUnavailable):
+    """Paystack has been failing; calls are refused until a probe succeeds"""
+
+class PaystackClient:
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self.breaker = CircuitBreaker(
+            "paystack",
+            failure_threshold=settings.PAYSTACK_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=settings.PAYSTACK_BREAKER_RESET_TIMEOUT,
+            half_open_calls=settings.PAYSTACK_BREAKER_HALF_OPEN_CALLS,
+        )
+        self.requests = 0  # calls made by the app, however many attempts each took
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0  # calls that raised PaystackUnavailable
+        self.over_budget = 0  # of which cut off by the latency budget
+        self.outcomes = Counter()  # HTTP status or error class per attempt
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)  # seconds per call, retries included
+
+    async def start(self):
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            base_url=settings.PAYSTACK_BASE_URL,
+            # An empty key would make an invalid header; Paystack answers 401 instead
+            headers={"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"} if settings.PAYSTACK_SECRET_KEY else {},
+            timeout=httpx.Timeout(
+                settings.PAYSTACK_READ_TIMEOUT,
+                connect=settings.PAYSTACK_CONNECT_TIMEOUT,
+                pool=settings.PAYSTACK_CONNECT_TIMEOUT,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.PAYSTACK_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.PAYSTACK_MAX_CONNECTIONS,
+                keepalive_expiry=settings.PAYSTACK_KEEPALIVE_EXPIRY,
+            ),
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), settings.PAYSTACK_RETRY_BACKOFF_MAX)
+        ceiling = min(settings.PAYSTACK_RETRY_BACKOFF * 2 ** attempt, settings.PAYSTACK_RETRY_BACKOFF_MAX)
+        return random.uniform(0, ceiling)
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send a request and return Paystack's response.
+
+        Raises PaystackUnavailable if the last attempt still failed with a
+        network error, a timeout, 429 or a 5xx, or if the call as a whole
+        took longer than PAYSTACK_LATENCY_BUDGET. Raises PaystackCircuitOpen,
+        without calling, while the circuit is open.
+        """
+        await self.start()
+        try:
+            self.breaker.before_call()
+        except CircuitOpen as e:
+            raise PaystackCircuitOpen(str(e)) from e
+        self.requests += 1
+        start = perf_counter()
+        verdict = None
+        try:
+            response = await asyncio.wait_for(
+                self._send(method.upper(), path, **kwargs), settings.PAYSTACK_LATENCY_BUDGET
+            )
+            verdict = True
+            return response
+        except asyncio.TimeoutError as e:
+            verdict = False
+            self.failures += 1
+            self.over_budget += 1
+            raise PaystackUnavailable(
+                f"{method} {path} exceeded the {settings.PAYSTACK_LATENCY_BUDGET}s latency budget"
+            ) from e
+        except PaystackUnavailable:
+            verdict = False
+            self.failures += 1
+            raise
+        finally:
+            self.breaker.after_call(verdict)
+            self.latencies.append(perf_counter() - start)
+
+    async def _send(self, method: str, path: str, **kwargs) -> httpx.Response:
+        retries = settings.PAYSTACK_MAX_RETRIES if method in IDEMPOTENT_METHODS else 0
+        for attempt in range(retries + 1):
+            self.attempts += 1
+            response, error = None, None
+            try:
+                response = await self._client.request(method, path, **kwargs)
+                self.outcomes[str(response.status_code)] += 1
+            except httpx.TransportError as e:
+                error = e
+                self.outcomes[type(e).__name__] += 1
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                return response
+            if attempt < retries:
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt, response))
+        outcome = f"HTTP {response.status_code}" if response is not None else repr(error)
+        raise PaystackUnavailable(f"{method} {path} failed after {retries + 1} attempts: {outcome}") from error
+
+    async def verify_transaction(self, reference: str) -> httpx.Response:
+        return await self.request("GET", f"/transaction/verify/{quote(reference, safe='')}")
+
+    def stats(self) -> dict:
+        samples = sorted(self.latencies)
+
+        def percentile(p: float) -> float:
+            if not samples:
+                return 0.0
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 3)
+
+        return {
+            "base_url": settings.PAYSTACK_BASE_URL,
+            "open": self._client is not None,
+            "requests": self.requests,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "failures": self.failures,
+            "over_budget": self.over_budget,
+            "latency_budget_seconds": settings.PAYSTACK_LATENCY_BUDGET,
+            "circuit": self.breaker.stats(),
+            "outcomes": dict(self.outcomes),
+            "latency_ms": {
+                "samples": len(samples),
+                "avg": round(sum(samples) / len(samples) * 1000, 3) if samples else 0.0,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": round(samples[-1] * 1000, 3) if samples else 0.0,
+            },
+        }
+
+client = PaystackClient()
@@ -0,0 +1,64 @@
+"""Kitchen prep list: units to bake per menu item across open orders.
+
+The sum is a single GROUP BY over `order_items` joined to `orders`, served
+from the status/created_at index. Results are cached per (day, statuses)
+together with the orders version from `data_versions`, which every order
+insert and status change bumps in its own transaction. Each request reads
+that version first, a primary-key lookup, and recomputes when it has moved,
+so a change made through any worker is seen by all of them at once.
+KITCHEN_PREP_CACHE_TTL only bounds how long unused lists are kept.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional, Sequence
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import get_settings
+from models import Order, OrderItem
+from utils import order_stats
+from utils.cache import TTLCache
+
+settings = get_settings()
+
+ORDER_STATUSES = ("pending", "processing", "completed", "cancelled", "delivered")
+OPEN_STATUSES = ("pending", "processing")
+
+prep_cache = TTLCache(256, settings.KITCHEN_PREP_CACHE_TTL)
+
+async def prep_list(db: AsyncSession, day: Optional[date], statuses: Sequence[str]) -> List[dict]:
+    """Quantity and order count per menu item for orders in `statuses`,
+    optionally only those placed on `day`; largest quantity first"""
+    statuses = tuple(sorted(set(statuses)))
+    key = (day, statuses)
+    version = await order_stats.orders_version(db)
+    cached = prep_cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    quantity = func.sum(OrderItem.quantity).label("quantity")
+    query = (
+        select(
+            OrderItem.menu_item_id,
+            func.max(OrderItem.name).label("name"),
+            quantity,
+            func.count(func.distinct(OrderItem.order_id)).label("order_count"),
+        )
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.status.in_(statuses))
+        .group_by(OrderItem.menu_item_id)
+        .order_by(quantity.desc(), OrderItem.menu_item_id)
+    )
+    if day:
+        start = datetime.combine(day, time.min)
+        query = query.where(Order.created_at >= start, Order.created_at < start + timedelta(days=1))
+
+    result = await db.execute(query)
+    items = [
+        {"menu_item_id": row.menu_item_id, "name": row.name, "quantity": int(row.quantity or 0), "order_count": row.order_count}
+        for row in result
+    ]
+    # Read after the version, so at worst this is cached under an older
+    # version and recomputed by the next request
+    prep_cache.set(key, (version, items))
+    return items
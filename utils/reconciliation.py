@@ -0,0 +1,224 @@
+"""Reconciling pending payments whose webhook never arrived.
+
+Stale pending orders are found through the (payment_status, created_at)
+index, a batch at a time in created_at order. Each batch is verified
+against Paystack concurrently, with at most RECONCILE_CONCURRENCY calls in
+flight. The charges Paystack confirms are then marked paid, and those it
+reports failed or abandoned are marked failed, in one transaction per
+batch, so neither is verified again.
+
+Every API worker schedules this every RECONCILE_INTERVAL seconds, but only
+the one holding the "reconcile_payments" job lease runs it, so Paystack
+sees one run per interval however many workers there are. Set the interval
+to 0 to run `python reconcile_payments.py` from cron instead; overlapping
+with the API's run is still safe because mark_order_paid claims each order
+once.
+"""
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import Callable, List, Optional
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import get_settings
+from database import AsyncSessionLocal
+from models import Order
+from utils import circuit_breaker, job_lease, order_stats, paystack, payments
+
+settings = get_settings()
+
+# Outcomes of verifying one order, besides Paystack's own transaction status
+NOT_FOUND = "not_found"
+ERROR = "error"
+
+# Paystack statuses after which the charge will never succeed
+FAILED_STATUSES = ("failed", "abandoned")
+
+JOB_NAME = "reconcile_payments"
+
+last_run: Optional[dict] = None
+_running = asyncio.Lock()
+_job: Optional[asyncio.Task] = None
+
+async def _stale_batch(db: AsyncSession, min_age: timedelta, max_age: timedelta, after, size: int) -> list:
+    now = datetime.utcnow()
+    query = (
+        select(Order.id, Order.payment_reference, Order.created_at)
+        .where(
+            Order.payment_status == "pending",
+            Order.created_at >= now - max_age,
+            Order.created_at < now - min_age,
+            Order.payment_reference.is_not(None),
+        )
+        .order_by(Order.created_at, Order.id)
+        .limit(size)
+    )
+    if after is not None:
+        created_at, order_id = after
+        query = query.where(
+            Order.created_at >= created_at,
+            or_(Order.created_at > created_at, and_(Order.created_at == created_at, Order.id > order_id))
+        )
+    return (await db.execute(query)).all()
+
+async def _verify(reference: str, semaphore: asyncio.Semaphore) -> str:
+    """Paystack's status for a transaction, or NOT_FOUND / ERROR"""
+    async with semaphore:
+        try:
+            response = await paystack.client.verify_transaction(reference)
+        except paystack.PaystackUnavailable as e:
+            print(f"Reconciliation: could not verify {reference}: {str(e)}")
+            return ERROR
+    if response.status_code != 200:
+        return NOT_FOUND if response.status_code in (400, 404) else ERROR
+    try:
+        return str(response.json()["data"]["status"])
+    except (ValueError, KeyError, TypeError):
+        return ERROR
+
+async def _mark_paid(order_ids: List[int]) -> int:
+    """Mark a batch of confirmed orders paid in one transaction"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Order).where(Order.id.in_(order_ids)))
+        paid = [await payments.mark_order_paid(db, order) for order in result.scalars()]
+        await db.commit()
+    for order in paid:
+        payments.order_paid_committed(order)
+    return sum(order is not None for order in paid)
+
+async def _mark_failed(order_ids: List[int]) -> int:
+    """Mark a batch of orders Paystack reports failed in one transaction"""
+    failed = 0
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Order).where(Order.id.in_(order_ids)))
+        for order in result.scalars():
+            # Leave orders a webhook marked paid meanwhile alone
+            claimed = await db.execute(
+                update(Order)
+                .where(Order.id == order.id, Order.payment_status == "pending")
+                .values(payment_status="failed")
+                .execution_options(synchronize_session=False)
+            )
+            if claimed.rowcount:
+                await order_stats.change_status(db, order, payment_status="failed")
+                failed += 1
+        await db.commit()
+    return failed
+
+async def reconcile(
+    min_age: Optional[timedelta] = None,
+    max_age: Optional[timedelta] = None,
+    concurrency: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    limit: Optional[int] = None,
+    dry_run: bool = False,
+    progress: Optional[Callable[[dict], None]] = None
+) -> dict:
+    """Verify stale pending orders with Paystack; mark the successful ones
+    paid and the failed or abandoned ones failed.
+
+    Orders between min_age and max_age old are checked, at most `limit` of
+    them. With dry_run nothing is written. `progress` is called with the
+    running totals after every batch. Returns the totals.
+    """
+    global last_run
+    min_age = min_age if min_age is not None else timedelta(seconds=settings.RECONCILE_MIN_AGE)
+    max_age = max_age if max_age is not None else timedelta(seconds=settings.RECONCILE_MAX_AGE)
+    batch_size = batch_size or settings.RECONCILE_BATCH_SIZE
+    semaphore = asyncio.Semaphore(concurrency or settings.RECONCILE_CONCURRENCY)
+
+    stats = {
+        "started_at": datetime.utcnow(),
+        "finished_at": None,
+        "dry_run": dry_run,
+        "stopped": None,  # why the run ended early, if it did
+        "scanned": 0,
+        "paid": 0,
+        "failed": 0,
+        "errors": 0,
+        "outcomes": Counter(),  # Paystack status, not_found or error per order
+        "elapsed_seconds": 0.0,
+        "orders_per_second": 0.0,
+    }
+    start = perf_counter()
+    async with _running:
+        after = None
+        while limit is None or stats["scanned"] < limit:
+            size = batch_size if limit is None else min(batch_size, limit - stats["scanned"])
+            async with AsyncSessionLocal() as db:
+                batch = await _stale_batch(db, min_age, max_age, after, size)
+            if not batch:
+                break
+            after = (batch[-1].created_at, batch[-1].id)
+
+            outcomes = await asyncio.gather(*(_verify(row.payment_reference, semaphore) for row in batch))
+            stats["scanned"] += len(batch)
+            stats["outcomes"].update(outcomes)
+            stats["errors"] += outcomes.count(ERROR)
+            confirmed = [row.id for row, outcome in zip(batch, outcomes) if outcome == "success"]
+            if confirmed and not dry_run:
+                try:
+                    stats["paid"] += await _mark_paid(confirmed)
+                except Exception as e:
+                    print(f"Reconciliation: could not update orders {confirmed}: {str(e)}")
+                    stats["errors"] += len(confirmed)
+            failed = [row.id for row, outcome in zip(batch, outcomes) if outcome in FAILED_STATUSES]
+            if failed and not dry_run:
+                try:
+                    stats["failed"] += await _mark_failed(failed)
+                except Exception as e:
+                    print(f"Reconciliation: could not update orders {failed}: {str(e)}")
+                    stats["errors"] += len(failed)
+
+            elapsed = perf_counter() - start
+            stats["elapsed_seconds"] = round(elapsed, 3)
+            stats["orders_per_second"] = round(stats["scanned"] / elapsed, 2) if elapsed else 0.0
+            if progress:
+                progress(stats)
+            if paystack.client.breaker.state == circuit_breaker.OPEN:
+                # The rest would only be refused; the next run picks them up
+                stats["stopped"] = "circuit open"
+                break
+            if len(batch) < size:
+                break
+
+    stats["finished_at"] = datetime.utcnow()
+    stats["outcomes"] = dict(stats["outcomes"])
+    last_run = stats
+    return stats
+
+async def _run_periodically():
+    while True:
+        await asyncio.sleep(settings.RECONCILE_INTERVAL)
+        try:
+            # Held for two intervals: renewed on time by its holder, taken
+            # over by another worker only once the holder stops running
+            if await job_lease.acquire(JOB_NAME, timedelta(seconds=2 * settings.RECONCILE_INTERVAL)):
+                await reconcile()
+        except Exception as e:
+            print(f"Reconciliation run failed: {str(e)}")
+
+def start_job():
+    """Schedule reconcile() every RECONCILE_INTERVAL seconds in the worker
+    holding the job lease (0 disables it)"""
+    global _job
+    if settings.RECONCILE_INTERVAL > 0 and (_job is None or _job.done()):
+        _job = asyncio.create_task(_run_periodically())
+
+async def stop_job():
+    global _job
+    if _job is not None:
+        _job.cancel()
+        await asyncio.gather(_job, return_exceptions=True)
+        _job = None
+
+def stats() -> dict:
+    return {
+        "interval_seconds": settings.RECONCILE_INTERVAL,
+        "scheduled": _job is not None and not _job.done(),
+        "running": _running.locked(),
+        "last_run": last_run,
+    }
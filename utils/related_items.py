@@ -0,0 +1,260 @@
+""""Frequently bought together" recommendations from paid order contents.
+
+Two items co-occur when they appear in the same paid order. The full
+item-by-item co-occurrence matrix is rebuilt off the event loop: with NumPy
+and SciPy installed it is a single sparse product X^T X over the binary
+order-by-item matrix, otherwise a pure-Python pair count. Between rebuilds,
+each newly paid order updates the counts in place. Orders paid while a
+rebuild runs are also noted and replayed onto the new counts after the
+swap, unless the rebuild already read them. Each item's top-K neighbours
+are kept pre-sorted, so answering a request is a dict lookup.
+
+Every worker keeps its own index and rebuilds it in the background at
+startup, reading every paid order once; related items are empty until that
+finishes. Set RELATED_ITEMS_REBUILD_ON_STARTUP=false to skip it, e.g. for
+short-lived workers, and rebuild with POST /admin/related-items/rebuild.
+
+Orders paid through other workers only reach this one through a rebuild.
+The index remembers the "paid_orders" data version it reflects, advancing
+it as this worker counts orders with the next versions in turn. Every
+RELATED_ITEMS_REFRESH_INTERVAL seconds it is compared with the current
+version, and the index is rebuilt if another worker has counted an order
+since. An index that was never built is left alone.
+"""
+import asyncio
+import json
+import sys
+from collections import Counter, defaultdict
+from itertools import combinations
+from time import perf_counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import get_settings
+from database import AsyncSessionLocal
+from models import Order, OrderItem
+from utils import data_versions
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # optional, the pure-Python rebuild is used instead
+    np = None
+    sparse = None
+
+settings = get_settings()
+
+FETCH_BATCH = 1000
+
+async def load_baskets(db: AsyncSession) -> Dict[int, List[int]]:
+    """Distinct menu item ids of every paid order, by order id"""
+    query = (
+        select(Order.id, Order.items, OrderItem.menu_item_id)
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .where(Order.payment_status == "paid")
+        .order_by(Order.id)
+    )
+    baskets, current_id, basket = {}, None, set()
+    result = await db.stream(query.execution_options(yield_per=FETCH_BATCH))
+    async for order_id, raw_items, menu_item_id in result:
+        if order_id != current_id:
+            if basket:
+                baskets[current_id] = sorted(basket)
+            current_id, basket = order_id, set()
+        if menu_item_id is not None:
+            basket.add(menu_item_id)
+        elif raw_items:
+            # Orders placed before order_items existed
+            try:
+                items = json.loads(raw_items)
+            except ValueError:
+                items = []
+            basket.update(
+                item["menu_item_id"] for item in items if isinstance(items, list)
+                and isinstance(item, dict) and item.get("menu_item_id") is not None
+            )
+    if basket:
+        baskets[current_id] = sorted(basket)
+    return baskets
+
+def _count_pairs_python(baskets: List[List[int]]) -> Tuple[Dict[int, Dict[int, int]], int]:
+    counts: Dict[int, Dict[int, int]] = defaultdict(Counter)
+    for basket in baskets:
+        for a, b in combinations(basket, 2):
+            counts[a][b] += 1
+            counts[b][a] += 1
+    memory = sys.getsizeof(counts) + sum(sys.getsizeof(row) for row in counts.values())
+    return counts, memory
+
+def _count_pairs_scipy(baskets: List[List[int]]) -> Tuple[Dict[int, Dict[int, int]], int]:
+    if not baskets:
+        return {}, 0
+    flat = np.fromiter((item for basket in baskets for item in basket), dtype=np.int64)
+    lengths = np.fromiter((len(basket) for basket in baskets), dtype=np.int64, count=len(baskets))
+    item_ids = np.unique(flat)
+    rows = np.repeat(np.arange(len(baskets)), lengths)
+    cols = np.searchsorted(item_ids, flat)
+    orders_by_items = sparse.csr_matrix(
+        (np.ones(len(cols), dtype=np.int32), (rows, cols)), shape=(len(baskets), len(item_ids))
+    )
+    matrix = (orders_by_items.T @ orders_by_items).tocsr()
+    matrix.setdiag(0)
+    matrix.eliminate_zeros()
+    memory = matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+    counts: Dict[int, Dict[int, int]] = {}
+    for row in range(matrix.shape[0]):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        if start != end:
+            counts[int(item_ids[row])] = Counter(dict(zip(
+                item_ids[matrix.indices[start:end]].tolist(), matrix.data[start:end].tolist()
+            )))
+    return counts, memory
+
+class RelatedItemsIndex:
+    def __init__(self, top_k: int):
+        self.top_k = top_k
+        self._counts: Dict[int, Dict[int, int]] = defaultdict(Counter)
+        self._top: Dict[int, List[Tuple[int, int]]] = {}
+        self._lock = asyncio.Lock()
+        # "paid_orders" version reflected, None until the first rebuild
+        self.version: Optional[int] = None
+        # Orders counted while a rebuild runs, as (order id, basket, version)
+        self._pending: Optional[List[Tuple[Optional[int], List[int], Optional[int]]]] = None
+        self._job: Optional[asyncio.Task] = None
+        self.stats = {
+            "backend": "scipy" if sparse is not None else "python",
+            "orders": 0,
+            "items": 0,
+            "pairs": 0,
+            "matrix_bytes": 0,
+            "rebuild_seconds": None,
+            "incremental_updates": 0,
+            "version": None,
+        }
+
+    def _build(self, baskets: List[List[int]]) -> int:
+        """Count pairs and rank every item; returns the matrix size in bytes"""
+        count_pairs = _count_pairs_scipy if sparse is not None else _count_pairs_python
+        counts, memory = count_pairs(baskets)
+        self._counts = defaultdict(Counter, counts)
+        for item_id in counts:
+            self._rank(item_id)
+        return memory
+
+    def _rank(self, item_id: int):
+        neighbours = self._counts.get(item_id)
+        if not neighbours:
+            self._top.pop(item_id, None)
+            return
+        # Most orders together first, ties by id so results are stable
+        self._top[item_id] = sorted(neighbours.items(), key=lambda pair: (-pair[1], pair[0]))[:self.top_k]
+
+    def related(self, item_id: int, limit: int) -> List[Tuple[int, int]]:
+        """(menu_item_id, orders together) for up to `limit` items"""
+        return self._top.get(item_id, [])[:limit]
+
+    def add_order(self, item_ids: Iterable[int], order_id: Optional[int] = None, version: Optional[int] = None):
+        """Count one newly paid order, `version` being its paid orders version"""
+        basket = sorted(set(item_ids))
+        if self._pending is not None:
+            self._pending.append((order_id, basket, version))
+        self._count(basket)
+        self._advance(version)
+
+    def _advance(self, version: Optional[int]):
+        # Only the next version in turn: a gap means another worker counted
+        # an order in between, which the next refresh check rebuilds for
+        if self.version is not None and version == self.version + 1:
+            self.version = version
+            self.stats["version"] = version
+
+    def _count(self, basket: List[int]):
+        for a, b in combinations(basket, 2):
+            if not self._counts[a][b]:
+                self.stats["pairs"] += 1
+            self._counts[a][b] += 1
+            self._counts[b][a] += 1
+        for item_id in basket:
+            self._rank(item_id)
+        self.stats["items"] = len(self._top)
+        self.stats["orders"] += 1
+        self.stats["incremental_updates"] += 1
+
+    async def rebuild(self, db: AsyncSession) -> dict:
+        """Recount every paid order; the heavy part runs in a worker thread"""
+        async with self._lock:
+            self._pending = []
+            try:
+                # Read first: orders paid during the load at worst cause
+                # one more rebuild, never a missed one
+                version = await data_versions.current(db, data_versions.PAID_ORDERS)
+                baskets = await load_baskets(db)
+                start = perf_counter()
+                fresh = RelatedItemsIndex(self.top_k)
+                memory = await asyncio.to_thread(
+                    fresh._build, [basket for basket in baskets.values() if len(basket) > 1]
+                )
+                elapsed = perf_counter() - start
+
+                # Swap in one step so readers never see a half-built index,
+                # then replay the orders paid since that the load missed
+                self._counts, self._top = fresh._counts, fresh._top
+                self.stats.update(
+                    orders=len(baskets),
+                    items=len(fresh._counts),
+                    pairs=sum(len(row) for row in fresh._counts.values()) // 2,
+                    matrix_bytes=memory,
+                    rebuild_seconds=round(elapsed, 4),
+                    incremental_updates=0,
+                    version=version,
+                )
+                self.version = version
+                for order_id, basket, _ in self._pending:
+                    if order_id is None or order_id not in baskets:
+                        self._count(basket)
+                for _, _, paid_version in sorted(self._pending, key=lambda entry: entry[2] or 0):
+                    self._advance(paid_version)
+            finally:
+                self._pending = None
+            return dict(self.stats)
+
+    async def _rebuild_with_own_session(self):
+        try:
+            async with AsyncSessionLocal() as db:
+                await self.rebuild(db)
+        except Exception as e:
+            print(f"Related items rebuild failed: {str(e)}")
+
+    async def _refresh_if_stale(self):
+        try:
+            async with AsyncSessionLocal() as db:
+                latest = await data_versions.current(db, data_versions.PAID_ORDERS)
+                if self.version is not None and latest != self.version:
+                    await self.rebuild(db)
+        except Exception as e:
+            print(f"Related items refresh failed: {str(e)}")
+
+    async def _run(self):
+        if settings.RELATED_ITEMS_REBUILD_ON_STARTUP:
+            await self._rebuild_with_own_session()
+        while settings.RELATED_ITEMS_REFRESH_INTERVAL > 0:
+            await asyncio.sleep(settings.RELATED_ITEMS_REFRESH_INTERVAL)
+            await self._refresh_if_stale()
+
+    def start(self):
+        """Rebuild in the background, unless RELATED_ITEMS_REBUILD_ON_STARTUP
+        is off, then every RELATED_ITEMS_REFRESH_INTERVAL seconds if other
+        workers have counted orders since (0 disables that)"""
+        if self._job is None or self._job.done():
+            self._job = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._job is not None:
+            self._job.cancel()
+            await asyncio.gather(self._job, return_exceptions=True)
+            self._job = None
+
+index = RelatedItemsIndex(settings.RELATED_ITEMS_TOP_K)
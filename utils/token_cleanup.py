@@ -0,0 +1,74 @@
+"""Deleting refresh tokens that can no longer be used.
+
+Every signin and every renewal adds a row to `refresh_tokens`, and rotated
+rows are only marked revoked, so the table grows without bound. A token is
+dead once it has expired, since /refresh rejects it before anything else.
+Revoked tokens are kept for REFRESH_TOKEN_REVOKED_RETENTION_DAYS first:
+presenting a rotated token again is how a leaked one is detected, and that
+only works while its row is still there.
+
+Rows are deleted a batch at a time, found through the expires_at and
+revoked_at indexes, so no transaction holds many locks. The API runs this
+every REFRESH_TOKEN_PRUNE_INTERVAL seconds in each worker; overlapping runs
+just find less to delete. `python prune_refresh_tokens.py` runs it by hand.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, or_, select
+
+from config import get_settings
+from database import AsyncSessionLocal
+from models import RefreshToken
+
+settings = get_settings()
+
+last_run: Optional[dict] = None
+_job: Optional[asyncio.Task] = None
+
+async def prune(batch_size: Optional[int] = None, retention: Optional[timedelta] = None) -> dict:
+    """Delete expired refresh tokens, and revoked ones older than the retention"""
+    global last_run
+    batch_size = batch_size or settings.REFRESH_TOKEN_PRUNE_BATCH_SIZE
+    if retention is None:
+        retention = timedelta(days=settings.REFRESH_TOKEN_REVOKED_RETENTION_DAYS)
+    now = datetime.utcnow()
+    dead = or_(RefreshToken.expires_at < now, RefreshToken.revoked_at < now - retention)
+
+    stats = {"started_at": now, "finished_at": None, "deleted": 0}
+    while True:
+        async with AsyncSessionLocal() as db:
+            ids = (await db.execute(select(RefreshToken.id).where(dead).limit(batch_size))).scalars().all()
+            if not ids:
+                break
+            await db.execute(delete(RefreshToken).where(RefreshToken.id.in_(ids)))
+            await db.commit()
+        stats["deleted"] += len(ids)
+        if len(ids) < batch_size:
+            break
+
+    stats["finished_at"] = datetime.utcnow()
+    last_run = stats
+    return stats
+
+async def _run_periodically():
+    while True:
+        await asyncio.sleep(settings.REFRESH_TOKEN_PRUNE_INTERVAL)
+        try:
+            await prune()
+        except Exception as e:
+            print(f"Refresh token cleanup failed: {str(e)}")
+
+def start_job():
+    """Schedule prune() every REFRESH_TOKEN_PRUNE_INTERVAL seconds (0 disables it)"""
+    global _job
+    if settings.REFRESH_TOKEN_PRUNE_INTERVAL > 0 and (_job is None or _job.done()):
+        _job = asyncio.create_task(_run_periodically())
+
+async def stop_job():
+    global _job
+    if _job is not None:
+        _job.cancel()
+        await asyncio.gather(_job, return_exceptions=True)
+        _job = None
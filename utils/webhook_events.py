@@ -0,0 +1,223 @@
+"""Background processing of Paystack webhook events.
+
+The webhook only verifies the signature, stores the body in
+`paystack_events` and answers. A duplicate delivery hits the unique
+event_key and is acknowledged without doing anything else. The stored event
+id is put on an in-process queue drained by PAYSTACK_WEBHOOK_WORKERS tasks.
+
+Each event is applied in one transaction that first flips its row from
+pending to processed with a conditional UPDATE. The order changes commit
+together with that flip. If another worker or process got there first, the
+UPDATE matches nothing and the event is skipped. A failed event rolls back
+and is retried later, up to PAYSTACK_WEBHOOK_MAX_ATTEMPTS times. Events
+still pending after a restart are queued again at startup.
+"""
+import asyncio
+import hashlib
+import json
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import get_settings
+from database import AsyncSessionLocal
+from models import Order, PaystackEvent
+from utils import payments
+
+settings = get_settings()
+
+PENDING = "pending"
+PROCESSED = "processed"
+IGNORED = "ignored"
+FAILED = "failed"
+
+LAG_SAMPLES = 1000  # recent events kept for lag percentiles
+
+def event_key(payload: dict, body: bytes) -> str:
+    """Identity of a delivery: the event type and Paystack's id for its object"""
+    data = payload.get("data") if isinstance(payload.get("data"), dict) else {}
+    object_id = data.get("id") or data.get("reference")
+    if object_id is None:
+        object_id = hashlib.sha256(body).hexdigest()
+    return f"{payload.get('event')}:{object_id}"[:191]
+
+async def record(db: AsyncSession, payload: dict, body: bytes) -> Optional[int]:
+    """Store a verified delivery; returns its row id, or None for a duplicate"""
+    data = payload.get("data") if isinstance(payload.get("data"), dict) else {}
+    event = PaystackEvent(
+        event_key=event_key(payload, body),
+        event=str(payload.get("event")),
+        reference=data.get("reference"),
+        payload=body.decode("utf-8"),
+        status=PENDING,
+        received_at=datetime.utcnow()
+    )
+    db.add(event)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return None
+    return event.id
+
+async def _charge_success(db: AsyncSession, payload: dict):
+    reference = (payload.get("data") or {}).get("reference")
+    result = await db.execute(select(Order).where(Order.payment_reference == reference))
+    order = result.scalars().first()
+    if order is None:
+        return IGNORED, None
+    return PROCESSED, await payments.mark_order_paid(db, order)
+
+# Event type -> coroutine(db, payload) returning (final status, payments.PaidOrder or None)
+HANDLERS = {
+    "charge.success": _charge_success,
+}
+
+class WebhookProcessor:
+    def __init__(self):
+        self.queue: "asyncio.Queue[int]" = asyncio.Queue()
+        self._workers = []
+        self.received = 0
+        self.duplicates = 0
+        self.processed = 0
+        self.ignored = 0
+        self.retried = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.lags = deque(maxlen=LAG_SAMPLES)  # seconds from receipt to commit
+
+    async def start(self):
+        """Start the worker tasks and queue events left pending by a previous run"""
+        if self._workers:
+            return
+        self.queue = asyncio.Queue()
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(PaystackEvent.id)
+                .where(PaystackEvent.status == PENDING)
+                .order_by(PaystackEvent.received_at, PaystackEvent.id)
+            )
+            for event_id in result.scalars():
+                self.queue.put_nowait(event_id)
+        self._workers = [
+            asyncio.create_task(self._work()) for _ in range(settings.PAYSTACK_WEBHOOK_WORKERS)
+        ]
+
+    async def stop(self):
+        """Cancel the workers; unfinished events stay pending in the table"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def enqueue(self, event_id: Optional[int]):
+        if event_id is None:
+            self.duplicates += 1
+            return
+        self.received += 1
+        self.queue.put_nowait(event_id)
+
+    async def drain(self):
+        """Wait until every queued event has been handled"""
+        await self.queue.join()
+
+    async def _work(self):
+        while True:
+            event_id = await self.queue.get()
+            self.in_flight += 1
+            try:
+                await self._apply(event_id)
+            except Exception as e:
+                print(f"Webhook event {event_id} failed: {str(e)}")
+                try:
+                    await self._record_failure(event_id, e)
+                except Exception as e:
+                    # Still pending in the table; replayed at the next startup
+                    print(f"Could not record failure of webhook event {event_id}: {str(e)}")
+            finally:
+                self.in_flight -= 1
+                self.queue.task_done()
+
+    async def _apply(self, event_id: int):
+        async with AsyncSessionLocal() as db:
+            now = datetime.utcnow()
+            claimed = await db.execute(
+                update(PaystackEvent)
+                .where(PaystackEvent.id == event_id, PaystackEvent.status == PENDING)
+                .values(status=PROCESSED, processed_at=now, attempts=PaystackEvent.attempts + 1)
+            )
+            if claimed.rowcount == 0:
+                await db.rollback()
+                return
+            event = await db.get(PaystackEvent, event_id)
+            handler = HANDLERS.get(event.event)
+            status, paid = IGNORED, None
+            if handler is not None:
+                status, paid = await handler(db, json.loads(event.payload))
+            event.status = status
+            await db.commit()
+
+        payments.order_paid_committed(paid)
+        self.lags.append((now - event.received_at).total_seconds())
+        if status == PROCESSED:
+            self.processed += 1
+        else:
+            self.ignored += 1
+
+    async def _record_failure(self, event_id: int, error: Exception):
+        async with AsyncSessionLocal() as db:
+            event = await db.get(PaystackEvent, event_id)
+            if event is None or event.status != PENDING:
+                return
+            event.attempts += 1
+            event.error = str(error)[:2000]
+            if event.attempts >= settings.PAYSTACK_WEBHOOK_MAX_ATTEMPTS:
+                event.status = FAILED
+            await db.commit()
+        if event.status == FAILED:
+            self.failed += 1
+            return
+        self.retried += 1
+        delay = settings.PAYSTACK_WEBHOOK_RETRY_DELAY * 2 ** (event.attempts - 1)
+        asyncio.get_running_loop().call_later(delay, self.queue.put_nowait, event_id)
+
+    def stats(self) -> dict:
+        samples = sorted(self.lags)
+        return {
+            "workers": len(self._workers),
+            "queue_depth": self.queue.qsize(),
+            "in_flight": self.in_flight,
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "processed": self.processed,
+            "ignored": self.ignored,
+            "retried": self.retried,
+            "failed": self.failed,
+            "lag_ms": {
+                "samples": len(samples),
+                "avg": round(sum(samples) / len(samples) * 1000, 3) if samples else 0.0,
+                "p95": round(samples[min(len(samples) - 1, int(0.95 * len(samples)))] * 1000, 3) if samples else 0.0,
+                "max": round(samples[-1] * 1000, 3) if samples else 0.0,
+            },
+        }
+
+    async def backlog(self, db: AsyncSession) -> dict:
+        """Pending and failed events across all workers, and the oldest pending one's age"""
+        result = await db.execute(
+            select(PaystackEvent.status, func.count(), func.min(PaystackEvent.received_at))
+            .where(PaystackEvent.status.in_([PENDING, FAILED]))
+            .group_by(PaystackEvent.status)
+        )
+        rows = {status: (count, oldest) for status, count, oldest in result}
+        pending, oldest = rows.get(PENDING, (0, None))
+        return {
+            "pending_events": pending,
+            "failed_events": rows.get(FAILED, (0, None))[0],
+            "oldest_pending_seconds": round((datetime.utcnow() - oldest).total_seconds(), 3) if oldest else 0.0,
+        }
+
+processor = WebhookProcessor()